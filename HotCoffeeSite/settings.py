@@ -90,6 +90,58 @@ TIME_ZONE = 'Asia/Tokyo'
 USE_I18N = True
 USE_TZ = True
 
+# ========================================
+# 検索設定
+# ========================================
+# 'auto' = PostgreSQLならtsvector、SQLiteならFTS5（タイトル・人物名はn-gram転置インデックスの一致を先に並べる）
+# 'reviews.search.ngram.NgramSearchEngine' = n-gram転置インデックスだけ（概要は検索しない）
+# n-gram転置インデックスは検索ドキュメントの更新と一緒に差分更新される（build_ngram_index は全体の作り直し）
+SEARCH_ENGINE = config('SEARCH_ENGINE', default='auto')
+# 検索結果キャッシュの保持時間（秒）。カタログのバージョンが変われば保持時間内でも使われない
+SEARCH_CACHE_TIMEOUT = config('SEARCH_CACHE_TIMEOUT', default=60 * 60 * 24, cast=int)
+
+# ========================================
+# TMDb API設定（reviews.tmdb）
+# ========================================
+# APIのURL（テストではローカルのフィクスチャサーバーに向ける）
+TMDB_API_URL = config('TMDB_API_URL', default='https://api.themoviedb.org/3')
+# 1秒あたりのリクエスト数の上限（全ワーカー合計）
+TMDB_RATE_LIMIT = config('TMDB_RATE_LIMIT', default=40, cast=float)
+# 映画詳細を並行に取得するワーカー数
+TMDB_MAX_WORKERS = config('TMDB_MAX_WORKERS', default=8, cast=int)
+# 429・5xx・接続エラーのリトライ回数
+TMDB_MAX_RETRIES = config('TMDB_MAX_RETRIES', default=5, cast=int)
+# 接続・読み込みのタイムアウト（秒）
+TMDB_CONNECT_TIMEOUT = config('TMDB_CONNECT_TIMEOUT', default=5, cast=float)
+TMDB_READ_TIMEOUT = config('TMDB_READ_TIMEOUT', default=15, cast=float)
+# レスポンスのディスクキャッシュ（空ならキャッシュしない。開発環境では既定で有効）
+TMDB_CACHE_DIR = config('TMDB_CACHE_DIR', default=str(BASE_DIR / '.tmdb_cache') if DEBUG else '')
+# キャッシュをそのまま使う時間（秒）。過ぎたら ETag / Last-Modified で再検証する
+TMDB_CACHE_TTL = config('TMDB_CACHE_TTL', default=60 * 60 * 24, cast=int)
+# キャッシュの上限（バイト）。超えたら使われていないものから消す
+TMDB_CACHE_MAX_BYTES = config('TMDB_CACHE_MAX_BYTES', default=512 * 1024 * 1024, cast=int)
+# import_movies の進み具合を記録するジャーナル（SQLite。--resume で続きから再開）
+IMPORT_JOURNAL_PATH = config('IMPORT_JOURNAL_PATH', default=str(BASE_DIR / '.import_journal.sqlite3'))
+
+# ========================================
+# キャッシュ設定
+# ========================================
+if config('DATABASE_URL', default=''):
+    # 本番環境（Render）: ワーカー間と warm_search_cache で共有するためDBに置く（createcachetable で作成）
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'django_cache',
+        }
+    }
+else:
+    # 開発環境
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 # ========================================
 # 静的ファイル設定
 # ========================================
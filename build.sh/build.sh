@@ -5,4 +5,6 @@ pip install -r requirements.txt
 
 python manage.py collectstatic --no-input
 python manage.py migrate
-python manage.py ensure_admin
\ No newline at end of file
+python manage.py createcachetable
+python manage.py ensure_admin
+python manage.py warm_search_cache
\ No newline at end of file
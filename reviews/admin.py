@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django_summernote.admin import SummernoteModelAdmin
 from .models import (
-    Movie, Review, CriticReview, Person, Favorite, Column, WatchStatus, Like,
+    Movie, MovieScoreStats, Genre, MovieGenre, Review, CriticReview, Person, Favorite, Column, WatchStatus, Like,
     UserProfile, Comment, Notification, Follow, Report, ReviewLike,
     MovieRecommendation, FanArt, FanArtLike, ContactMessage, Discussion, DiscussionComment
 )
@@ -19,13 +19,19 @@ class CustomSummernoteModelAdmin(SummernoteModelAdmin):
 # 既存のモデル登録をそのまま維持
 
 # Movie Admin
+class MovieGenreInline(admin.TabularInline):
+    model = MovieGenre
+    extra = 1
+
+
 @admin.register(Movie)
 class MovieAdmin(admin.ModelAdmin):
     list_display = ['title', 'release_date', 'jp_release_date', 'is_now_playing_jp', 'director', 'popularity']
-    list_filter = ['release_date', 'is_now_playing_jp']
+    list_filter = ['release_date', 'is_now_playing_jp', 'genres']
     search_fields = ['title', 'original_title', 'director__name']
     filter_horizontal = ['cast']
     readonly_fields = ['created_at', 'updated_at']
+    inlines = [MovieGenreInline]
     
     fieldsets = (
         ('基本情報', {
@@ -51,19 +57,34 @@ class MovieAdmin(admin.ModelAdmin):
     )
 
 
+# Genre Admin
+@admin.register(Genre)
+class GenreAdmin(admin.ModelAdmin):
+    list_display = ['name', 'tmdb_id']
+    search_fields = ['name']
+
+
 # Review Admin
 @admin.register(Review)
 class ReviewAdmin(admin.ModelAdmin):
     list_display = ['user', 'movie', 'expectation', 'satisfaction', 'gap_score', 'created_at']
     list_filter = ['created_at', 'expectation', 'satisfaction']
     search_fields = ['user__username', 'movie__title', 'review_text']
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = ['like_count', 'gap_magnitude', 'created_at', 'updated_at']
     
     def gap_score(self, obj):
         return obj.gap_score
     gap_score.short_description = 'ギャップスコア'
 
 
+# MovieScoreStats Admin
+@admin.register(MovieScoreStats)
+class MovieScoreStatsAdmin(admin.ModelAdmin):
+    list_display = ['movie', 'review_count', 'buff_review_count', 'casual_review_count', 'updated_at']
+    search_fields = ['movie__title']
+    readonly_fields = [field.name for field in MovieScoreStats._meta.fields]
+
+
 # CriticReview Admin
 @admin.register(CriticReview)
 class CriticReviewAdmin(admin.ModelAdmin):
@@ -76,7 +97,7 @@ class CriticReviewAdmin(admin.ModelAdmin):
 # Person Admin
 @admin.register(Person)
 class PersonAdmin(admin.ModelAdmin):
-    list_display = ['name']
+    list_display = ['name', 'tmdb_person_id']
     search_fields = ['name']
 
 
@@ -0,0 +1,26 @@
+# reviews/management/commands/build_ngram_index.py
+from django.core.management.base import BaseCommand
+from reviews.search import build_ngram_index
+import time
+
+
+class Command(BaseCommand):
+    help = 'タイトル・人物名のn-gram転置インデックスを作り直す'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='読み込み・書き込みのバッチサイズ'
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        self.stdout.write('🔤 n-gramインデックスを作成中...')
+
+        gram_count = build_ngram_index(batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'\n🎉 完了！ {gram_count}件のn-gram（{time.perf_counter() - started:.2f}秒）'
+        ))
@@ -1,9 +1,13 @@
 ﻿# reviews/management/commands/import_movies.py
-from django.core.management.base import BaseCommand
-from reviews.models import Movie, Person
-import requests
 import time
-from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from reviews.models import Movie
+from reviews.tmdb import TMDbClient, MovieWriter, ImportJournal, movie_fields
+
+# ほかのワーカーが処理中のページを待つ間隔（秒）
+CLAIM_POLL_INTERVAL = 5
 
 class Command(BaseCommand):
     help = 'TMDb APIから映画データを大量取得（日本公開日優先）'
@@ -22,31 +26,22 @@ class Command(BaseCommand):
             choices=['popular', 'top_rated', 'now_playing', 'upcoming'],
             help='取得する映画カテゴリ'
         )
-
-    def get_japan_release_date(self, release_dates_data):
-        """日本の公開日を取得"""
-        results = release_dates_data.get('results', [])
-        
-        # まず日本（JP）の公開日を探す
-        for country_data in results:
-            if country_data.get('iso_3166_1') == 'JP':
-                release_dates = country_data.get('release_dates', [])
-                if release_dates:
-                    # 劇場公開（type=3）を優先
-                    for release in release_dates:
-                        if release.get('type') == 3:  # Theatrical
-                            return release.get('release_date', '').split('T')[0]
-                    # なければ最初の公開日
-                    return release_dates[0].get('release_date', '').split('T')[0]
-        
-        return None
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='ジャーナルに記録した続きから再開する（複数のプロセスでページを分担するときは全員につける）'
+        )
+        parser.add_argument(
+            '--journal',
+            type=str,
+            default='',
+            help='ジャーナルのファイル（省略時は settings.IMPORT_JOURNAL_PATH）'
+        )
 
     def handle(self, *args, **options):
-        import os
-        from decouple import config
-        API_KEY = config('TMDB_API_KEY', default='')
+        client = TMDbClient()
 
-        if API_KEY == 'YOUR_TMDB_API_KEY_HERE':
+        if not client.api_key or client.api_key == 'YOUR_TMDB_API_KEY_HERE':
             self.stdout.write(self.style.ERROR('❌ エラー: APIキーが設定されていません！'))
             return
 
@@ -60,138 +55,137 @@ class Command(BaseCommand):
             'upcoming': '公開予定'
         }
 
+        # 一覧1回 + 詳細20本 / ページ をレート制限いっぱいに並行で取得する
+        estimated_minutes = pages * 21 / client.bucket.rate / 60
         self.stdout.write(self.style.WARNING(f'\n📥 {category_names[category]}を{pages}ページ分取得します...'))
-        self.stdout.write(self.style.WARNING(f'⏱️  推定所要時間: 約{pages * 0.4:.1f}分\n'))
+        self.stdout.write(self.style.WARNING(
+            f'⏱️  推定所要時間: 約{estimated_minutes:.1f}分（毎秒{client.bucket.rate:g}リクエスト・{client.max_workers}並行）\n'
+        ))
 
         total_imported = 0
         total_skipped = 0
         total_jp_release = 0
 
-        for page in range(1, pages + 1):
-            self.stdout.write(f'📄 ページ {page}/{pages} を処理中...')
-
-            # TMDb APIから映画リストを取得
-            url = f'https://api.themoviedb.org/3/movie/{category}'
-            params = {
-                'api_key': API_KEY,
-                'language': 'ja-JP',
-                'page': page
-            }
-
-            try:
-                response = requests.get(url, params=params, timeout=10)
-                response.raise_for_status()
-            except requests.exceptions.RequestException as e:
-                self.stdout.write(self.style.ERROR(f'❌ APIエラー: {e}'))
-                continue
-
-            data = response.json()
-            movies = data.get('results', [])
-
-            if not movies:
-                self.stdout.write(self.style.WARNING('⚠️  このページには映画がありません'))
-                continue
-
-            for movie_data in movies:
-                tmdb_id = movie_data.get('id')
-
-                # すでに存在する映画はスキップ
-                if Movie.objects.filter(tmdb_id=tmdb_id).exists():
-                    total_skipped += 1
-                    continue
-
-                # 映画の詳細情報を取得（release_datesも含む）
-                detail_url = f'https://api.themoviedb.org/3/movie/{tmdb_id}'
-                detail_params = {
-                    'api_key': API_KEY,
-                    'language': 'ja-JP',
-                    'append_to_response': 'credits,videos,release_dates'
-                }
-
-                try:
-                    detail_response = requests.get(detail_url, params=detail_params, timeout=10)
-                    detail_response.raise_for_status()
-                except requests.exceptions.RequestException:
-                    continue
-
-                detail_data = detail_response.json()
-
-                # 日本の公開日を取得
-                japan_release_date = self.get_japan_release_date(
-                    detail_data.get('release_dates', {})
-                )
-                
-                # 日本の公開日がなければデフォルトの公開日を使用
-                release_date = japan_release_date or detail_data.get('release_date')
-                
-                if japan_release_date:
-                    total_jp_release += 1
-
-                # 予告編URLを取得
-                trailer_url = ''
-                videos = detail_data.get('videos', {}).get('results', [])
-                for video in videos:
-                    if video.get('type') == 'Trailer' and video.get('site') == 'YouTube':
-                        trailer_key = video.get('key')
-                        trailer_url = f'https://www.youtube.com/embed/{trailer_key}'
+        # 映画・人物・キャスト・ジャンルはページごとにまとめて書き込む（人物の対応は実行中ずっと使い回す）
+        writer = MovieWriter()
+
+        # 完了したページとTMDb IDはジャーナルに記録し、--resume ならその続きから処理する
+        page_range = range(1, pages + 1)
+        journal = ImportJournal(options['journal'] or settings.IMPORT_JOURNAL_PATH, f'import_movies:{category}')
+        if options['resume']:
+            done_pages = journal.done_pages().intersection(page_range)
+            self.stdout.write(self.style.WARNING(f'⏯️  再開: {len(done_pages)}/{pages}ページは完了済み\n'))
+        elif not journal.reset():
+            self.stdout.write(self.style.ERROR(
+                '❌ エラー: ほかのプロセスがこのジョブを処理中です。分担するときは --resume をつけてください'
+            ))
+            journal.close()
+            return
+        done_ids = journal.done_ids()
+        failed_pages = set()
+        claimed = []
+
+        try:
+            while True:
+                claimed = journal.claim_pages(page_range, client.max_workers, exclude=failed_pages)
+                if not claimed:
+                    if set(journal.remaining(page_range)) <= failed_pages:
                         break
-
-                # 映画を作成
-                try:
-                    movie = Movie.objects.create(
-                        tmdb_id=tmdb_id,
-                        title=detail_data.get('title', ''),
-                        original_title=detail_data.get('original_title', ''),
-                        overview=detail_data.get('overview', ''),
-                        release_date=release_date or None,
-                        runtime=detail_data.get('runtime'),
-                        poster_path=detail_data.get('poster_path', ''),
-                        backdrop_path=detail_data.get('backdrop_path', ''),
-                        popularity=detail_data.get('popularity', 0),
-                        vote_average=detail_data.get('vote_average', 0),
-                        vote_count=detail_data.get('vote_count', 0),
-                        trailer_url=trailer_url
-                    )
-
-                    # 監督を追加
-                    credits = detail_data.get('credits', {})
-                    crew = credits.get('crew', [])
-                    for person in crew:
-                        if person.get('job') == 'Director':
-                            director, created = Person.objects.get_or_create(
-                                name=person.get('name')
-                            )
-                            movie.director = director
-                            movie.save()
-                            break
-
-                    # キャストを追加（上位5人）
-                    cast = credits.get('cast', [])[:5]
-                    for person_data in cast:
-                        person, created = Person.objects.get_or_create(
-                            name=person_data.get('name')
-                        )
-                        movie.cast.add(person)
-
-                    total_imported += 1
-                    jp_flag = '🇯🇵' if japan_release_date else '🌏'
-                    self.stdout.write(self.style.SUCCESS(f'  ✅ {jp_flag} {movie.title}'))
-
-                except Exception as e:
-                    self.stdout.write(self.style.ERROR(f'  ❌ エラー: {e}'))
+                    # ほかのワーカーが処理中のページが終わる（か期限切れになる）のを待つ
+                    time.sleep(CLAIM_POLL_INTERVAL)
                     continue
 
-                # API制限対策で少し待機
-                time.sleep(0.25)
-
-            # ページ間の待機
-            if page < pages:
-                time.sleep(1)
+                # 処理が長引いても取ったページを引き継がれないよう、取った時刻を付け直し続ける
+                with journal.heartbeat(claimed):
+                    # TMDb APIから映画リストを並行に取得
+                    results_by_page = {}
+                    for page, data, error in client.map(lambda page: client.movie_list(category, page), claimed):
+                        if error:
+                            self.stdout.write(self.style.ERROR(f'❌ APIエラー（ページ {page}）: {error}'))
+                            journal.release_page(page)
+                            failed_pages.add(page)
+                            continue
+                        results_by_page[page] = data.get('results', [])
+
+                    for page in sorted(results_by_page):
+                        self.stdout.write(f'📄 ページ {page}/{pages} を処理中...')
+                        movies = results_by_page[page]
+
+                        if not movies:
+                            self.stdout.write(self.style.WARNING('⚠️  このページには映画がありません'))
+                            journal.complete_page(page, [])
+                            continue
+
+                        # すでに存在する映画はスキップ（ジャーナルにある映画はDBに問い合わせない）
+                        tmdb_ids = list(dict.fromkeys(movie_data.get('id') for movie_data in movies))
+                        unknown_ids = [tmdb_id for tmdb_id in tmdb_ids if tmdb_id not in done_ids]
+                        existing = set(tmdb_ids) - set(unknown_ids)
+                        if unknown_ids:
+                            existing |= set(
+                                Movie.objects.filter(tmdb_id__in=unknown_ids).values_list('tmdb_id', flat=True)
+                            )
+                        total_skipped += len(existing)
+                        new_ids = [tmdb_id for tmdb_id in tmdb_ids if tmdb_id not in existing]
+
+                        jp_release_ids = set()
+                        detail_failed = False
+
+                        # 映画の詳細情報を並行に取得（release_datesも含む）し、保存はこのスレッドで行う
+                        for tmdb_id, detail_data, error in client.map(client.movie_detail, new_ids):
+                            if error:
+                                detail_failed = True
+                                continue
+
+                            fields = movie_fields(detail_data)
+                            # 日本の公開日がなければデフォルトの公開日を使用
+                            japan_release_date = fields.pop('jp_release_date')
+                            fields['release_date'] = japan_release_date or fields['release_date']
+
+                            if japan_release_date:
+                                jp_release_ids.add(tmdb_id)
+                            writer.add(tmdb_id, detail_data, fields)
+
+                        try:
+                            written = writer.flush()
+                        except Exception as e:
+                            self.stdout.write(self.style.ERROR(f'  ❌ エラー: {e}'))
+                            journal.release_page(page)
+                            failed_pages.add(page)
+                            continue
+
+                        for movie, created in written:
+                            total_imported += 1
+                            jp_flag = '🇯🇵' if movie.tmdb_id in jp_release_ids else '🌏'
+                            self.stdout.write(self.style.SUCCESS(f'  ✅ {jp_flag} {movie.title}'))
+                        total_jp_release += len(jp_release_ids)
+
+                        if detail_failed:
+                            # 取れなかった映画は次の --resume でやり直す（書き込めた映画はスキップされる）
+                            journal.release_page(page)
+                            failed_pages.add(page)
+                        else:
+                            journal.complete_page(page, tmdb_ids)
+                            done_ids.update(tmdb_ids)
+                claimed = []
+        finally:
+            # 中断したときは処理中のページを手放して、すぐに再開できるようにする
+            for page in claimed:
+                journal.release_page(page)
+            journal.close()
 
         self.stdout.write(self.style.SUCCESS(f'\n🎉 完了！'))
         self.stdout.write(self.style.SUCCESS(f'📥 新規追加: {total_imported}本'))
         self.stdout.write(self.style.SUCCESS(f'🇯🇵 日本公開日: {total_jp_release}本'))
         self.stdout.write(self.style.WARNING(f'⏭️  スキップ: {total_skipped}本（既存）'))
+        self.stdout.write(
+            f'🌐 APIリクエスト: {client.request_count}回（リトライ {client.retry_count}回・失敗 {client.error_count}回・'
+            f'キャッシュ {client.cache_hit_count}回）'
+        )
+
+        if failed_pages:
+            self.stdout.write(self.style.WARNING(
+                f'⚠️  完了できなかったページ: {len(failed_pages)}ページ（--resume で再実行できます）'
+            ))
 
         if total_imported > 0:
             self.stdout.write(self.style.SUCCESS(f'\n✨ {total_imported}本の映画がGap Moviesに追加されました！'))
\ No newline at end of file
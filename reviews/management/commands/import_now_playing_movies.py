@@ -1,107 +1,54 @@
 from django.core.management.base import BaseCommand
-from reviews.models import Movie
-import requests
-from decouple import config
-from datetime import datetime
+from reviews.search import deferred_search_index
+from reviews.tmdb import TMDbClient, MovieWriter
 
 class Command(BaseCommand):
     help = '現在公開中の映画をTMDbからインポート'
 
+    @deferred_search_index()
     def handle(self, *args, **options):
-        API_KEY = config('TMDB_API_KEY', default='')
-        if not API_KEY:
+        client = TMDbClient()
+        if not client.api_key:
             self.stdout.write(self.style.ERROR('❌ TMDB_API_KEYが設定されていません'))
             return
 
-        BASE_URL = 'https://api.themoviedb.org/3'
-        
         self.stdout.write('🎬 現在公開中の映画を取得中...')
         
         # 現在公開中の映画を取得（最大3ページ）
+        results_by_page = {}
+        for page, data, error in client.map(lambda page: client.movie_list('now_playing', page, region='JP'), range(1, 4)):
+            results_by_page[page] = None if error else data.get('results', [])
+
         movies_data = []
-        for page in range(1, 4):
-            url = f'{BASE_URL}/movie/now_playing'
-            params = {
-                'api_key': API_KEY,
-                'language': 'ja-JP',
-                'page': page,
-                'region': 'JP'
-            }
-            
-            response = requests.get(url, params=params)
-            if response.status_code == 200:
-                data = response.json()
-                movies_data.extend(data.get('results', []))
-                self.stdout.write(f'  ページ{page}: {len(data.get("results", []))}本取得')
-            else:
+        for page, results in sorted(results_by_page.items()):
+            if results is None:
                 self.stdout.write(self.style.WARNING(f'  ページ{page}: 取得失敗'))
+                continue
+            movies_data.extend(results)
+            self.stdout.write(f'  ページ{page}: {len(results)}本取得')
         
         self.stdout.write(f'\n✅ 合計 {len(movies_data)} 本の映画を取得しました\n')
         
         # 映画を保存
         created_count = 0
         updated_count = 0
-        skipped_count = 0
+        writer = MovieWriter()
+        tmdb_ids = list(dict.fromkeys(movie_data.get('id') for movie_data in movies_data))
         
-        for movie_data in movies_data:
-            tmdb_id = movie_data.get('id')
-            
-            # 詳細情報を取得
-            detail_url = f'{BASE_URL}/movie/{tmdb_id}'
-            detail_params = {
-                'api_key': API_KEY,
-                'language': 'ja-JP',
-                'append_to_response': 'release_dates'
-            }
-            
-            detail_response = requests.get(detail_url, params=detail_params)
-            if detail_response.status_code != 200:
-                continue
-            
-            detail = detail_response.json()
-            
-            # 日本公開日を取得
-            jp_release_date = None
-            release_dates = detail.get('release_dates', {}).get('results', [])
-            for country_data in release_dates:
-                if country_data.get('iso_3166_1') == 'JP':
-                    dates = country_data.get('release_dates', [])
-                    if dates:
-                        release_date_str = dates[0].get('release_date', '')
-                        if release_date_str:
-                            try:
-                                jp_release_date = datetime.strptime(
-                                    release_date_str[:10], '%Y-%m-%d'
-                                ).date()
-                            except:
-                                pass
-                    break
-            
-            # 既存の映画があれば更新、なければ作成
-                movie, created = Movie.objects.update_or_create(
-                    tmdb_id=tmdb_id,
-                    defaults={
-                        'title': detail.get('title', ''),
-                        'original_title': detail.get('original_title', ''),
-                        'overview': detail.get('overview', ''),
-                        'release_date': detail.get('release_date'),
-                        'jp_release_date': jp_release_date,
-                        'runtime': detail.get('runtime'),
-                        'poster_path': detail.get('poster_path') or '',  
-                        'backdrop_path': detail.get('backdrop_path') or '',  
-                        'popularity': detail.get('popularity', 0),
-                        'vote_average': detail.get('vote_average', 0),
-                        'vote_count': detail.get('vote_count', 0)
-                    }
-                )
-            
+        # 詳細情報を並行に取得し、既存の映画は更新・なければ作成としてまとめて書き込む
+        for tmdb_id, detail, error in client.map(client.movie_detail, tmdb_ids):
+            if not error:
+                writer.add(tmdb_id, detail)
+        
+        for movie, created in writer.flush():
             if created:
                 created_count += 1
-                self.stdout.write(f'  ✅ {detail.get("title")} (新規追加)')
+                self.stdout.write(f'  ✅ {movie.title} (新規追加)')
             else:
                 updated_count += 1
-                self.stdout.write(f'  🔄 {detail.get("title")} (更新)')
+                self.stdout.write(f'  🔄 {movie.title} (更新)')
         
         self.stdout.write(self.style.SUCCESS(f'\n🎉 完了！'))
         self.stdout.write(f'  新規追加: {created_count}本')
-        self.stdout.write(f'  更新: {updated_count}本')
\ No newline at end of file
+        self.stdout.write(f'  更新: {updated_count}本')
+        self.stdout.write(f'  APIリクエスト: {client.request_count}回（リトライ {client.retry_count}回・失敗 {client.error_count}回）')
@@ -0,0 +1,28 @@
+# reviews/management/commands/rebuild_search_index.py
+from django.core.management.base import BaseCommand
+from reviews.models import Movie
+from reviews.search import get_search_engine
+
+
+class Command(BaseCommand):
+    help = '全映画の検索インデックスを作り直す'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='1回に索引する映画の本数'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        engine = get_search_engine()
+        movie_ids = list(Movie.objects.order_by('pk').values_list('pk', flat=True))
+
+        self.stdout.write(f'🔎 {type(engine).__name__} で{len(movie_ids)}本を索引します...')
+        for start in range(0, len(movie_ids), batch_size):
+            engine.index(movie_ids[start:start + batch_size])
+            self.stdout.write(f'  {min(start + batch_size, len(movie_ids))}/{len(movie_ids)}')
+
+        self.stdout.write(self.style.SUCCESS('\n🎉 完了！'))
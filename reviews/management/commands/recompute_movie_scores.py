@@ -0,0 +1,169 @@
+# reviews/management/commands/recompute_movie_scores.py
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from reviews.models import Movie, Review, MovieScoreStats, empty_gap_badge_counts, empty_score_histogram
+import numpy as np
+import time
+
+
+# 映画通フラグ（プロフィール未作成のユーザーは全体のみに集計）
+BUFF, CASUAL, NO_PROFILE = 1, 0, -1
+
+REVIEW_DTYPE = np.dtype([
+    ('movie_id', np.int64),
+    ('expectation', np.int32),
+    ('satisfaction', np.int32),
+    ('is_movie_buff', np.int8),
+])
+
+HISTOGRAM_FIELDS = ('gap_badge_counts', 'expectation_histogram', 'satisfaction_histogram')
+# Movie に書き写す並び替え用のスコア
+MOVIE_SORT_FIELDS = ('reflected_score_avg', 'gap_score_avg', 'rated_review_count')
+
+
+class Command(BaseCommand):
+    help = '全映画のスコア集計（MovieScoreStats）をNumPyで一括再計算'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='読み込み・書き込みのバッチサイズ'
+        )
+
+    def load_reviews(self, batch_size):
+        """満足度入力済みのレビューを構造化配列として読み込む"""
+        rows = Review.objects.filter(
+            satisfaction__isnull=False
+        ).values_list(
+            'movie_id', 'expectation', 'satisfaction', 'user__userprofile__is_movie_buff'
+        ).order_by().iterator(chunk_size=batch_size)
+
+        return np.fromiter(
+            (
+                (movie_id, expectation, satisfaction,
+                 NO_PROFILE if is_movie_buff is None else int(is_movie_buff))
+                for movie_id, expectation, satisfaction, is_movie_buff in rows
+            ),
+            dtype=REVIEW_DTYPE,
+        )
+
+    def compute(self, reviews):
+        """レビュー配列から映画ごとの集計値を計算
+
+        Review.reflected_score() / golden_score() / gap_score() と同じ式を
+        配列全体に適用し、np.bincountで映画ごとに合計する。
+        """
+        movie_ids, index = np.unique(reviews['movie_id'], return_inverse=True)
+        size = len(movie_ids)
+
+        expectation = reviews['expectation'].astype(np.float64)
+        satisfaction = reviews['satisfaction'].astype(np.float64)
+        gap = satisfaction - expectation
+        raw_score = satisfaction + gap * 0.5
+        reflected = np.where(
+            gap > 0,
+            np.minimum(100, raw_score),  # 期待を超えた
+            np.where(gap == 0, satisfaction, np.maximum(0, raw_score))  # 期待通り / 下回った
+        )
+        golden = (expectation + satisfaction) / 2
+
+        segments = {
+            '': np.ones(len(reviews), dtype=bool),
+            'buff_': reviews['is_movie_buff'] == BUFF,
+            'casual_': reviews['is_movie_buff'] == CASUAL,
+        }
+
+        columns = {}
+        for prefix, mask in segments.items():
+            idx = index[mask]
+            columns[f'{prefix}review_count'] = np.bincount(idx, minlength=size)
+            columns[f'{prefix}reflected_sum'] = np.bincount(idx, weights=reflected[mask], minlength=size)
+            columns[f'{prefix}golden_sum'] = np.bincount(idx, weights=golden[mask], minlength=size)
+            columns[f'{prefix}gap_sum'] = np.bincount(idx, weights=gap[mask], minlength=size)
+            columns[f'{prefix}positive_count'] = np.bincount(idx[gap[mask] > 10], minlength=size)
+            columns[f'{prefix}negative_count'] = np.bincount(idx[gap[mask] < -10], minlength=size)
+
+        # 分布（全体）: 映画ごとの行に並べた2次元ヒストグラム
+        lowers = [lower for lower, _, _ in Review.GAP_BADGES[:-1]]
+        badge_level = np.select([gap >= lower for lower in lowers], range(len(lowers)), default=len(lowers))
+        columns['gap_badge_counts'] = self.histogram(index, badge_level, size, len(Review.GAP_BADGES))
+        columns['expectation_histogram'] = self.histogram(index, reviews['expectation'].clip(0, 100), size, 101)
+        columns['satisfaction_histogram'] = self.histogram(index, reviews['satisfaction'].clip(0, 100), size, 101)
+
+        return movie_ids, columns
+
+    def histogram(self, index, bins, size, width):
+        """映画ごとのヒストグラム（size x width）"""
+        return np.bincount(index * width + bins, minlength=size * width).reshape(size, width)
+
+    def build_stats(self, movie_ids, columns):
+        """集計値をMovieScoreStatsインスタンスに詰める"""
+        integer_fields = {
+            name for name in columns
+            if not name.endswith(('reflected_sum', 'golden_sum'))
+        }
+        column_lists = {
+            name: (values.astype(np.int64) if name in integer_fields else values).tolist()
+            for name, values in columns.items()
+        }
+        now = timezone.now()
+        return [
+            MovieScoreStats(
+                movie_id=movie_id,
+                updated_at=now,
+                **{name: values[i] for name, values in column_lists.items()}
+            )
+            for i, movie_id in enumerate(movie_ids.tolist())
+        ]
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        started = time.perf_counter()
+
+        self.stdout.write('📥 レビューを読み込み中...')
+        reviews = self.load_reviews(batch_size)
+        loaded = time.perf_counter()
+        self.stdout.write(f'  {len(reviews)}件（{loaded - started:.2f}秒）')
+
+        movie_ids, columns = self.compute(reviews)
+        stats = self.build_stats(movie_ids, columns)
+        computed = time.perf_counter()
+        self.stdout.write(f'🧮 {len(stats)}本の映画を集計（{computed - loaded:.2f}秒）')
+
+        fields = list(columns)
+        with transaction.atomic():
+            existing_ids = set(MovieScoreStats.objects.values_list('movie_id', flat=True))
+            to_update = [s for s in stats if s.movie_id in existing_ids]
+            to_create = [s for s in stats if s.movie_id not in existing_ids]
+
+            MovieScoreStats.objects.bulk_update(to_update, fields + ['updated_at'], batch_size=batch_size)
+            MovieScoreStats.objects.bulk_create(to_create, batch_size=batch_size)
+            Movie.objects.bulk_update(
+                [Movie(pk=s.movie_id, **s.movie_sort_columns()) for s in stats],
+                MOVIE_SORT_FIELDS,
+                batch_size=batch_size,
+            )
+
+            # レビューがすべて消えた映画は空の集計に戻す
+            stale_ids = sorted(existing_ids - set(movie_ids.tolist()))
+            for start in range(0, len(stale_ids), batch_size):
+                MovieScoreStats.objects.filter(
+                    movie_id__in=stale_ids[start:start + batch_size]
+                ).update(
+                    updated_at=timezone.now(),
+                    gap_badge_counts=empty_gap_badge_counts(),
+                    expectation_histogram=empty_score_histogram(),
+                    satisfaction_histogram=empty_score_histogram(),
+                    **{name: 0 for name in fields if name not in HISTOGRAM_FIELDS}
+                )
+                Movie.objects.filter(
+                    pk__in=stale_ids[start:start + batch_size]
+                ).update(**MovieScoreStats().movie_sort_columns())
+
+        self.stdout.write(self.style.SUCCESS(f'\n🎉 完了！（合計 {time.perf_counter() - started:.2f}秒）'))
+        self.stdout.write(f'  更新: {len(to_update)}本')
+        self.stdout.write(f'  新規作成: {len(to_create)}本')
+        self.stdout.write(f'  リセット: {len(stale_ids)}本')
@@ -0,0 +1,75 @@
+# reviews/management/commands/sync_tmdb_changes.py
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from reviews.models import SyncCheckpoint
+from reviews.tmdb import TMDbClient, TMDbError
+from reviews.tmdb.sync import CHANGES_CHECKPOINT, change_windows, changed_movie_ids, sync_movies
+
+
+class Command(BaseCommand):
+    help = 'TMDbの変更フィードから、前回の同期以降に変わった映画だけを更新'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            type=date.fromisoformat,
+            help='この日（YYYY-MM-DD）以降の変更を同期する（省略時は前回の同期日から）'
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=1,
+            help='一度も同期していないとき、何日前からの変更を同期するか'
+        )
+
+    def handle(self, *args, **options):
+        # 変わったと分かっている映画なので、ディスクキャッシュは毎回再検証する
+        client = TMDbClient(cache_ttl=0)
+        if not client.api_key:
+            self.stdout.write(self.style.ERROR('❌ TMDB_API_KEYが設定されていません'))
+            return
+
+        today = timezone.localdate()
+        # 前回の同期日の変更も取り直す（その日のうちの同期後の変更を取りこぼさないように）
+        start_date = (
+            options['since']
+            or SyncCheckpoint.get(CHANGES_CHECKPOINT)
+            or today - timedelta(days=options['days'])
+        )
+
+        self.stdout.write(f'🔄 {start_date} 〜 {today} の変更を同期します...')
+
+        total_updated = 0
+        # 複数の期間に載った映画は1回だけ取り直す
+        synced_ids = set()
+        for window_start, window_end in change_windows(start_date, today):
+            try:
+                tmdb_ids = changed_movie_ids(client, window_start, window_end)
+            except TMDbError as e:
+                self.stdout.write(self.style.ERROR(f'❌ 変更フィードを取得できませんでした（{window_start}〜）: {e}'))
+                return
+
+            result = sync_movies(client, tmdb_ids - synced_ids)
+            synced_ids |= tmdb_ids
+            total_updated += result.updated
+
+            self.stdout.write(
+                f'  📅 {window_start}〜{window_end}: 変更 {result.changed}本 / 手元 {result.held}本 / '
+                f'更新 {result.updated}本'
+            )
+            if result.failed:
+                # 取れなかった映画を次の実行で取り直すよう、この期間からチェックポイントを進めない
+                self.stdout.write(self.style.ERROR(
+                    f'❌ 取得失敗: {result.failed}本（{window_start}〜 は次の実行でやり直します）'
+                ))
+                return
+            SyncCheckpoint.advance(CHANGES_CHECKPOINT, window_end)
+
+        self.stdout.write(self.style.SUCCESS(f'\n🎉 完了！ {total_updated}本の映画を更新しました'))
+        self.stdout.write(
+            f'🌐 APIリクエスト: {client.request_count}回（リトライ {client.retry_count}回・失敗 {client.error_count}回・'
+            f'キャッシュ {client.cache_hit_count}回）'
+        )
@@ -0,0 +1,25 @@
+# reviews/management/commands/warm_search_cache.py
+from django.core.management.base import BaseCommand
+from reviews.search import WARM_QUERY_COUNT, warm_search_cache
+
+
+class Command(BaseCommand):
+    help = 'よく検索されるクエリの検索結果を事前にキャッシュする（デプロイ・インポート後に実行）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=WARM_QUERY_COUNT,
+            help='キャッシュするクエリ数（検索回数の多い順）'
+        )
+        parser.add_argument(
+            '--refresh',
+            action='store_true',
+            help='キャッシュ済みの結果も作り直す'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'🔥 検索回数の多い上位{options["top"]}クエリをキャッシュします...')
+        count = warm_search_cache(options['top'], refresh=options['refresh'])
+        self.stdout.write(self.style.SUCCESS(f'\n🎉 完了！ {count}クエリをキャッシュしました'))
@@ -0,0 +1,84 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_score_stats(apps, schema_editor):
+    """既存レビューから集計を作成"""
+    Review = apps.get_model('reviews', 'Review')
+    MovieScoreStats = apps.get_model('reviews', 'MovieScoreStats')
+
+    totals = {}
+    rows = Review.objects.filter(satisfaction__isnull=False).values_list(
+        'movie_id', 'expectation', 'satisfaction', 'user__userprofile__is_movie_buff'
+    )
+    for movie_id, expectation, satisfaction, is_movie_buff in rows:
+        gap = satisfaction - expectation
+        if gap > 0:
+            reflected = min(100, round(satisfaction + gap * 0.5, 1))
+        else:
+            reflected = max(0, round(satisfaction + gap * 0.5, 1))
+        values = {
+            'review_count': 1,
+            'reflected_sum': reflected,
+            'golden_sum': round((expectation + satisfaction) / 2, 1),
+            'gap_sum': gap,
+            'positive_count': 1 if gap > 10 else 0,
+            'negative_count': 1 if gap < -10 else 0,
+        }
+        prefixes = ['']
+        if is_movie_buff is True:
+            prefixes.append('buff_')
+        elif is_movie_buff is False:
+            prefixes.append('casual_')
+
+        movie_totals = totals.setdefault(movie_id, {})
+        for prefix in prefixes:
+            for name, value in values.items():
+                movie_totals[prefix + name] = movie_totals.get(prefix + name, 0) + value
+
+    MovieScoreStats.objects.bulk_create([
+        MovieScoreStats(movie_id=movie_id, **movie_totals)
+        for movie_id, movie_totals in totals.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0022_contactmessage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovieScoreStats',
+            fields=[
+                ('movie', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='score_stats', serialize=False, to='reviews.movie', verbose_name='映画')),
+                ('review_count', models.IntegerField(default=0, verbose_name='レビュー数')),
+                ('reflected_sum', models.FloatField(default=0, verbose_name='反映スコア合計')),
+                ('golden_sum', models.FloatField(default=0, verbose_name='ゴールデンスコア合計')),
+                ('gap_sum', models.IntegerField(default=0, verbose_name='ギャップ合計')),
+                ('positive_count', models.IntegerField(default=0, verbose_name='期待を超えた件数')),
+                ('negative_count', models.IntegerField(default=0, verbose_name='期待を下回った件数')),
+                ('buff_review_count', models.IntegerField(default=0, verbose_name='映画通レビュー数')),
+                ('buff_reflected_sum', models.FloatField(default=0, verbose_name='映画通反映スコア合計')),
+                ('buff_golden_sum', models.FloatField(default=0, verbose_name='映画通ゴールデンスコア合計')),
+                ('buff_gap_sum', models.IntegerField(default=0, verbose_name='映画通ギャップ合計')),
+                ('buff_positive_count', models.IntegerField(default=0, verbose_name='映画通期待を超えた件数')),
+                ('buff_negative_count', models.IntegerField(default=0, verbose_name='映画通期待を下回った件数')),
+                ('casual_review_count', models.IntegerField(default=0, verbose_name='ライトレビュー数')),
+                ('casual_reflected_sum', models.FloatField(default=0, verbose_name='ライト反映スコア合計')),
+                ('casual_golden_sum', models.FloatField(default=0, verbose_name='ライトゴールデンスコア合計')),
+                ('casual_gap_sum', models.IntegerField(default=0, verbose_name='ライトギャップ合計')),
+                ('casual_positive_count', models.IntegerField(default=0, verbose_name='ライト期待を超えた件数')),
+                ('casual_negative_count', models.IntegerField(default=0, verbose_name='ライト期待を下回った件数')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新日時')),
+            ],
+            options={
+                'verbose_name': 'スコア集計',
+                'verbose_name_plural': 'スコア集計',
+            },
+        ),
+        migrations.RunPython(build_score_stats, migrations.RunPython.noop),
+    ]
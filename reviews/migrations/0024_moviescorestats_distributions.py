@@ -0,0 +1,57 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:24
+
+import reviews.models
+from django.db import migrations, models
+
+
+def build_distributions(apps, schema_editor):
+    """既存レビューから分布を作成"""
+    Review = apps.get_model('reviews', 'Review')
+    MovieScoreStats = apps.get_model('reviews', 'MovieScoreStats')
+
+    badge_lowers = [30, 10, -9, -29]
+    stats_by_movie = {stats.movie_id: stats for stats in MovieScoreStats.objects.all()}
+    rows = Review.objects.filter(satisfaction__isnull=False).values_list(
+        'movie_id', 'expectation', 'satisfaction'
+    )
+    for movie_id, expectation, satisfaction in rows:
+        stats = stats_by_movie.get(movie_id)
+        if stats is None:
+            continue
+        gap = satisfaction - expectation
+        level = next((i for i, lower in enumerate(badge_lowers) if gap >= lower), len(badge_lowers))
+        stats.gap_badge_counts[level] += 1
+        stats.expectation_histogram[min(max(expectation, 0), 100)] += 1
+        stats.satisfaction_histogram[min(max(satisfaction, 0), 100)] += 1
+
+    MovieScoreStats.objects.bulk_update(
+        stats_by_movie.values(),
+        ['gap_badge_counts', 'expectation_histogram', 'satisfaction_histogram'],
+        batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0023_moviescorestats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='moviescorestats',
+            name='expectation_histogram',
+            field=models.JSONField(default=reviews.models.empty_score_histogram, verbose_name='期待値の分布'),
+        ),
+        migrations.AddField(
+            model_name='moviescorestats',
+            name='gap_badge_counts',
+            field=models.JSONField(default=reviews.models.empty_gap_badge_counts, verbose_name='ギャップバッジ別件数'),
+        ),
+        migrations.AddField(
+            model_name='moviescorestats',
+            name='satisfaction_histogram',
+            field=models.JSONField(default=reviews.models.empty_score_histogram, verbose_name='満足度の分布'),
+        ),
+        migrations.RunPython(build_distributions, migrations.RunPython.noop),
+    ]
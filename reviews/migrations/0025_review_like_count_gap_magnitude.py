@@ -0,0 +1,51 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_review_sort_keys(apps, schema_editor):
+    """既存レビューのいいね数・ギャップの大きさを設定"""
+    Review = apps.get_model('reviews', 'Review')
+
+    reviews = list(Review.objects.annotate(likes_total=models.Count('likes')))
+    for review in reviews:
+        review.like_count = review.likes_total
+        if review.satisfaction is not None:
+            review.gap_magnitude = abs(review.satisfaction - review.expectation)
+
+    Review.objects.bulk_update(reviews, ['like_count', 'gap_magnitude'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0024_moviescorestats_distributions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='gap_magnitude',
+            field=models.IntegerField(default=0, verbose_name='ギャップの大きさ'),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='like_count',
+            field=models.IntegerField(default=0, verbose_name='いいね数'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['movie', '-created_at', '-id'], name='review_movie_newest_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['movie', '-like_count', '-id'], name='review_movie_likes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['movie', '-gap_magnitude', '-id'], name='review_movie_gap_idx'),
+        ),
+        migrations.RunPython(fill_review_sort_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0025_review_like_count_gap_magnitude'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='column',
+            name='content_version',
+            field=models.PositiveIntegerField(default=0, verbose_name='コンテンツバージョン'),
+        ),
+        migrations.AddField(
+            model_name='discussion',
+            name='content_version',
+            field=models.PositiveIntegerField(default=0, verbose_name='コンテンツバージョン'),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='content_version',
+            field=models.PositiveIntegerField(default=0, verbose_name='コンテンツバージョン'),
+        ),
+    ]
@@ -0,0 +1,90 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+FTS_TABLE = 'reviews_movie_fts'
+GIN_INDEX = 'movie_search_document_gin'
+
+
+def create_search_index(apps, schema_editor):
+    """DBごとの検索インデックスを作成（PostgreSQL: GIN / SQLite: FTS5）"""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        from django.contrib.postgres.indexes import GinIndex
+        from django.contrib.postgres.search import SearchVector
+
+        # PostgresSearchEngine.document_vector() と同じ式
+        vector = (
+            SearchVector('title', weight='A', config='simple')
+            + SearchVector('people', weight='B', config='simple')
+            + SearchVector('overview', weight='C', config='simple')
+        )
+        MovieSearchDocument = apps.get_model('reviews', 'MovieSearchDocument')
+        schema_editor.add_index(MovieSearchDocument, GinIndex(vector, name=GIN_INDEX))
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(title, people, overview, tokenize='trigram')"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {GIN_INDEX}')
+    elif vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+def fill_search_documents(apps, schema_editor):
+    """既存の映画の検索ドキュメントを作成"""
+    Movie = apps.get_model('reviews', 'Movie')
+    MovieSearchDocument = apps.get_model('reviews', 'MovieSearchDocument')
+
+    now = timezone.now()
+    documents = []
+    for movie in Movie.objects.select_related('director').prefetch_related('cast'):
+        people = [movie.director.name] if movie.director else []
+        people += [person.name for person in movie.cast.all()]
+        documents.append(MovieSearchDocument(
+            movie_id=movie.pk,
+            title=' '.join(filter(None, [movie.title, movie.original_title])),
+            people=' '.join(people),
+            overview=movie.overview,
+            updated_at=now,
+        ))
+    MovieSearchDocument.objects.bulk_create(documents, batch_size=500)
+
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, title, people, overview) '
+            'SELECT movie_id, title, people, overview FROM reviews_moviesearchdocument'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0026_content_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovieSearchDocument',
+            fields=[
+                ('movie', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='reviews.movie', verbose_name='映画')),
+                ('title', models.TextField(blank=True, verbose_name='タイトル・原題')),
+                ('people', models.TextField(blank=True, verbose_name='監督・キャスト名')),
+                ('overview', models.TextField(blank=True, verbose_name='概要')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新日時')),
+            ],
+            options={
+                'verbose_name': '検索ドキュメント',
+                'verbose_name_plural': '検索ドキュメント',
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(fill_search_documents, migrations.RunPython.noop),
+    ]
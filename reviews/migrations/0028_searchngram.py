@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0027_moviesearchdocument'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchNgram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.CharField(choices=[('title', 'タイトル・原題'), ('people', '監督・キャスト名')], max_length=10, verbose_name='対象')),
+                ('gram', models.CharField(max_length=3, verbose_name='n-gram')),
+                ('postings', models.BinaryField(verbose_name='映画IDリスト')),
+                ('doc_count', models.PositiveIntegerField(default=0, verbose_name='映画数')),
+            ],
+            options={
+                'verbose_name': '検索n-gram',
+                'verbose_name_plural': '検索n-gram',
+                'unique_together': {('gram', 'field')},
+            },
+        ),
+    ]
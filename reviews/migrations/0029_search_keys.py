@@ -0,0 +1,80 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:36
+
+from django.db import migrations, models
+
+from reviews.normalization import normalize_search_key, normalize_search_text
+
+
+def fill_search_keys(apps, schema_editor):
+    """既存の映画・人物の検索キーを設定"""
+    Movie = apps.get_model('reviews', 'Movie')
+    Person = apps.get_model('reviews', 'Person')
+
+    movies = list(Movie.objects.only('title', 'original_title'))
+    for movie in movies:
+        movie.title_key = normalize_search_key(movie.title)[:200]
+        movie.original_title_key = normalize_search_key(movie.original_title)[:200]
+    Movie.objects.bulk_update(movies, ['title_key', 'original_title_key'], batch_size=500)
+
+    people = list(Person.objects.only('name'))
+    for person in people:
+        person.name_key = normalize_search_key(person.name)[:100]
+    Person.objects.bulk_update(people, ['name_key'], batch_size=500)
+
+
+def normalize_search_documents(apps, schema_editor):
+    """検索ドキュメントを正規化済みのテキストに置き換える"""
+    MovieSearchDocument = apps.get_model('reviews', 'MovieSearchDocument')
+
+    documents = list(MovieSearchDocument.objects.all())
+    for document in documents:
+        document.title = normalize_search_text(document.title)
+        document.people = normalize_search_text(document.people)
+        document.overview = normalize_search_text(document.overview)
+    MovieSearchDocument.objects.bulk_update(documents, ['title', 'people', 'overview'], batch_size=500)
+
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DELETE FROM reviews_movie_fts')
+        schema_editor.execute(
+            'INSERT INTO reviews_movie_fts (rowid, title, people, overview) '
+            'SELECT movie_id, title, people, overview FROM reviews_moviesearchdocument'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0028_searchngram'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='original_title_key',
+            field=models.CharField(blank=True, editable=False, max_length=200, verbose_name='原題（検索キー）'),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='title_key',
+            field=models.CharField(blank=True, editable=False, max_length=200, verbose_name='タイトル（検索キー）'),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='name_key',
+            field=models.CharField(blank=True, editable=False, max_length=100, verbose_name='氏名（検索キー）'),
+        ),
+        migrations.RunPython(fill_search_keys, migrations.RunPython.noop),
+        migrations.RunPython(normalize_search_documents, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['title_key'], name='movie_title_key_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['original_title_key'], name='movie_original_title_key_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='person',
+            index=models.Index(fields=['name_key'], name='person_name_key_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0030_catalogversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchQueryStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('query', models.CharField(max_length=200, verbose_name='検索語（正規化済み）')),
+                ('params', models.CharField(blank=True, max_length=200, verbose_name='絞り込み・並び順')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='検索回数')),
+                ('last_searched_at', models.DateTimeField(auto_now=True, verbose_name='最終検索日時')),
+            ],
+            options={
+                'verbose_name': '検索クエリ統計',
+                'verbose_name_plural': '検索クエリ統計',
+                'indexes': [models.Index(fields=['-count'], name='search_query_count_idx')],
+                'unique_together': {('query', 'params')},
+            },
+        ),
+    ]
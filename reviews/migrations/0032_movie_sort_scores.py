@@ -0,0 +1,60 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:51
+
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+def fill_movie_sort_scores(apps, schema_editor):
+    """既存のスコア集計から並び替え用のスコアを書き写す"""
+    Movie = apps.get_model('reviews', 'Movie')
+    MovieScoreStats = apps.get_model('reviews', 'MovieScoreStats')
+
+    movies = []
+    for movie_id, review_count, reflected_sum, gap_sum in MovieScoreStats.objects.filter(
+        review_count__gt=0
+    ).values_list('movie_id', 'review_count', 'reflected_sum', 'gap_sum'):
+        movies.append(Movie(
+            pk=movie_id,
+            reflected_score_avg=reflected_sum / review_count,
+            gap_score_avg=gap_sum / review_count,
+            rated_review_count=review_count,
+        ))
+    Movie.objects.bulk_update(movies, ['reflected_score_avg', 'gap_score_avg', 'rated_review_count'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0031_searchquerystat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='gap_score_avg',
+            field=models.FloatField(blank=True, editable=False, null=True, verbose_name='平均ギャップ'),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='rated_review_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='レビュー数（集計済み）'),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='reflected_score_avg',
+            field=models.FloatField(blank=True, editable=False, null=True, verbose_name='平均反映スコア'),
+        ),
+        migrations.RunPython(fill_movie_sort_scores, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(models.OrderBy(django.db.models.functions.comparison.Coalesce('reflected_score_avg', models.Value(-1.0)), descending=True), models.OrderBy(models.F('popularity'), descending=True), name='movie_reflected_score_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(models.OrderBy(django.db.models.functions.comparison.Coalesce('gap_score_avg', models.Value(-1000.0)), descending=True), models.OrderBy(models.F('popularity'), descending=True), name='movie_gap_score_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(models.OrderBy(models.F('rated_review_count'), descending=True), models.OrderBy(models.F('popularity'), descending=True), name='movie_review_count_idx'),
+        ),
+    ]
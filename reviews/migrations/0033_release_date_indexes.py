@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0032_movie_sort_scores'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['release_date'], name='movie_release_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['jp_release_date'], name='movie_jp_release_date_idx'),
+        ),
+    ]
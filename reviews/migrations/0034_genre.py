@@ -0,0 +1,64 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from reviews.utils import GENRE_MAP
+
+
+def create_genres(apps, schema_editor):
+    """TMDbのジャンル一覧を登録"""
+    Genre = apps.get_model('reviews', 'Genre')
+    Genre.objects.bulk_create(
+        [Genre(tmdb_id=tmdb_id, name=name) for tmdb_id, name in GENRE_MAP.items()],
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0033_release_date_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Genre',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tmdb_id', models.IntegerField(unique=True, verbose_name='TMDbジャンルID')),
+                ('name', models.CharField(max_length=50, verbose_name='ジャンル名')),
+            ],
+            options={
+                'verbose_name': 'ジャンル',
+                'verbose_name_plural': 'ジャンル',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='MovieGenre',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('genre', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='reviews.genre', verbose_name='ジャンル')),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='reviews.movie', verbose_name='映画')),
+            ],
+            options={
+                'verbose_name': '映画のジャンル',
+                'verbose_name_plural': '映画のジャンル',
+            },
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='genres',
+            field=models.ManyToManyField(blank=True, related_name='movies', through='reviews.MovieGenre', to='reviews.genre', verbose_name='ジャンル'),
+        ),
+        migrations.AddIndex(
+            model_name='moviegenre',
+            index=models.Index(fields=['genre', 'movie'], name='moviegenre_genre_movie_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='moviegenre',
+            unique_together={('movie', 'genre')},
+        ),
+        migrations.RunPython(create_genres, migrations.RunPython.noop),
+    ]
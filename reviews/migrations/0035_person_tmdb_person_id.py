@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 02:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0034_genre'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='person',
+            name='tmdb_person_id',
+            field=models.IntegerField(blank=True, null=True, unique=True, verbose_name='TMDb人物ID'),
+        ),
+    ]
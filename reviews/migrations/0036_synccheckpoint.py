@@ -0,0 +1,26 @@
+# Generated by Django 5.2.7 on 2026-10-17 02:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0035_person_tmdb_person_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='同期名')),
+                ('synced_until', models.DateField(verbose_name='同期済みの日付')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新日時')),
+            ],
+            options={
+                'verbose_name': '同期チェックポイント',
+                'verbose_name_plural': '同期チェックポイント',
+            },
+        ),
+    ]
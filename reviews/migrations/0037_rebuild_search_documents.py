@@ -0,0 +1,53 @@
+# Generated by Django 5.2.7 on 2026-10-17 03:05
+
+from django.db import migrations
+
+from reviews.normalization import normalize_search_text
+
+BATCH_SIZE = 500
+
+
+def join_names(names):
+    # reviews.search.engines.join_names と同じ形式（1行1つのタイトル・名前）
+    return '\n'.join(filter(None, map(normalize_search_text, names)))
+
+
+def rebuild_search_documents(apps, schema_editor):
+    """検索ドキュメントを作り直す（タイトル・人物名は1行1つの形式、概要は長音記号の正規化を反映）"""
+    Movie = apps.get_model('reviews', 'Movie')
+    MovieSearchDocument = apps.get_model('reviews', 'MovieSearchDocument')
+
+    movie_ids = list(MovieSearchDocument.objects.order_by('movie_id').values_list('movie_id', flat=True))
+    for start in range(0, len(movie_ids), BATCH_SIZE):
+        movies = Movie.objects.filter(pk__in=movie_ids[start:start + BATCH_SIZE]).select_related(
+            'director'
+        ).prefetch_related('cast')
+        documents = []
+        for movie in movies:
+            people = [movie.director.name] if movie.director else []
+            people += [person.name for person in movie.cast.all()]
+            documents.append(MovieSearchDocument(
+                movie_id=movie.pk,
+                title=join_names([movie.title, movie.original_title]),
+                people=join_names(people),
+                overview=normalize_search_text(movie.overview),
+            ))
+        MovieSearchDocument.objects.bulk_update(documents, ['title', 'people', 'overview'], batch_size=BATCH_SIZE)
+
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DELETE FROM reviews_movie_fts')
+        schema_editor.execute(
+            'INSERT INTO reviews_movie_fts (rowid, title, people, overview) '
+            'SELECT movie_id, title, people, overview FROM reviews_moviesearchdocument'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0036_synccheckpoint'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_search_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.7 on 2026-10-17 05:40
+
+from collections import defaultdict
+
+import numpy as np
+from django.db import migrations
+
+from reviews.normalization import normalize_search_key
+
+BATCH_SIZE = 1000
+
+
+def ngrams(name):
+    # reviews.search.ngram.ngrams と同じ（検索キーの2-gram・3-gram、1文字ならその1文字）
+    key = normalize_search_key(name)
+    if len(key) == 1:
+        return {key}
+    return {key[i:i + size] for size in (2, 3) for i in range(len(key) - size + 1)}
+
+
+def build_search_ngrams(apps, schema_editor):
+    """検索ドキュメントからn-gram転置インデックスを作る（以降は検索ドキュメントの更新時に差分更新される）"""
+    MovieSearchDocument = apps.get_model('reviews', 'MovieSearchDocument')
+    SearchNgram = apps.get_model('reviews', 'SearchNgram')
+
+    postings = defaultdict(list)
+    documents = MovieSearchDocument.objects.order_by('movie_id').only('title', 'people')
+    for document in documents.iterator(chunk_size=BATCH_SIZE):
+        for field in ('title', 'people'):
+            grams = set()
+            for name in getattr(document, field).splitlines():
+                grams |= ngrams(name)
+            for gram in grams:
+                postings[(field, gram)].append(document.movie_id)
+
+    SearchNgram.objects.all().delete()
+    SearchNgram.objects.bulk_create(
+        [
+            SearchNgram(
+                field=field,
+                gram=gram,
+                postings=np.asarray(movie_ids, dtype='<u4').tobytes(),
+                doc_count=len(movie_ids),
+            )
+            for (field, gram), movie_ids in postings.items()
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0037_rebuild_search_documents'),
+    ]
+
+    operations = [
+        migrations.RunPython(build_search_ngrams, migrations.RunPython.noop),
+    ]
@@ -1,20 +1,80 @@
 # reviews/models.py - Gap Movies 完全版（全機能保持 + 100点満点対応）
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
+from django.utils import timezone
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 
+from .normalization import normalize_search_key
+
 
 class Person(models.Model):
     """映画製作者 (監督、キャスト、脚本家など)"""
     name = models.CharField(max_length=100, verbose_name="氏名")
+    tmdb_person_id = models.IntegerField(unique=True, null=True, blank=True, verbose_name="TMDb人物ID")
+    name_key = models.CharField(max_length=100, blank=True, editable=False, verbose_name="氏名（検索キー）")
 
     def __str__(self):
         return self.name
 
+    def set_search_key(self):
+        """検索キー（bulk_create では save() を通らないので直接呼ぶ）"""
+        self.name_key = normalize_search_key(self.name)[:100]
+
+    def save(self, *args, **kwargs):
+        self.set_search_key()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'name' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'name_key'}
+        super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = "人物"
         verbose_name_plural = "人物"
+        indexes = [
+            models.Index(fields=['name_key'], name='person_name_key_idx', opclasses=['varchar_pattern_ops']),
+        ]
+
+
+class Genre(models.Model):
+    """ジャンル（TMDbのジャンルID・日本語名）"""
+    tmdb_id = models.IntegerField(unique=True, verbose_name="TMDbジャンルID")
+    name = models.CharField(max_length=50, verbose_name="ジャンル名")
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        verbose_name = "ジャンル"
+        verbose_name_plural = "ジャンル"
+        ordering = ['name']
+
+
+# 並び替え用のスコア（レビューのない映画は最後）。SQLiteのインデックスは NULLS LAST を
+# 使えないので、NULLを範囲外の値に置き換えた式でインデックスを張り、同じ式で並べる
+REFLECTED_SCORE_ORDER = Coalesce('reflected_score_avg', Value(-1.0))
+GAP_SCORE_ORDER = Coalesce('gap_score_avg', Value(-1000.0))
+
+
+class MovieQuerySet(models.QuerySet):
+    """映画のクエリセット（集計済みのスコア列で並び替え）"""
+
+    def order_by_gap_score(self):
+        """反映スコアの高い順（レビューのない映画は最後）
+
+        集計済みの Movie.reflected_score_avg で並べるので、インデックスを順に読むだけで済む。
+        """
+        return self.order_by(REFLECTED_SCORE_ORDER.desc(), F('popularity').desc())
+
+    def order_by_average_gap(self):
+        """平均ギャップ（満足度 - 期待値）の大きい順（レビューのない映画は最後）"""
+        return self.order_by(GAP_SCORE_ORDER.desc(), F('popularity').desc())
+
+    def order_by_review_count(self):
+        """レビュー数の多い順"""
+        return self.order_by(F('rated_review_count').desc(), F('popularity').desc())
 
 
 class Movie(models.Model):
@@ -36,64 +96,77 @@ class Movie(models.Model):
     is_now_playing_jp = models.BooleanField(default=False, verbose_name="日本で現在公開中")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="登録日時")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="更新日時")
+    content_version = models.PositiveIntegerField(default=0, verbose_name="コンテンツバージョン")
+    title_key = models.CharField(max_length=200, blank=True, editable=False, verbose_name="タイトル（検索キー）")
+    original_title_key = models.CharField(max_length=200, blank=True, editable=False, verbose_name="原題（検索キー）")
+
+    # 並び替え用のスコア（MovieScoreStats の保存時に書き写す）
+    reflected_score_avg = models.FloatField(null=True, blank=True, editable=False, verbose_name="平均反映スコア")
+    gap_score_avg = models.FloatField(null=True, blank=True, editable=False, verbose_name="平均ギャップ")
+    rated_review_count = models.IntegerField(default=0, editable=False, verbose_name="レビュー数（集計済み）")
 
     director = models.ForeignKey(Person, on_delete=models.SET_NULL, null=True, blank=True, 
                                  related_name='directed_movies', verbose_name="監督")
     cast = models.ManyToManyField(Person, related_name='acted_movies', blank=True, verbose_name="キャスト")
+    genres = models.ManyToManyField(Genre, through='MovieGenre', related_name='movies', blank=True,
+                                    verbose_name="ジャンル")
+
+    objects = MovieQuerySet.as_manager()
 
     def __str__(self):
         return self.title
 
+    def set_search_keys(self):
+        """検索キー（表記ゆれを正規化したタイトル）。bulk_create では save() を通らないので直接呼ぶ"""
+        self.title_key = normalize_search_key(self.title)[:200]
+        self.original_title_key = normalize_search_key(self.original_title)[:200]
+
+    def save(self, *args, **kwargs):
+        self.set_search_keys()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            keys = {'title': 'title_key', 'original_title': 'original_title_key'}
+            kwargs['update_fields'] = {*update_fields, *(keys[f] for f in update_fields if f in keys)}
+        super().save(*args, **kwargs)
+
+    def get_score_stats(self):
+        """スコア集計（未集計の映画は空の集計）"""
+        try:
+            return self.score_stats
+        except MovieScoreStats.DoesNotExist:
+            return MovieScoreStats(movie=self)
+
     def average_score(self):
         """総合平均スコア（反映スコアベース）"""
-        reviews = self.review_set.filter(satisfaction__isnull=False)
-        if reviews.exists():
-            total = sum(review.reflected_score() for review in reviews)
-            return round(total / reviews.count(), 1)
-        return None
+        return self.get_score_stats().average('reflected_sum')
 
     def movie_buff_score(self):
         """映画通ユーザーの平均スコア"""
-        reviews = self.review_set.filter(
-            satisfaction__isnull=False, 
-            user__userprofile__is_movie_buff=True
-        )
-        if reviews.exists():
-            total = sum(review.reflected_score() for review in reviews)
-            return round(total / reviews.count(), 1)
-        return None
+        return self.get_score_stats().average('reflected_sum', segment='buff')
 
     def casual_user_score(self):
         """ライトユーザーの平均スコア"""
-        reviews = self.review_set.filter(
-            satisfaction__isnull=False, 
-            user__userprofile__is_movie_buff=False
-        )
-        if reviews.exists():
-            total = sum(review.reflected_score() for review in reviews)
-            return round(total / reviews.count(), 1)
-        return None
+        return self.get_score_stats().average('reflected_sum', segment='casual')
 
     def golden_score(self):
         """ゴールデンスコア（期待と満足のバランス）"""
-        reviews = self.review_set.filter(satisfaction__isnull=False)
-        if reviews.exists():
-            total = sum(review.golden_score() for review in reviews)
-            return round(total / reviews.count(), 1)
-        return None
+        return self.get_score_stats().average('golden_sum')
+
+    def get_overall_gap_score(self):
+        """一覧表示用の総合スコア（集計済みの平均反映スコア）"""
+        if self.reflected_score_avg is None:
+            return None
+        return round(self.reflected_score_avg, 1)
 
     def expectation_reaction(self):
         """期待との比較テキスト"""
-        reviews = self.review_set.filter(satisfaction__isnull=False)
-        if not reviews.exists():
+        stats = self.get_score_stats()
+        total = stats.review_count
+        if not total:
             return None
-        
-        total = reviews.count()
-        positive = sum(1 for r in reviews if r.gap_score() and r.gap_score() > 10)
-        negative = sum(1 for r in reviews if r.gap_score() and r.gap_score() < -10)
-        
-        positive_percent = round((positive / total) * 100)
-        negative_percent = round((negative / total) * 100)
+
+        positive_percent = round((stats.positive_count / total) * 100)
+        negative_percent = round((stats.negative_count / total) * 100)
         
         if positive_percent > 50:
             return f"この作品は期待より良かった人が多いです（{positive_percent}%の人が期待を超えたと評価）"
@@ -106,28 +179,54 @@ class Movie(models.Model):
     @property
     def review_count(self):
         """レビュー数"""
-        return self.review_set.filter(satisfaction__isnull=False).count()
+        return self.get_score_stats().review_count
 
     @property
     def movie_buff_review_count(self):
         """映画通のレビュー数"""
-        return self.review_set.filter(
-            satisfaction__isnull=False,
-            user__userprofile__is_movie_buff=True
-        ).count()
+        return self.get_score_stats().buff_review_count
 
     @property
     def casual_review_count(self):
         """ライトユーザーのレビュー数"""
-        return self.review_set.filter(
-            satisfaction__isnull=False,
-            user__userprofile__is_movie_buff=False
-        ).count()
+        return self.get_score_stats().casual_review_count
 
     class Meta:
         verbose_name = "映画"
         verbose_name_plural = "映画"
         ordering = ['-popularity']
+        indexes = [
+            models.Index(fields=['title_key'], name='movie_title_key_idx', opclasses=['varchar_pattern_ops']),
+            models.Index(fields=['original_title_key'], name='movie_original_title_key_idx',
+                         opclasses=['varchar_pattern_ops']),
+            models.Index(fields=['release_date'], name='movie_release_date_idx'),
+            models.Index(fields=['jp_release_date'], name='movie_jp_release_date_idx'),
+            models.Index(REFLECTED_SCORE_ORDER.desc(), F('popularity').desc(), name='movie_reflected_score_idx'),
+            models.Index(GAP_SCORE_ORDER.desc(), F('popularity').desc(), name='movie_gap_score_idx'),
+            models.Index(F('rated_review_count').desc(), F('popularity').desc(),
+                         name='movie_review_count_idx'),
+        ]
+
+
+class MovieGenre(models.Model):
+    """映画とジャンルの中間テーブル
+
+    (movie, genre) の一意制約で映画→ジャンル、(genre, movie) のインデックスで
+    ジャンル→映画をインデックスだけで引ける。
+    """
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, verbose_name="映画")
+    genre = models.ForeignKey(Genre, on_delete=models.CASCADE, verbose_name="ジャンル")
+
+    def __str__(self):
+        return f"{self.movie_id}: {self.genre_id}"
+
+    class Meta:
+        verbose_name = "映画のジャンル"
+        verbose_name_plural = "映画のジャンル"
+        unique_together = ['movie', 'genre']
+        indexes = [
+            models.Index(fields=['genre', 'movie'], name='moviegenre_genre_movie_idx'),
+        ]
 
 
 class UserProfile(models.Model):
@@ -156,9 +255,20 @@ class Review(models.Model):
     expectation = models.IntegerField(default=50, verbose_name="期待値メーター（0-100）")
     satisfaction = models.IntegerField(null=True, blank=True, verbose_name="満足度スコア（0-100）")
     review_text = models.TextField(verbose_name="レビュー本文")
+    like_count = models.IntegerField(default=0, verbose_name="いいね数")
+    gap_magnitude = models.IntegerField(default=0, verbose_name="ギャップの大きさ")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="投稿日時")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="更新日時")
 
+    def save(self, *args, **kwargs):
+        # 並び替え用（ギャップの大きい順）
+        gap = self.gap_score()
+        self.gap_magnitude = abs(gap) if gap is not None else 0
+
+        # スコア集計（signals.py）をレビュー本体と同じトランザクションで更新する
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     def gap_score(self):
         """ギャップスコア"""
         if self.satisfaction is not None:
@@ -187,39 +297,35 @@ class Review(models.Model):
             score = self.satisfaction + (gap * 0.5)
             return max(0, round(score, 1))
 
+    # ギャップバッジ（ギャップの下限, テキスト, CSSクラス）
+    GAP_BADGES = [
+        (30, "期待を大きく超えた", "success"),
+        (10, "期待を超えた", "info"),
+        (-9, "期待通り", "warning"),
+        (-29, "ちょっと期待外れ", "danger"),
+        (None, "かなり期待外れ", "dark"),
+    ]
+
+    @classmethod
+    def gap_badge_level(cls, gap):
+        """ギャップバッジの段階（0: 期待を大きく超えた 〜 4: かなり期待外れ）"""
+        for level, (lower, _, _) in enumerate(cls.GAP_BADGES):
+            if lower is None or gap >= lower:
+                return level
+
     def gap_badge(self):
         """ギャップバッジのテキスト"""
         gap = self.gap_score()
         if gap is None:
             return None
-        
-        if gap >= 30:
-            return "期待を大きく超えた"
-        elif gap >= 10:
-            return "期待を超えた"
-        elif gap >= -9:
-            return "期待通り"
-        elif gap >= -29:
-            return "ちょっと期待外れ"
-        else:
-            return "かなり期待外れ"
+        return self.GAP_BADGES[self.gap_badge_level(gap)][1]
 
     def gap_badge_class(self):
         """ギャップバッジのCSSクラス"""
         gap = self.gap_score()
         if gap is None:
             return "secondary"
-        
-        if gap >= 30:
-            return "success"
-        elif gap >= 10:
-            return "info"
-        elif gap >= -9:
-            return "warning"
-        elif gap >= -29:
-            return "danger"
-        else:
-            return "dark"
+        return self.GAP_BADGES[self.gap_badge_level(gap)][2]
 
     def __str__(self):
         return f"{self.user.username}の{self.movie.title}レビュー"
@@ -229,6 +335,282 @@ class Review(models.Model):
         verbose_name_plural = "レビュー"
         ordering = ['-created_at']
         unique_together = ['movie', 'user']
+        indexes = [
+            # 映画詳細のレビュー一覧（カーソルページネーション）
+            models.Index(fields=['movie', '-created_at', '-id'], name='review_movie_newest_idx'),
+            models.Index(fields=['movie', '-like_count', '-id'], name='review_movie_likes_idx'),
+            models.Index(fields=['movie', '-gap_magnitude', '-id'], name='review_movie_gap_idx'),
+        ]
+
+
+def empty_gap_badge_counts():
+    return [0] * len(Review.GAP_BADGES)
+
+
+def empty_score_histogram():
+    return [0] * 101
+
+
+class MovieScoreStats(models.Model):
+    """映画ごとのスコア集計（レビューの投稿・編集・削除のたびに差分更新）"""
+    # セグメント: 全体 / 映画通 / ライトユーザー
+    SEGMENT_PREFIXES = {
+        'all': '',
+        'buff': 'buff_',
+        'casual': 'casual_',
+    }
+
+    movie = models.OneToOneField(Movie, on_delete=models.CASCADE, primary_key=True,
+                                 related_name='score_stats', verbose_name="映画")
+
+    # 全体
+    review_count = models.IntegerField(default=0, verbose_name="レビュー数")
+    reflected_sum = models.FloatField(default=0, verbose_name="反映スコア合計")
+    golden_sum = models.FloatField(default=0, verbose_name="ゴールデンスコア合計")
+    gap_sum = models.IntegerField(default=0, verbose_name="ギャップ合計")
+    positive_count = models.IntegerField(default=0, verbose_name="期待を超えた件数")
+    negative_count = models.IntegerField(default=0, verbose_name="期待を下回った件数")
+
+    # 映画通
+    buff_review_count = models.IntegerField(default=0, verbose_name="映画通レビュー数")
+    buff_reflected_sum = models.FloatField(default=0, verbose_name="映画通反映スコア合計")
+    buff_golden_sum = models.FloatField(default=0, verbose_name="映画通ゴールデンスコア合計")
+    buff_gap_sum = models.IntegerField(default=0, verbose_name="映画通ギャップ合計")
+    buff_positive_count = models.IntegerField(default=0, verbose_name="映画通期待を超えた件数")
+    buff_negative_count = models.IntegerField(default=0, verbose_name="映画通期待を下回った件数")
+
+    # ライトユーザー
+    casual_review_count = models.IntegerField(default=0, verbose_name="ライトレビュー数")
+    casual_reflected_sum = models.FloatField(default=0, verbose_name="ライト反映スコア合計")
+    casual_golden_sum = models.FloatField(default=0, verbose_name="ライトゴールデンスコア合計")
+    casual_gap_sum = models.IntegerField(default=0, verbose_name="ライトギャップ合計")
+    casual_positive_count = models.IntegerField(default=0, verbose_name="ライト期待を超えた件数")
+    casual_negative_count = models.IntegerField(default=0, verbose_name="ライト期待を下回った件数")
+
+    # 分布（全体）: ギャップバッジ5段階 / 期待値・満足度の0〜100点
+    gap_badge_counts = models.JSONField(default=empty_gap_badge_counts, verbose_name="ギャップバッジ別件数")
+    expectation_histogram = models.JSONField(default=empty_score_histogram, verbose_name="期待値の分布")
+    satisfaction_histogram = models.JSONField(default=empty_score_histogram, verbose_name="満足度の分布")
+
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="更新日時")
+
+    def __str__(self):
+        return f"{self.movie.title}のスコア集計"
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        Movie.objects.filter(pk=self.movie_id).update(**self.movie_sort_columns())
+
+    def movie_sort_columns(self):
+        """Movie に書き写す並び替え用のスコア"""
+        if not self.review_count:
+            return {'reflected_score_avg': None, 'gap_score_avg': None, 'rated_review_count': 0}
+        return {
+            'reflected_score_avg': self.reflected_sum / self.review_count,
+            'gap_score_avg': self.gap_sum / self.review_count,
+            'rated_review_count': self.review_count,
+        }
+
+    def average(self, field, segment='all'):
+        """セグメントごとの平均値（レビューがなければNone）"""
+        prefix = self.SEGMENT_PREFIXES[segment]
+        count = getattr(self, f'{prefix}review_count')
+        if not count:
+            return None
+        return round(getattr(self, f'{prefix}{field}') / count, 1)
+
+    @classmethod
+    def contribution(cls, expectation, satisfaction, is_movie_buff):
+        """レビュー1件が集計に加える値（満足度未入力のレビューは集計対象外）"""
+        if satisfaction is None:
+            return {}
+
+        review = Review(expectation=expectation, satisfaction=satisfaction)
+        gap = review.gap_score()
+        values = {
+            'review_count': 1,
+            'reflected_sum': review.reflected_score(),
+            'golden_sum': review.golden_score(),
+            'gap_sum': gap,
+            'positive_count': 1 if gap > 10 else 0,
+            'negative_count': 1 if gap < -10 else 0,
+        }
+
+        # プロフィール未作成のユーザーは全体のみに集計
+        segments = ['all']
+        if is_movie_buff is True:
+            segments.append('buff')
+        elif is_movie_buff is False:
+            segments.append('casual')
+
+        return {
+            f'{cls.SEGMENT_PREFIXES[segment]}{name}': value
+            for segment in segments
+            for name, value in values.items()
+        }
+
+    def add_review(self, expectation, satisfaction, is_movie_buff, sign=1):
+        """レビュー1件分をこの集計に加算（sign=-1で減算）"""
+        contribution = self.contribution(expectation, satisfaction, is_movie_buff)
+        if not contribution:
+            return
+
+        for name, value in contribution.items():
+            setattr(self, name, getattr(self, name) + sign * value)
+
+        self.gap_badge_counts[Review.gap_badge_level(satisfaction - expectation)] += sign
+        self.expectation_histogram[min(max(expectation, 0), 100)] += sign
+        self.satisfaction_histogram[min(max(satisfaction, 0), 100)] += sign
+
+    @classmethod
+    def apply_review(cls, movie_id, expectation, satisfaction, is_movie_buff, sign=1):
+        """レビュー1件分を保存済みの集計に反映（行ロックして更新）"""
+        if satisfaction is None:
+            return
+
+        with transaction.atomic():
+            cls.objects.get_or_create(movie_id=movie_id)
+            stats = cls.objects.select_for_update().get(movie_id=movie_id)
+            stats.add_review(expectation, satisfaction, is_movie_buff, sign)
+            stats.save()
+
+    @classmethod
+    def rebuild(cls, movie_ids):
+        """指定した映画の集計をレビューから作り直す"""
+        stats_by_movie = {movie_id: cls(movie_id=movie_id) for movie_id in set(movie_ids)}
+
+        rows = Review.objects.filter(
+            movie_id__in=stats_by_movie,
+            satisfaction__isnull=False
+        ).values_list('movie_id', 'expectation', 'satisfaction', 'user__userprofile__is_movie_buff')
+
+        for movie_id, expectation, satisfaction, is_movie_buff in rows:
+            stats_by_movie[movie_id].add_review(expectation, satisfaction, is_movie_buff)
+
+        with transaction.atomic():
+            for stats in stats_by_movie.values():
+                stats.save()
+
+    def distribution(self):
+        """分布グラフ用のデータ"""
+        return {
+            'review_count': self.review_count,
+            'gap_badges': [
+                {'label': label, 'css_class': css_class, 'count': count}
+                for (_, label, css_class), count in zip(Review.GAP_BADGES, self.gap_badge_counts)
+            ],
+            'expectation_histogram': self.expectation_histogram,
+            'satisfaction_histogram': self.satisfaction_histogram,
+        }
+
+    class Meta:
+        verbose_name = "スコア集計"
+        verbose_name_plural = "スコア集計"
+
+
+class MovieSearchDocument(models.Model):
+    """全文検索用のドキュメント（reviews.search のエンジンが索引する）"""
+    movie = models.OneToOneField(Movie, on_delete=models.CASCADE, primary_key=True,
+                                 related_name='search_document', verbose_name="映画")
+    title = models.TextField(blank=True, verbose_name="タイトル・原題")
+    people = models.TextField(blank=True, verbose_name="監督・キャスト名")
+    overview = models.TextField(blank=True, verbose_name="概要")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="更新日時")
+
+    def __str__(self):
+        return f"{self.movie_id}: {self.title}"
+
+    class Meta:
+        verbose_name = "検索ドキュメント"
+        verbose_name_plural = "検索ドキュメント"
+
+
+class SearchNgram(models.Model):
+    """n-gram転置インデックスのポスティングリスト（reviews.search.ngram）"""
+    FIELD_CHOICES = [
+        ('title', 'タイトル・原題'),
+        ('people', '監督・キャスト名'),
+    ]
+
+    field = models.CharField(max_length=10, choices=FIELD_CHOICES, verbose_name="対象")
+    gram = models.CharField(max_length=3, verbose_name="n-gram")
+    postings = models.BinaryField(verbose_name="映画IDリスト")
+    doc_count = models.PositiveIntegerField(default=0, verbose_name="映画数")
+
+    def __str__(self):
+        return f"{self.field}:{self.gram} ({self.doc_count})"
+
+    class Meta:
+        verbose_name = "検索n-gram"
+        verbose_name_plural = "検索n-gram"
+        unique_together = ['gram', 'field']
+
+
+class CatalogVersion(models.Model):
+    """映画カタログのバージョン（検索インデックスの更新ごとに加算）
+
+    入力補完などワーカーごとに持つ検索用データの作り直しの判定に使う。1行だけのテーブル。
+    """
+    version = models.PositiveIntegerField(default=0, verbose_name="バージョン")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="更新日時")
+
+    @classmethod
+    def current(cls):
+        return cls.objects.filter(pk=1).values_list('version', flat=True).first() or 0
+
+    @classmethod
+    def bump(cls):
+        updated = cls.objects.filter(pk=1).update(version=F('version') + 1, updated_at=timezone.now())
+        if not updated:
+            cls.objects.get_or_create(pk=1, defaults={'version': 1})
+
+    def __str__(self):
+        return f"v{self.version}"
+
+    class Meta:
+        verbose_name = "カタログバージョン"
+        verbose_name_plural = "カタログバージョン"
+
+
+class SyncCheckpoint(models.Model):
+    """外部データとの同期がどこまで済んだか（sync_tmdb_changes などで使う）"""
+    name = models.CharField(max_length=50, unique=True, verbose_name="同期名")
+    synced_until = models.DateField(verbose_name="同期済みの日付")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="更新日時")
+
+    @classmethod
+    def get(cls, name):
+        return cls.objects.filter(name=name).values_list('synced_until', flat=True).first()
+
+    @classmethod
+    def advance(cls, name, synced_until):
+        cls.objects.update_or_create(name=name, defaults={'synced_until': synced_until})
+
+    def __str__(self):
+        return f"{self.name}: {self.synced_until}"
+
+    class Meta:
+        verbose_name = "同期チェックポイント"
+        verbose_name_plural = "同期チェックポイント"
+
+
+class SearchQueryStat(models.Model):
+    """検索クエリごとの検索回数（warm_search_cache で上位を事前にキャッシュする）"""
+    query = models.CharField(max_length=200, verbose_name="検索語（正規化済み）")
+    params = models.CharField(max_length=200, blank=True, verbose_name="絞り込み・並び順")
+    count = models.PositiveIntegerField(default=0, verbose_name="検索回数")
+    last_searched_at = models.DateTimeField(auto_now=True, verbose_name="最終検索日時")
+
+    def __str__(self):
+        return f"{self.query} {self.params} ({self.count})".strip()
+
+    class Meta:
+        verbose_name = "検索クエリ統計"
+        verbose_name_plural = "検索クエリ統計"
+        unique_together = ['query', 'params']
+        indexes = [
+            models.Index(fields=['-count'], name='search_query_count_idx'),
+        ]
 
 
 class CriticReview(models.Model):
@@ -299,6 +681,7 @@ class Column(models.Model):
     thumbnail = models.ImageField(upload_to='column_thumbnails/', blank=True, null=True, verbose_name="サムネイル")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="投稿日時")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="更新日時")
+    content_version = models.PositiveIntegerField(default=0, verbose_name="コンテンツバージョン")
 
     def __str__(self):
         return self.title
@@ -455,6 +838,7 @@ class Discussion(models.Model):
                                 related_name='discussions', verbose_name="関連映画")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="投稿日時")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="更新日時")
+    content_version = models.PositiveIntegerField(default=0, verbose_name="コンテンツバージョン")
 
     def __str__(self):
         return self.title
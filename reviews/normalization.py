@@ -0,0 +1,33 @@
+# reviews/normalization.py - 検索用の表記ゆれ正規化
+import unicodedata
+
+
+# カタカナ（ァ〜ヶ）をひらがなに寄せる
+KATAKANA_TO_HIRAGANA = {code: code - 0x60 for code in range(ord('ァ'), ord('ヶ') + 1)}
+
+# 長音記号は読みの揺れが大きいので取り除く（NFKC後は半角の「ｰ」も「ー」に、全角の「～」は「~」になる）
+LONG_VOWEL_MARKS = {'ー', '〜', '~'}
+
+
+def normalize_search_text(text):
+    """検索用の正規化（語の区切りは空白1つで残す）
+
+    NFKC（全角英数・半角カナの統一）→ 大文字小文字の無視 → カタカナをひらがなに
+    → 長音記号を削除 → 記号・句読点は空白に置き換え
+    """
+    text = unicodedata.normalize('NFKC', text or '').casefold().translate(KATAKANA_TO_HIRAGANA)
+
+    chars = []
+    for char in text:
+        if char in LONG_VOWEL_MARKS:
+            continue
+        if unicodedata.category(char)[0] in 'PSZC':
+            chars.append(' ')
+        else:
+            chars.append(char)
+    return ' '.join(''.join(chars).split())
+
+
+def normalize_search_key(text):
+    """検索キー（空白も除いたもの）。前方一致・完全一致の比較に使う"""
+    return normalize_search_text(text).replace(' ', '')
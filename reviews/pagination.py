@@ -0,0 +1,102 @@
+# reviews/pagination.py - レビュー一覧のカーソル（キーセット）ページネーションと件数上限付きページネーション
+import base64
+from datetime import datetime
+
+from django.core.paginator import Paginator
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+
+REVIEW_PAGE_SIZE = 20
+
+# 並び順: キー項目（降順 + id降順で並べる）と表示名
+REVIEW_SORTS = {
+    'newest': ('created_at', '新着順'),
+    'likes': ('like_count', 'いいね順'),
+    'gap': ('gap_magnitude', 'ギャップの大きい順'),
+}
+
+
+def encode_cursor(value, pk):
+    """最後に表示したレビューの位置をURLに載せられる文字列にする"""
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    return base64.urlsafe_b64encode(f'{value}|{pk}'.encode()).decode()
+
+
+def decode_cursor(cursor, field):
+    """カーソルを (キーの値, id) に戻す（不正な値ならNone）"""
+    try:
+        value, pk = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit('|', 1)
+        if field == 'created_at':
+            return datetime.fromisoformat(value), int(pk)
+        return int(value), int(pk)
+    except (ValueError, TypeError, AttributeError):
+        return None
+
+
+def paginate_reviews(queryset, sort='newest', cursor=None, page_size=REVIEW_PAGE_SIZE):
+    """1ページ分のレビューと次ページのカーソルを返す
+
+    OFFSETを使わず「前ページ最後の (キー, id) より後ろ」を条件にするので、
+    レビュー数が増えても各ページのコストは一定（review_movie_*_idx を使う）。
+    """
+    field = REVIEW_SORTS.get(sort, REVIEW_SORTS['newest'])[0]
+    queryset = queryset.order_by(f'-{field}', '-id')
+
+    position = decode_cursor(cursor, field) if cursor else None
+    if position:
+        value, pk = position
+        queryset = queryset.filter(
+            Q(**{f'{field}__lt': value}) | Q(**{field: value, 'id__lt': pk})
+        )
+
+    reviews = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(reviews) > page_size:
+        reviews = reviews[:page_size]
+        last = reviews[-1]
+        next_cursor = encode_cursor(getattr(last, field), last.pk)
+
+    return reviews, next_cursor
+
+
+# ========================================
+# 検索結果（件数を上限までしか数えない）
+# ========================================
+
+# 件数はここまで数える（超えたら「1000+件」と表示）
+COUNT_LIMIT = 1000
+
+
+class CappedPaginator(Paginator):
+    """件数を max_count までしか数えないPaginator
+
+    COUNT(*) を「LIMIT max_count + 1 したサブクエリ」に対して行うので、
+    1文字の検索などで全件に一致してもカタログ全体を数えない。
+    max_count 件を超えた分のページは表示しない。
+    """
+
+    def __init__(self, object_list, per_page, max_count=COUNT_LIMIT, **kwargs):
+        self.max_count = max_count
+        super().__init__(object_list, per_page, **kwargs)
+
+    @cached_property
+    def bounded_count(self):
+        """件数（最大 max_count + 1）"""
+        head = self.object_list[:self.max_count + 1]
+        if isinstance(head, QuerySet):
+            return head.count()
+        return len(head)
+
+    @cached_property
+    def count(self):
+        return min(self.bounded_count, self.max_count)
+
+    @property
+    def is_capped(self):
+        return self.bounded_count > self.max_count
+
+    @property
+    def count_display(self):
+        """表示用の件数（上限を超えたら「1000+」）"""
+        return f'{self.max_count}+' if self.is_capped else str(self.count)
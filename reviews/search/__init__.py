@@ -0,0 +1,13 @@
+# reviews/search - 映画検索（エンジンは settings.SEARCH_ENGINE で切り替え）
+from .engines import (
+    SEARCH_RESULT_LIMIT, BaseSearchEngine, PostgresSearchEngine, SQLiteFTS5Engine,
+    get_search_engine, update_search_index, remove_from_search_index, deferred_search_index,
+)
+from .query import SEARCH_PAGE_SIZE, MovieSearch, movie_page, filter_movie_ids, search_movie_ids, search_movies
+from .ngram import NgramSearchEngine, build_ngram_index
+from .autocomplete import AUTOCOMPLETE_LIMIT, CatalogIndexCache, autocomplete, autocomplete_cache
+from .facets import BROWSE_SORTS, FacetIndex, year_facets, build_facet_index, facet_index_cache
+from .cache import (
+    WARM_QUERY_COUNT, SearchParams, cached_search_ids, cached_year_facets, record_search_query, search_stats_buffer,
+    warm_search_cache,
+)
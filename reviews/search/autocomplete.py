@@ -0,0 +1,146 @@
+# reviews/search/autocomplete.py - 入力補完（ワーカーごとにメモリ上に持つ前方一致インデックス）
+import heapq
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from typing import NamedTuple
+
+from django.db.models import Max
+
+from reviews.models import Movie, Person, CatalogVersion
+from reviews.normalization import normalize_search_text, normalize_search_key
+
+
+AUTOCOMPLETE_LIMIT = 10
+# 1〜2文字の前方一致は候補が多いので、上位だけを作成時に求めておく
+PRECOMPUTED_PREFIX_LENGTH = 2
+# カタログのバージョンを確認する間隔（秒）
+VERSION_CHECK_INTERVAL = 5
+
+
+class Suggestion(NamedTuple):
+    kind: str  # 'movie' / 'person'
+    id: int
+    label: str
+    popularity: float
+
+
+def suggestion_keys(text):
+    """補完に使うキー（先頭からのキーに加え、各語の先頭から始まるキー）
+
+    「The Dark Knight」は「thedarkknight」「darkknight」「knight」で引ける。
+    """
+    words = normalize_search_text(text).split()
+    return {''.join(words[i:]) for i in range(len(words))}
+
+
+def best_suggestions(suggestions, limit):
+    """人気度の高い順に重複を除いて上位を返す"""
+    unique = {}
+    for suggestion in suggestions:
+        unique.setdefault((suggestion.kind, suggestion.id), suggestion)
+    return heapq.nlargest(limit, unique.values(), key=lambda s: s.popularity)
+
+
+class PrefixIndex:
+    """正規化キーの昇順配列をbisectで引く前方一致インデックス"""
+
+    def __init__(self, entries):
+        entries = sorted(entries, key=lambda entry: entry[0])
+        self.keys = [key for key, _ in entries]
+        self.suggestions = [suggestion for _, suggestion in entries]
+
+        by_prefix = {}
+        for key, suggestion in entries:
+            for length in range(1, min(len(key), PRECOMPUTED_PREFIX_LENGTH) + 1):
+                by_prefix.setdefault(key[:length], []).append(suggestion)
+        self.top = {
+            prefix: best_suggestions(suggestions, AUTOCOMPLETE_LIMIT)
+            for prefix, suggestions in by_prefix.items()
+        }
+
+    def __len__(self):
+        return len(self.keys)
+
+    def lookup(self, prefix, limit=AUTOCOMPLETE_LIMIT):
+        if not prefix:
+            return []
+        if len(prefix) <= PRECOMPUTED_PREFIX_LENGTH:
+            return self.top.get(prefix, [])[:limit]
+
+        start = bisect_left(self.keys, prefix)
+        end = bisect_right(self.keys, prefix + '\U0010ffff', lo=start)
+        return best_suggestions(self.suggestions[start:end], limit)
+
+
+def build_prefix_index():
+    """映画タイトル・原題・人物名から前方一致インデックスを作る"""
+    entries = []
+    for pk, title, original_title, popularity in Movie.objects.values_list(
+        'pk', 'title', 'original_title', 'popularity'
+    ).order_by():
+        suggestion = Suggestion('movie', pk, title, popularity)
+        for key in suggestion_keys(title) | suggestion_keys(original_title):
+            entries.append((key, suggestion))
+
+    # 人物の人気度は監督・出演した映画の人気度の最大値
+    person_popularity = {}
+    for relation in ('directed_movies', 'acted_movies'):
+        rows = Person.objects.annotate(
+            popularity=Max(f'{relation}__popularity')
+        ).filter(popularity__isnull=False).values_list('pk', 'popularity').order_by()
+        for pk, popularity in rows:
+            person_popularity[pk] = max(popularity, person_popularity.get(pk, 0))
+
+    for pk, name in Person.objects.values_list('pk', 'name').order_by():
+        suggestion = Suggestion('person', pk, name, person_popularity.get(pk, 0))
+        for key in suggestion_keys(name):
+            entries.append((key, suggestion))
+
+    return PrefixIndex(entries)
+
+
+class CatalogIndexCache:
+    """ワーカー（プロセス）ごとにメモリ上に持つ検索用インデックス
+
+    カタログのバージョンが変わっていたら次の検索時に build() で作り直す。
+    バージョンの確認は VERSION_CHECK_INTERVAL 秒に1回だけ。
+    max_age（秒）を指定すると、バージョンが同じでもその時間が過ぎたら作り直す。
+    """
+
+    def __init__(self, build, max_age=None):
+        self.build = build
+        self.max_age = max_age
+        self.index = None
+        self.version = None
+        self.built_at = 0
+        self.checked_at = 0
+        self.lock = threading.Lock()
+
+    def get_index(self):
+        now = time.monotonic()
+        if self.index is not None and now - self.checked_at < VERSION_CHECK_INTERVAL:
+            return self.index
+
+        with self.lock:
+            if self.index is None or now - self.checked_at >= VERSION_CHECK_INTERVAL:
+                version = CatalogVersion.current()
+                expired = self.max_age is not None and now - self.built_at >= self.max_age
+                if self.index is None or version != self.version or expired:
+                    self.index = self.build()
+                    self.version = version
+                    self.built_at = now
+                self.checked_at = now
+        return self.index
+
+    def clear(self):
+        with self.lock:
+            self.index = None
+
+
+autocomplete_cache = CatalogIndexCache(build_prefix_index)
+
+
+def autocomplete(query, limit=AUTOCOMPLETE_LIMIT):
+    """入力中のクエリの補完候補（人気度順）"""
+    return autocomplete_cache.get_index().lookup(normalize_search_key(query), min(limit, AUTOCOMPLETE_LIMIT))
@@ -0,0 +1,164 @@
+# reviews/search/cache.py - 検索結果キャッシュ（正規化した検索条件 → 並び順どおりの映画ID）
+import hashlib
+import threading
+import time
+from collections import Counter
+from typing import NamedTuple
+from urllib.parse import urlencode, parse_qsl
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from reviews.models import CatalogVersion, SearchQueryStat
+from reviews.normalization import normalize_search_text
+from .query import filter_movie_ids
+from .facets import year_facets
+
+
+SEARCH_SORTS = ('relevance', 'year_desc', 'year_asc', 'title', 'gap_score', 'gap_avg', 'review_count')
+# レビューで変わる並び順はカタログのバージョンでは無効にならないので短めに持つ
+SCORE_SORTS = {'gap_score', 'gap_avg', 'review_count'}
+SCORE_SORT_CACHE_TIMEOUT = 5 * 60
+# warm_search_cache で事前にキャッシュするクエリ数
+WARM_QUERY_COUNT = 100
+# 検索回数をワーカーのメモリに溜めてDBに書き込む間隔（秒）
+SEARCH_STATS_FLUSH_INTERVAL = 60
+# 公開年として受け付ける範囲
+MIN_YEAR, MAX_YEAR = 1, 9998
+
+
+def parse_year(value):
+    """公開年の指定（日付にできない年は指定なし）"""
+    try:
+        year = int(value)
+    except (TypeError, ValueError):
+        return None
+    return year if MIN_YEAR <= year <= MAX_YEAR else None
+
+
+class SearchParams(NamedTuple):
+    """正規化した検索条件（キャッシュのキー）"""
+    query: str
+    year_from: int | None = None
+    year_to: int | None = None
+    sort: str = 'relevance'
+
+    @classmethod
+    def normalize(cls, query='', year_from=None, year_to=None, sort='relevance'):
+        return cls(
+            normalize_search_text(query),
+            parse_year(year_from),
+            parse_year(year_to),
+            sort if sort in SEARCH_SORTS else 'relevance',
+        )
+
+    @classmethod
+    def from_stat(cls, stat):
+        return cls.normalize(stat.query, **dict(parse_qsl(stat.params)))
+
+    def filters(self):
+        """検索語以外の条件（既定値は省く）"""
+        filters = [('year_from', self.year_from), ('year_to', self.year_to)]
+        if self.sort != 'relevance':
+            filters.append(('sort', self.sort))
+        return urlencode([(name, value) for name, value in filters if value is not None])
+
+    def cache_key(self, version, prefix='search'):
+        digest = hashlib.sha1(f'{self.query}?{self.filters()}'.encode()).hexdigest()
+        return f'{prefix}:v{version}:{digest}'
+
+    def decade(self):
+        """年代ちょうど（1990〜1999年など）の指定ならその年代"""
+        if self.year_from is not None and self.year_from % 10 == 0 and self.year_to == self.year_from + 9:
+            return self.year_from
+        return None
+
+
+def cached_search_ids(params, refresh=False):
+    """検索条件に一致する映画ID（最大 SEARCH_RESULT_LIMIT + 1 件）
+
+    キーにカタログのバージョンを含めるので、インポートなどで索引が
+    更新されると古い結果は使われなくなる。
+    """
+    key = params.cache_key(CatalogVersion.current())
+    movie_ids = None if refresh else cache.get(key)
+    if movie_ids is None:
+        movie_ids = filter_movie_ids(*params)
+        timeout = SCORE_SORT_CACHE_TIMEOUT if params.sort in SCORE_SORTS else settings.SEARCH_CACHE_TIMEOUT
+        cache.set(key, movie_ids, timeout)
+    return movie_ids
+
+
+def cached_year_facets(params):
+    """検索語に一致する映画の年代・公開年ごとの件数（公開年・並び順の指定は無視）"""
+    key = SearchParams(params.query).cache_key(CatalogVersion.current(), prefix='search-facets')
+    facets = cache.get(key)
+    if facets is None:
+        facets = year_facets(params.query)
+        cache.set(key, facets, settings.SEARCH_CACHE_TIMEOUT)
+    return facets
+
+
+class SearchStatsBuffer:
+    """検索回数をワーカー（プロセス）ごとにメモリで数え、まとめてDBに書き込む
+
+    検索のたびにDBへ書かないよう、SEARCH_STATS_FLUSH_INTERVAL 秒に1回だけ
+    その間の回数を SearchQueryStat に足す。ワーカーが止まると未書き込みの回数は失われる。
+    """
+
+    def __init__(self, flush_interval=SEARCH_STATS_FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self.counts = Counter()
+        self.flushed_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def add(self, query, filters):
+        with self.lock:
+            self.counts[(query, filters)] += 1
+            if time.monotonic() - self.flushed_at < self.flush_interval:
+                return
+            counts, self.counts = self.counts, Counter()
+            self.flushed_at = time.monotonic()
+        self.write(counts)
+
+    def flush(self):
+        with self.lock:
+            counts, self.counts = self.counts, Counter()
+            self.flushed_at = time.monotonic()
+        self.write(counts)
+
+    def write(self, counts):
+        now = timezone.now()
+        with transaction.atomic():
+            for (query, filters), count in counts.items():
+                updated = SearchQueryStat.objects.filter(query=query, params=filters).update(
+                    count=F('count') + count, last_searched_at=now
+                )
+                if not updated:
+                    stat, created = SearchQueryStat.objects.get_or_create(
+                        query=query, params=filters, defaults={'count': count}
+                    )
+                    if not created:
+                        SearchQueryStat.objects.filter(pk=stat.pk).update(count=F('count') + count)
+
+
+search_stats_buffer = SearchStatsBuffer()
+
+
+def record_search_query(params):
+    """検索回数を数える（DBへはまとめて書き込む）"""
+    if not params.query:
+        return
+    search_stats_buffer.add(params.query[:200], params.filters()[:200])
+
+
+def warm_search_cache(top=WARM_QUERY_COUNT, refresh=False):
+    """よく検索されるクエリの結果を事前にキャッシュする"""
+    search_stats_buffer.flush()
+    stats = SearchQueryStat.objects.order_by('-count')[:top]
+    for stat in stats:
+        cached_search_ids(SearchParams.from_stat(stat), refresh=refresh)
+    return len(stats)
@@ -0,0 +1,249 @@
+# reviews/search/engines.py - 全文検索エンジン（PostgreSQL tsvector / SQLite FTS5 / 部分一致）
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+from reviews.models import Movie, MovieSearchDocument, CatalogVersion
+from reviews.normalization import normalize_search_text
+
+
+# 1回の検索で返す最大件数
+SEARCH_RESULT_LIMIT = 1000
+
+
+def join_names(names):
+    """タイトル・名前を1つずつ正規化して1行ずつに並べる（n-gramが名前をまたがないように）"""
+    return '\n'.join(filter(None, map(normalize_search_text, names)))
+
+
+def build_documents(movie_ids):
+    """映画ごとの検索ドキュメントを組み立てる（normalize_search_text で正規化済み）"""
+    movies = Movie.objects.filter(pk__in=movie_ids).select_related('director').prefetch_related('cast')
+
+    documents = []
+    for movie in movies:
+        people = [movie.director.name] if movie.director else []
+        people += [person.name for person in movie.cast.all()]
+        documents.append(MovieSearchDocument(
+            movie_id=movie.pk,
+            title=join_names([movie.title, movie.original_title]),
+            people=join_names(people),
+            overview=normalize_search_text(movie.overview),
+        ))
+    return documents
+
+
+def merge_ids(first, second, limit):
+    """2つの検索結果を重複を除いてつなぐ（first を先に並べる）"""
+    movie_ids = list(dict.fromkeys([*first, *second]))
+    return movie_ids if limit is None else movie_ids[:limit]
+
+
+def ngram_search_ids(query, limit):
+    """n-gram転置インデックスでタイトル・人物名に一致する映画ID（reviews.search.ngram）"""
+    from .ngram import NgramSearchEngine
+
+    return NgramSearchEngine().search(query, limit)
+
+
+class BaseSearchEngine:
+    """部分一致（icontains）による検索
+
+    インデックスを持たないフォールバック。各エンジンは search() と
+    index_documents() / remove_documents() を差し替える。
+    n-gram転置インデックス（SearchNgram）はどのエンジンでも index() / remove() で更新する。
+    """
+
+    def search(self, query, limit=SEARCH_RESULT_LIMIT):
+        """クエリ（正規化済み）に一致する映画IDを関連度順に返す（limit=None なら件数の上限なし）"""
+        terms = query.split()
+        if not terms:
+            return []
+
+        documents = MovieSearchDocument.objects.all()
+        for term in terms:
+            documents = documents.filter(
+                Q(title__icontains=term) | Q(people__icontains=term) | Q(overview__icontains=term)
+            )
+        return list(documents.order_by('-movie__popularity').values_list('movie_id', flat=True)[:limit])
+
+    def index(self, movie_ids):
+        """映画の検索ドキュメントを作り直す"""
+        from .ngram import update_ngram_index
+
+        movie_ids = set(movie_ids)
+        documents = build_documents(movie_ids)
+        with transaction.atomic():
+            old_documents = MovieSearchDocument.objects.in_bulk(list(movie_ids))
+            MovieSearchDocument.objects.bulk_create(
+                documents,
+                update_conflicts=True,
+                unique_fields=['movie'],
+                update_fields=['title', 'people', 'overview', 'updated_at'],
+            )
+            self.index_documents(documents)
+            # n-gramは作り直す前後のドキュメントの差分だけ更新する
+            new_documents = {document.movie_id: document for document in documents}
+            update_ngram_index(
+                {pk: document for pk, document in old_documents.items() if pk in new_documents},
+                new_documents,
+            )
+
+            # 削除済みの映画はインデックスからも除く
+            missing_ids = movie_ids - {document.movie_id for document in documents}
+            if missing_ids:
+                self.remove(missing_ids)
+
+    def remove(self, movie_ids):
+        from .ngram import update_ngram_index
+
+        with transaction.atomic():
+            self.remove_documents(movie_ids)
+            update_ngram_index(MovieSearchDocument.objects.in_bulk(list(movie_ids)), {})
+            MovieSearchDocument.objects.filter(movie_id__in=movie_ids).delete()
+
+    def index_documents(self, documents):
+        pass
+
+    def remove_documents(self, movie_ids):
+        pass
+
+
+class PostgresSearchEngine(BaseSearchEngine):
+    """PostgreSQLのtsvector検索
+
+    0027_moviesearchdocument で document_vector() と同じ式のGINインデックスを作成している。
+    日本語は分かち書きされないため、'simple' 設定で空白区切りの語として扱う。
+    語の途中に一致するタイトル・人物名はn-gramインデックスで探して先に並べる。
+    """
+
+    config = 'simple'
+
+    def document_vector(self):
+        from django.contrib.postgres.search import SearchVector
+
+        return (
+            SearchVector('title', weight='A', config=self.config)
+            + SearchVector('people', weight='B', config=self.config)
+            + SearchVector('overview', weight='C', config=self.config)
+        )
+
+    def search(self, query, limit=SEARCH_RESULT_LIMIT):
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+
+        if not query.strip():
+            return []
+
+        vector = self.document_vector()
+        search_query = SearchQuery(query, config=self.config, search_type='websearch')
+        matched_ids = MovieSearchDocument.objects.annotate(
+            vector=vector,
+            rank=SearchRank(vector, search_query),
+        ).filter(
+            vector=search_query
+        ).order_by('-rank', '-movie__popularity').values_list('movie_id', flat=True)[:limit]
+        return merge_ids(ngram_search_ids(query, limit), matched_ids, limit)
+
+
+class SQLiteFTS5Engine(BaseSearchEngine):
+    """SQLiteのFTS5（trigramトークナイザ）による検索
+
+    trigramは3文字未満の語を索引できないため、短いクエリは部分一致で検索する。
+    タイトル・人物名の一致はn-gramインデックスで探して先に並べる（記号や長音の有無に左右されない）。
+    """
+
+    table = 'reviews_movie_fts'
+    # bm25の列ごとの重み（タイトル・人物名・概要）
+    weights = (10.0, 5.0, 1.0)
+
+    def search(self, query, limit=SEARCH_RESULT_LIMIT):
+        terms = query.split()
+        if not terms:
+            return []
+        if any(len(term) < 3 for term in terms):
+            return merge_ids(ngram_search_ids(query, limit), super().search(query, limit), limit)
+
+        match = ' AND '.join('"{}"'.format(term.replace('"', '""')) for term in terms)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s '
+                f'ORDER BY bm25({self.table}, %s, %s, %s) LIMIT %s',
+                [match, *self.weights, -1 if limit is None else limit]
+            )
+            matched_ids = [row[0] for row in cursor.fetchall()]
+        return merge_ids(ngram_search_ids(query, limit), matched_ids, limit)
+
+    def index_documents(self, documents):
+        self.remove_documents([document.movie_id for document in documents])
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {self.table} (rowid, title, people, overview) VALUES (%s, %s, %s, %s)',
+                [(d.movie_id, d.title, d.people, d.overview) for d in documents]
+            )
+
+    def remove_documents(self, movie_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {self.table} WHERE rowid = %s',
+                [(movie_id,) for movie_id in movie_ids]
+            )
+
+
+ENGINES = {
+    'postgresql': PostgresSearchEngine,
+    'sqlite': SQLiteFTS5Engine,
+}
+
+
+@lru_cache(maxsize=None)
+def get_search_engine():
+    """settings.SEARCH_ENGINE のエンジン（'auto' ならDBに合わせて選ぶ）"""
+    engine = getattr(settings, 'SEARCH_ENGINE', 'auto')
+    if engine == 'auto':
+        return ENGINES.get(connection.vendor, BaseSearchEngine)()
+    return import_string(engine)()
+
+
+_deferred = threading.local()
+
+
+@contextmanager
+def deferred_search_index():
+    """ブロック内の索引更新を溜めて、最後にまとめて1回で行う
+
+    インポートコマンドでは映画の作成・監督の設定・キャスト追加ごとに
+    シグナルが飛ぶため、handle() をこれで包んで更新を1回にまとめる。
+    """
+    if getattr(_deferred, 'movie_ids', None) is not None:
+        yield
+        return
+
+    _deferred.movie_ids = set()
+    try:
+        yield
+    finally:
+        movie_ids, _deferred.movie_ids = _deferred.movie_ids, None
+        update_search_index(movie_ids)
+
+
+def update_search_index(movie_ids):
+    if not movie_ids:
+        return
+    pending = getattr(_deferred, 'movie_ids', None)
+    if pending is not None:
+        pending.update(movie_ids)
+    else:
+        get_search_engine().index(movie_ids)
+        CatalogVersion.bump()
+
+
+def remove_from_search_index(movie_ids):
+    if movie_ids:
+        get_search_engine().remove(movie_ids)
+        CatalogVersion.bump()
+
@@ -0,0 +1,260 @@
+# reviews/search/facets.py - 絞り込み用の件数（高度な検索の公開年・年代、映画一覧のファセット）
+from collections import Counter
+
+import numpy as np
+from django.db.models import Count
+from django.db.models.functions import ExtractYear
+
+from reviews.models import Movie, Person, Genre, MovieGenre
+from .query import MovieSearch
+from .autocomplete import CatalogIndexCache
+
+
+# 一致した映画IDを pk__in に渡すときの1回あたりの件数
+YEAR_FACET_BATCH_SIZE = 5000
+
+def year_counts(movies):
+    """公開年ごとの映画数（GROUP BY 1回）"""
+    return dict(
+        movies.filter(release_date__isnull=False).annotate(
+            year=ExtractYear('release_date')
+        ).values_list('year').annotate(count=Count('pk')).order_by()
+    )
+
+
+def year_facets(query=''):
+    """検索語に一致する映画の年代・公開年ごとの件数（新しい順）
+
+    戻り値: [{'decade': 1990, 'count': 件数, 'years': [(1999, 件数), ...]}, ...]
+    検索結果の上限（SEARCH_RESULT_LIMIT）で打ち切らず、一致した映画すべてを数える。
+    年代の件数は公開年ごとの件数から足し合わせる。
+    """
+    if query:
+        movie_ids = list(MovieSearch(query).all_movie_ids())
+        counts = Counter()
+        for start in range(0, len(movie_ids), YEAR_FACET_BATCH_SIZE):
+            batch = movie_ids[start:start + YEAR_FACET_BATCH_SIZE]
+            counts.update(year_counts(Movie.objects.filter(pk__in=batch)))
+    else:
+        counts = year_counts(Movie.objects.all())
+
+    decades = {}
+    for year, count in sorted(counts.items(), reverse=True):
+        facet = decades.setdefault(year // 10 * 10, {'decade': year // 10 * 10, 'count': 0, 'years': []})
+        facet['count'] += count
+        facet['years'].append((year, count))
+    return list(decades.values())
+
+
+# ========================================
+# 映画一覧のファセット（メモリ上の列データで絞り込み・集計）
+# ========================================
+
+# 上映時間の区分: (値, 表示名, 下限, 上限)
+RUNTIME_BUCKETS = [
+    ('short', '90分未満', None, 90),
+    ('standard', '90〜120分', 90, 120),
+    ('long', '120〜150分', 120, 150),
+    ('epic', '150分以上', 150, None),
+]
+# ギャップスコア（平均反映スコア）の区分: (値, 表示名, 下限, 上限)
+SCORE_BANDS = [
+    ('high', '高評価（70点以上）', 70, None),
+    ('medium', '中評価（40-69点）', 40, 70),
+    ('low', '低評価（39点以下）', None, 40),
+]
+FACET_LABELS = {
+    'genre': 'ジャンル',
+    'decade': '公開年代',
+    'runtime': '上映時間',
+    'director': '監督',
+    'score': 'ギャップスコア',
+}
+BROWSE_SORTS = ('popularity', 'gap_score', 'review_count')
+# ジャンル・監督は件数の多い順にこの数まで表示する
+FACET_OPTION_LIMIT = 20
+# レビューでスコアが変わるので、カタログのバージョンが同じでもこの秒数で作り直す
+FACET_INDEX_MAX_AGE = 5 * 60
+NONE = -1
+
+
+def facet_querystring(params, facet, value):
+    """ファセットの選択を切り替えたクエリ文字列（value=None で選択解除、ページは先頭に戻す）"""
+    params = params.copy()
+    params.pop('page', None)
+    if value is None:
+        params.pop(facet, None)
+    else:
+        params[facet] = value
+    return f'?{params.urlencode()}'
+
+
+def bucket_codes(values, buckets):
+    """値の配列を区分の番号に（区分外・NULLは NONE）"""
+    codes = np.full(len(values), NONE, dtype=np.int16)
+    for code, (_, _, lower, upper) in enumerate(buckets):
+        match = ~np.isnan(values)
+        if lower is not None:
+            match &= values >= lower
+        if upper is not None:
+            match &= values < upper
+        codes[match] = code
+    return codes
+
+
+class FacetIndex:
+    """カタログ全体を列ごとのNumPy配列で持ち、絞り込みと件数をメモリ上で求める
+
+    ファセットの値ごとの真偽値配列（ビットマップ）の積で絞り込むので、
+    ファセットの選択肢がいくつあってもCOUNTクエリは発行しない。
+    ジャンルは1本の映画に複数付くので、ジャンルごとのビットマップを持つ。
+    """
+
+    def __init__(self, rows, director_names, genre_links=(), genre_names=None):
+        rows = list(rows)
+        self.movie_ids = np.array([row[0] for row in rows], dtype=np.int64)
+        self.popularity = np.array([row[1] for row in rows], dtype=np.float64)
+        self.score = np.array([np.nan if row[2] is None else row[2] for row in rows], dtype=np.float64)
+        self.review_count = np.array([row[3] for row in rows], dtype=np.int64)
+        years = np.array([np.nan if row[4] is None else row[4].year for row in rows], dtype=np.float64)
+        runtimes = np.array([np.nan if row[5] is None else row[5] for row in rows], dtype=np.float64)
+        self.columns = {
+            'decade': np.where(np.isnan(years), NONE, years // 10 * 10).astype(np.int64),
+            'runtime': bucket_codes(runtimes, RUNTIME_BUCKETS),
+            'director': np.array([row[6] or NONE for row in rows], dtype=np.int64),
+            'score': bucket_codes(self.score, SCORE_BANDS),
+        }
+        self.director_names = director_names
+
+        movies_by_genre = {}
+        for genre_id, movie_id in genre_links:
+            movies_by_genre.setdefault(genre_id, []).append(movie_id)
+        self.genre_masks = {
+            genre_id: np.isin(self.movie_ids, movie_ids)
+            for genre_id, movie_ids in movies_by_genre.items()
+        }
+        self.genre_names = genre_names or {}
+
+    def __len__(self):
+        return len(self.movie_ids)
+
+    def parse(self, params):
+        """GETパラメータから有効な選択だけを取り出す {ファセット: 列の値}"""
+        selected = {}
+        for facet, choices in (('runtime', RUNTIME_BUCKETS), ('score', SCORE_BANDS)):
+            codes = {value: code for code, (value, _, _, _) in enumerate(choices)}
+            if params.get(facet) in codes:
+                selected[facet] = codes[params[facet]]
+        for facet in ('genre', 'decade', 'director'):
+            try:
+                selected[facet] = int(params[facet])
+            except (KeyError, TypeError, ValueError):
+                pass
+        return selected
+
+    def mask(self, selected, movie_ids=None, exclude=None):
+        """選択したファセットすべてに一致する映画の真偽値配列（exclude のファセットは除く）"""
+        mask = np.ones(len(self), dtype=bool)
+        if movie_ids is not None:
+            mask &= np.isin(self.movie_ids, movie_ids)
+        for facet, value in selected.items():
+            if facet == exclude:
+                continue
+            if facet == 'genre':
+                mask &= self.genre_masks.get(value, False)
+            else:
+                mask &= self.columns[facet] == value
+        return mask
+
+    def option_counts(self, facet, base):
+        """base（真偽値配列）の映画のファセットの値ごとの件数 [(値, 件数)]"""
+        if facet == 'genre':
+            counts = [(genre_id, int(np.count_nonzero(base & genre_mask)))
+                      for genre_id, genre_mask in self.genre_masks.items()]
+            return sorted([option for option in counts if option[1]], key=lambda option: -option[1])
+
+        values = self.columns[facet][base]
+        values, counts = np.unique(values[values != NONE], return_counts=True)
+        return list(zip(values.tolist(), counts.tolist()))
+
+    def option_label(self, facet, value):
+        if facet == 'decade':
+            return f'{value}年代'
+        if facet == 'director':
+            return self.director_names.get(value, '')
+        if facet == 'genre':
+            return self.genre_names.get(value, '')
+        choices = RUNTIME_BUCKETS if facet == 'runtime' else SCORE_BANDS
+        return choices[value][1]
+
+    def option_value(self, facet, value):
+        if facet in ('runtime', 'score'):
+            choices = RUNTIME_BUCKETS if facet == 'runtime' else SCORE_BANDS
+            return choices[value][0]
+        return str(value)
+
+    def facets(self, selected, movie_ids=None, params=None):
+        """ファセットごとの選択肢と件数
+
+        各ファセットの件数は「そのファセット以外の選択」で絞り込んだ映画で数えるので、
+        選択中のファセットでも他の選択肢に切り替えたときの件数が分かる。
+        params（request.GET）を渡すと、選択肢ごとの切り替え用URL（url）も付ける。
+        """
+        facets = []
+        for facet in FACET_LABELS:
+            options = self.option_counts(facet, self.mask(selected, movie_ids, exclude=facet))
+            if facet == 'decade':
+                options.sort(reverse=True)
+            elif facet in ('genre', 'director'):
+                counts = dict(options)
+                options = sorted(options, key=lambda option: -option[1])[:FACET_OPTION_LIMIT]
+                if facet in selected and selected[facet] not in dict(options):
+                    options.append((selected[facet], counts.get(selected[facet], 0)))
+
+            facets.append({
+                'name': facet,
+                'label': FACET_LABELS[facet],
+                'options': [
+                    {
+                        'value': self.option_value(facet, value),
+                        'label': self.option_label(facet, value),
+                        'count': count,
+                        'selected': selected.get(facet) == value,
+                        'url': facet_querystring(
+                            params, facet, None if selected.get(facet) == value else self.option_value(facet, value)
+                        ) if params is not None else None,
+                    }
+                    for value, count in options
+                ],
+            })
+        return facets
+
+    def movie_ids_for(self, selected, movie_ids=None, sort='popularity'):
+        """絞り込んだ映画IDを並び順どおりに"""
+        mask = self.mask(selected, movie_ids)
+        if sort == 'gap_score':
+            # レビューのない映画は最後（order_by_gap_score と同じ）
+            score = np.where(np.isnan(self.score), -1.0, self.score)
+            order = np.lexsort((-self.popularity[mask], -score[mask]))
+        elif sort == 'review_count':
+            order = np.lexsort((-self.popularity[mask], -self.review_count[mask]))
+        else:
+            order = np.argsort(-self.popularity[mask], kind='stable')
+        return self.movie_ids[mask][order].tolist()
+
+
+def build_facet_index():
+    """映画一覧のファセット用の列データを作る（クエリ4回）"""
+    rows = Movie.objects.values_list(
+        'pk', 'popularity', 'reflected_score_avg', 'rated_review_count',
+        'release_date', 'runtime', 'director_id',
+    ).order_by()
+    director_names = dict(
+        Person.objects.filter(directed_movies__isnull=False).distinct().values_list('pk', 'name').order_by()
+    )
+    genre_links = MovieGenre.objects.values_list('genre_id', 'movie_id').order_by()
+    genre_names = dict(Genre.objects.values_list('pk', 'name').order_by())
+    return FacetIndex(rows, director_names, genre_links, genre_names)
+
+
+facet_index_cache = CatalogIndexCache(build_facet_index, max_age=FACET_INDEX_MAX_AGE)
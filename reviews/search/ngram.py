@@ -0,0 +1,225 @@
+# reviews/search/ngram.py - 日本語向けn-gram（2文字・3文字）転置インデックス
+from collections import defaultdict
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Q, Case, When, Value, IntegerField, Exists, OuterRef
+
+from reviews.models import Movie, MovieSearchDocument, SearchNgram
+from reviews.normalization import normalize_search_key
+from .engines import SEARCH_RESULT_LIMIT, BaseSearchEngine
+
+
+# ポスティングリストは昇順の映画IDをuint32配列のバイト列で保持する
+POSTING_DTYPE = np.dtype('<u4')
+NGRAM_FIELDS = ('title', 'people')
+# n-gramで絞り込んだ候補がこれより多ければ、IDのリストを渡さずに検索キーの部分一致だけで探す
+NGRAM_CANDIDATE_LIMIT = 5000
+
+
+def ngrams(text):
+    """テキストの2-gram・3-gram（検索キーが1文字ならその1文字）
+
+    空白や記号を除いた検索キーから作るので「ダーク・ナイト」も「だくないと」で引ける。
+    """
+    key = normalize_search_key(text)
+    if len(key) == 1:
+        return {key}
+    return {key[i:i + size] for size in (2, 3) for i in range(len(key) - size + 1)}
+
+
+def document_field_ngrams(text):
+    """検索ドキュメントの1項目のn-gram（1行1つのタイトル・名前ごとのn-gramの和集合）
+
+    タイトルや名前をまたぐn-gramは作らないので、隣り合う名前の境目には一致しない。
+    """
+    grams = set()
+    for name in text.splitlines():
+        grams |= ngrams(name)
+    return grams
+
+
+def encode_postings(movie_ids):
+    return np.asarray(movie_ids, dtype=POSTING_DTYPE).tobytes()
+
+
+def decode_postings(postings):
+    return np.frombuffer(bytes(postings), dtype=POSTING_DTYPE)
+
+
+def document_ngrams(document):
+    """検索ドキュメントの対象ごとのn-gram"""
+    return {field: document_field_ngrams(getattr(document, field)) for field in NGRAM_FIELDS}
+
+
+def apply_postings(additions, removals):
+    """ポスティングリストに映画IDを追加・削除する
+
+    additions / removals: {(field, gram): set(映画ID)}
+    """
+    keys = set(additions) | set(removals)
+    if not keys:
+        return
+
+    with transaction.atomic():
+        existing = {}
+        grams = {gram for _, gram in keys}
+        for row in SearchNgram.objects.select_for_update().filter(gram__in=grams):
+            existing[(row.field, row.gram)] = row
+
+        to_save, empty_ids = [], []
+        for key in keys:
+            row = existing.get(key) or SearchNgram(field=key[0], gram=key[1], postings=b'')
+            movie_ids = decode_postings(row.postings)
+            if key in additions:
+                movie_ids = np.union1d(movie_ids, np.fromiter(additions[key], dtype=POSTING_DTYPE))
+            if key in removals:
+                movie_ids = np.setdiff1d(movie_ids, np.fromiter(removals[key], dtype=POSTING_DTYPE))
+
+            if len(movie_ids):
+                row.postings = encode_postings(movie_ids)
+                row.doc_count = len(movie_ids)
+                to_save.append(row)
+            elif row.pk:
+                empty_ids.append(row.pk)
+
+        SearchNgram.objects.bulk_create(
+            to_save,
+            update_conflicts=True,
+            unique_fields=['gram', 'field'],
+            update_fields=['postings', 'doc_count'],
+        )
+        SearchNgram.objects.filter(pk__in=empty_ids).delete()
+
+
+def index_diff(old_documents, new_documents):
+    """新旧の検索ドキュメントの差分から追加・削除するポスティングを求める"""
+    additions, removals = defaultdict(set), defaultdict(set)
+    for movie_id in set(old_documents) | set(new_documents):
+        old = document_ngrams(old_documents[movie_id]) if movie_id in old_documents else {}
+        new = document_ngrams(new_documents[movie_id]) if movie_id in new_documents else {}
+        for field in NGRAM_FIELDS:
+            for gram in new.get(field, set()) - old.get(field, set()):
+                additions[(field, gram)].add(movie_id)
+            for gram in old.get(field, set()) - new.get(field, set()):
+                removals[(field, gram)].add(movie_id)
+    return additions, removals
+
+
+def update_ngram_index(old_documents, new_documents):
+    """検索ドキュメントの更新をn-gramインデックスに反映する（BaseSearchEngine.index / remove から呼ぶ）"""
+    apply_postings(*index_diff(old_documents, new_documents))
+
+
+def build_ngram_index(batch_size=1000):
+    """検索ドキュメント全体からインデックスを作り直す（通常は update_ngram_index で差分更新される）"""
+    postings = defaultdict(list)
+    documents = MovieSearchDocument.objects.order_by('movie_id').only(*NGRAM_FIELDS)
+    for document in documents.iterator(chunk_size=batch_size):
+        for field, grams in document_ngrams(document).items():
+            for gram in grams:
+                postings[(field, gram)].append(document.movie_id)
+
+    with transaction.atomic():
+        SearchNgram.objects.all().delete()
+        SearchNgram.objects.bulk_create(
+            [
+                SearchNgram(field=field, gram=gram, postings=encode_postings(movie_ids), doc_count=len(movie_ids))
+                for (field, gram), movie_ids in postings.items()
+            ],
+            batch_size=batch_size,
+        )
+    return len(postings)
+
+
+def token_query(token):
+    """検索語1つ分の (n-gram一覧, 条件)"""
+    if len(token) == 1:
+        # 1文字はその文字で始まるn-gramすべての和集合
+        return None, Q(gram__gte=token, gram__lt=chr(ord(token) + 1))
+    grams = {token} if len(token) <= 3 else {token[i:i + 3] for i in range(len(token) - 2)}
+    return grams, Q(gram__in=grams)
+
+
+def query_tokens(query):
+    """クエリを空白で区切った語ごとの検索キー"""
+    return [token for token in map(normalize_search_key, query.split()) if token]
+
+
+def ngram_search(query):
+    """クエリのすべての語のn-gramを含む映画ID（タイトルか人物名。n-gramの積集合なので候補）"""
+    empty = np.array([], dtype=POSTING_DTYPE)
+    tokens = query_tokens(query)
+    if not tokens:
+        return empty
+
+    queries = [token_query(token) for token in tokens]
+    condition = Q()
+    for _, q in queries:
+        condition |= q
+    lists = {
+        (field, gram): decode_postings(postings)
+        for field, gram, postings in SearchNgram.objects.filter(condition).values_list('field', 'gram', 'postings')
+    }
+
+    def token_ids(field, token, grams):
+        if grams is None:
+            prefixed = [ids for (f, gram), ids in lists.items() if f == field and gram.startswith(token)]
+            return np.unique(np.concatenate(prefixed)) if prefixed else empty
+
+        # 件数の少ないリストから順に積集合を取る
+        ids_by_gram = sorted((lists.get((field, gram), empty) for gram in grams), key=len)
+        ids = ids_by_gram[0]
+        for other in ids_by_gram[1:]:
+            if not len(ids):
+                break
+            ids = np.intersect1d(ids, other, assume_unique=True)
+        return ids
+
+    matched = None
+    for token, (grams, _) in zip(tokens, queries):
+        in_any = np.union1d(token_ids('title', token, grams), token_ids('people', token, grams))
+        matched = in_any if matched is None else np.intersect1d(matched, in_any, assume_unique=True)
+    return matched
+
+
+def title_condition(token):
+    """検索語がタイトル・原題の検索キーに含まれる条件"""
+    return Q(title_key__contains=token) | Q(original_title_key__contains=token)
+
+
+def token_condition(token):
+    """検索語がタイトル・原題・監督／キャスト名の検索キーのどれかに含まれる条件"""
+    cast = Movie.cast.through.objects.filter(movie_id=OuterRef('pk'), person__name_key__contains=token)
+    return title_condition(token) | Q(director__name_key__contains=token) | Exists(cast)
+
+
+class NgramSearchEngine(BaseSearchEngine):
+    """n-gram転置インデックスによる検索（タイトル一致を優先し、人気度順）
+
+    'auto' のPostgreSQL・SQLiteのエンジンはこの結果を先に並べる。
+    SEARCH_ENGINE = 'reviews.search.ngram.NgramSearchEngine' ならこれだけで検索する。
+    概要（overview）は索引しない。
+    """
+
+    def search(self, query, limit=SEARCH_RESULT_LIMIT):
+        tokens = query_tokens(query)
+        candidates = ngram_search(query)
+        if not len(candidates):
+            return []
+
+        # 3文字を超える語はn-gramの積集合だけでは離れた位置の一致も拾うので、
+        # 語そのものが検索キーに含まれるかをSQLで確かめる。並び替えと件数の上限もSQLで
+        movies = Movie.objects.all()
+        if len(candidates) <= NGRAM_CANDIDATE_LIMIT:
+            movies = movies.filter(pk__in=candidates.tolist())
+        in_title = Q()
+        for token in tokens:
+            movies = movies.filter(token_condition(token))
+            in_title &= title_condition(token)
+
+        return list(
+            movies.annotate(
+                title_rank=Case(When(in_title, then=Value(0)), default=Value(1), output_field=IntegerField())
+            ).order_by('title_rank', '-popularity').values_list('pk', flat=True)[:limit]
+        )
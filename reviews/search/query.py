@@ -0,0 +1,195 @@
+# reviews/search/query.py - 映画検索のクエリビルダー
+from datetime import date
+
+from django.db.models import Q, Case, When, Value, IntegerField, Exists, OuterRef
+
+from reviews.models import Movie, Person
+from reviews.normalization import normalize_search_text, normalize_search_key
+from reviews.pagination import CappedPaginator
+from .engines import SEARCH_RESULT_LIMIT, get_search_engine
+
+
+SEARCH_PAGE_SIZE = 30
+# 名前の前方一致で先に絞り込む人物の上限
+PERSON_PREFILTER_LIMIT = 200
+# 一致した映画IDを pk__in に渡すときの1回あたりの件数
+ID_BATCH_SIZE = 5000
+
+
+class MovieSearch:
+    """映画検索のクエリビルダー
+
+    1. 検索キーの前方一致（タイトル・原題・監督／キャスト名）をインデックスで引く
+    2. 続けて検索エンジン（全文検索・n-gram）の結果を関連度順に並べる
+
+    人物は名前の検索キーでIDを先に絞り込み、キャストは中間テーブルへの
+    Exists() で判定する。映画×キャストの結合がないのでDISTINCTも要らない。
+    """
+
+    def __init__(self, query, limit=SEARCH_RESULT_LIMIT):
+        self.text = normalize_search_text(query)
+        self.key = normalize_search_key(query)
+        self.limit = limit
+        # 上限を超えたかどうかが分かるよう、1件多く (limit + 1 件) 求めておく（limit=None なら上限なし）
+        self.fetch_limit = None if limit is None else limit + 1
+        self._matched_ids = None
+
+    def person_ids(self):
+        return list(
+            Person.objects.filter(name_key__startswith=self.key).values_list('pk', flat=True)[:PERSON_PREFILTER_LIMIT]
+        )
+
+    def key_condition(self):
+        """検索キーが前方一致する映画の条件（タイトル・原題・監督／キャスト名）"""
+        condition = Q(title_key__startswith=self.key) | Q(original_title_key__startswith=self.key)
+        person_ids = self.person_ids()
+        if person_ids:
+            cast = Movie.cast.through.objects.filter(movie_id=OuterRef('pk'), person_id__in=person_ids)
+            condition |= Q(director_id__in=person_ids) | Exists(cast)
+        return condition
+
+    def key_match_ids(self):
+        """検索キーが前方一致する映画ID（タイトル完全一致 → タイトル前方一致 → 人物の順、各人気度順）"""
+        title_exact = Q(title_key=self.key) | Q(original_title_key=self.key)
+        title_prefix = Q(title_key__startswith=self.key) | Q(original_title_key__startswith=self.key)
+
+        return list(
+            Movie.objects.filter(self.key_condition()).annotate(
+                key_rank=Case(
+                    When(title_exact, then=Value(0)),
+                    When(title_prefix, then=Value(1)),
+                    default=Value(2),
+                    output_field=IntegerField(),
+                )
+            ).order_by('key_rank', '-popularity').values_list('pk', flat=True)[:self.fetch_limit]
+        )
+
+    def matched_ids(self):
+        """一致する映画IDを関連度順に（最大 limit + 1 件）"""
+        if self._matched_ids is None:
+            self._matched_ids = self.find_movie_ids() if self.text else []
+        return self._matched_ids
+
+    def movie_ids(self):
+        """一致する映画IDを関連度順に（最大 limit 件）"""
+        return self.matched_ids()[:self.limit]
+
+    def find_movie_ids(self):
+        movie_ids = self.key_match_ids()
+        seen = set(movie_ids)
+        for movie_id in get_search_engine().search(self.text, self.fetch_limit):
+            if movie_id not in seen:
+                seen.add(movie_id)
+                movie_ids.append(movie_id)
+        return movie_ids[:self.fetch_limit]
+
+    def all_movie_ids(self):
+        """一致する映画IDすべて（件数の上限なし・順不同）
+
+        公開年ごとの件数のように、上限（limit 件）で打ち切らずに集計するとき用。
+        """
+        if not self.text:
+            return set()
+        movie_ids = set(Movie.objects.filter(self.key_condition()).values_list('pk', flat=True))
+        movie_ids.update(get_search_engine().search(self.text, limit=None))
+        return movie_ids
+
+    def queryset(self, queryset=None):
+        """一致する映画のQuerySet（search_rank = 関連度順の順位）
+
+        年代などの絞り込みや並び替えを重ねるとき用。
+        """
+        if queryset is None:
+            queryset = Movie.objects.all()
+
+        movie_ids = self.movie_ids()
+        if not movie_ids:
+            return queryset.none()
+
+        return queryset.filter(pk__in=movie_ids).annotate(
+            search_rank=Case(
+                *[When(pk=movie_id, then=Value(rank)) for rank, movie_id in enumerate(movie_ids)],
+                output_field=IntegerField(),
+            )
+        )
+
+    def page(self, number, per_page=SEARCH_PAGE_SIZE, queryset=None):
+        """関連度順の1ページ分
+
+        件数はIDリストの長さなのでCOUNTは発行せず、映画はページ分だけを1クエリで取得する。
+        limit 件を超えたときは paginator.count_display が「1000+」になる。
+        """
+        return movie_page(self.matched_ids(), number, per_page, queryset, max_count=self.limit)
+
+
+def movie_page(movie_ids, number, per_page=SEARCH_PAGE_SIZE, queryset=None, max_count=SEARCH_RESULT_LIMIT):
+    """並び順どおりの映画IDリストから1ページ分の映画を取得する"""
+    if queryset is None:
+        queryset = Movie.objects.all()
+
+    page = CappedPaginator(movie_ids, per_page, max_count=max_count).get_page(number)
+    movies = queryset.in_bulk(page.object_list)
+    page.object_list = [movies[pk] for pk in page.object_list if pk in movies]
+    return page
+
+
+def release_year_range(year_from=None, year_to=None):
+    """公開年の範囲を release_date の日付範囲の条件にする
+
+    release_date__year__gte のように年を取り出すとインデックスが使えないことがあるので、
+    「year_from年1月1日以上・(year_to + 1)年1月1日未満」として比較する。
+    """
+    condition = Q()
+    if year_from is not None:
+        condition &= Q(release_date__gte=date(year_from, 1, 1))
+    if year_to is not None:
+        condition &= Q(release_date__lt=date(year_to + 1, 1, 1))
+    return condition
+
+
+def filter_movie_ids(query='', year_from=None, year_to=None, sort='relevance', limit=SEARCH_RESULT_LIMIT):
+    """高度な検索（検索語・公開年・並び順）に一致する映画ID（最大 limit + 1 件）
+
+    公開年での絞り込みや並び替えは、上限（limit 件）で切る前の一致全体に対して行う。
+    """
+    years = release_year_range(year_from, year_to)
+    if query and sort == 'relevance':
+        if not years:
+            return MovieSearch(query, limit).matched_ids()
+        # 関連度順の一致全体から、公開年が範囲内のものだけを順に残す
+        ranked = MovieSearch(query, limit=None).matched_ids()
+        in_range = set()
+        for start in range(0, len(ranked), ID_BATCH_SIZE):
+            in_range.update(
+                Movie.objects.filter(years, pk__in=ranked[start:start + ID_BATCH_SIZE]).values_list('pk', flat=True)
+            )
+        return [pk for pk in ranked if pk in in_range][:limit + 1]
+
+    movies = Movie.objects.filter(years)
+    if query:
+        movies = movies.filter(pk__in=list(MovieSearch(query).all_movie_ids()))
+
+    if sort == 'year_desc':
+        movies = movies.order_by('-release_date')
+    elif sort == 'year_asc':
+        movies = movies.order_by('release_date')
+    elif sort == 'title':
+        movies = movies.order_by('title')
+    elif sort == 'gap_score':
+        movies = movies.order_by_gap_score()
+    elif sort == 'gap_avg':
+        movies = movies.order_by_average_gap()
+    elif sort == 'review_count':
+        movies = movies.order_by_review_count()
+    else:
+        movies = movies.order_by('-popularity')
+
+    return list(movies.values_list('pk', flat=True)[:limit + 1])
+
+
+def search_movie_ids(query, limit=SEARCH_RESULT_LIMIT):
+    return MovieSearch(query, limit).movie_ids()
+
+
+def search_movies(query, queryset=None, limit=SEARCH_RESULT_LIMIT):
+    return MovieSearch(query, limit).queryset(queryset)
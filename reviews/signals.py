@@ -0,0 +1,276 @@
+# reviews/signals.py - 書き込みに合わせてスコア集計とページのETag用バージョンを差分更新
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from .models import (
+    Movie, Person, Review, ReviewLike, UserProfile, MovieScoreStats, CriticReview,
+    Column, Comment, Like, Discussion, DiscussionComment
+)
+from .search import update_search_index, remove_from_search_index
+
+
+def _bump_content_version(model, pks):
+    """詳細ページのETag用バージョンを進める（views._content_etag を参照）"""
+    if pks:
+        model.objects.filter(pk__in=pks).update(content_version=F('content_version') + 1)
+
+
+def _is_movie_buff(user_id):
+    """映画通かどうか（プロフィール未作成ならNone）"""
+    return UserProfile.objects.filter(user_id=user_id).values_list('is_movie_buff', flat=True).first()
+
+
+# ========================================
+# レビュー
+# ========================================
+
+@receiver(pre_save, sender=Review)
+def remember_previous_review(sender, instance, raw, **kwargs):
+    """編集前のレビュー内容を控えておく"""
+    instance._previous_score = None
+    if raw or instance.pk is None:
+        return
+    instance._previous_score = Review.objects.filter(pk=instance.pk).values_list(
+        'movie_id', 'expectation', 'satisfaction'
+    ).first()
+
+
+@receiver(post_save, sender=Review)
+def update_score_stats_on_save(sender, instance, raw, **kwargs):
+    """投稿・編集されたレビューを集計に反映"""
+    if raw:
+        return
+
+    current = (instance.movie_id, instance.expectation, instance.satisfaction)
+    previous = getattr(instance, '_previous_score', None)
+    if previous == current:
+        return
+
+    is_movie_buff = _is_movie_buff(instance.user_id)
+    if previous:
+        MovieScoreStats.apply_review(*previous, is_movie_buff, sign=-1)
+    MovieScoreStats.apply_review(*current, is_movie_buff)
+
+
+@receiver(pre_delete, sender=Review)
+def remember_deleted_review_segment(sender, instance, **kwargs):
+    """削除前にセグメントを控えておく（ユーザー削除時はプロフィールが先に消えるため）"""
+    instance._is_movie_buff = _is_movie_buff(instance.user_id)
+
+
+@receiver(post_delete, sender=Review)
+def update_score_stats_on_delete(sender, instance, **kwargs):
+    """削除されたレビューを集計から除く"""
+    MovieScoreStats.apply_review(
+        instance.movie_id,
+        instance.expectation,
+        instance.satisfaction,
+        getattr(instance, '_is_movie_buff', None),
+        sign=-1
+    )
+
+
+@receiver(post_save, sender=Review)
+def bump_movie_version_on_review_save(sender, instance, raw, **kwargs):
+    """映画詳細ページのETagを更新（レビュー本文の編集も含む）"""
+    if raw:
+        return
+    previous = getattr(instance, '_previous_score', None)
+    movie_ids = {instance.movie_id, previous[0] if previous else None} - {None}
+    _bump_content_version(Movie, movie_ids)
+
+
+@receiver(post_delete, sender=Review)
+def bump_movie_version_on_review_delete(sender, instance, **kwargs):
+    _bump_content_version(Movie, [instance.movie_id])
+
+
+@receiver(post_save, sender=CriticReview)
+@receiver(post_delete, sender=CriticReview)
+def bump_movie_version_on_critic_review(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _bump_content_version(Movie, [instance.movie_id])
+
+
+# ========================================
+# レビューへのいいね（いいね数をレビューに保持）
+# ========================================
+
+@receiver(post_save, sender=ReviewLike)
+def increment_review_like_count(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        Review.objects.filter(pk=instance.review_id).update(like_count=F('like_count') + 1)
+        _bump_review_movie_version(instance.review_id)
+
+
+@receiver(post_delete, sender=ReviewLike)
+def decrement_review_like_count(sender, instance, **kwargs):
+    Review.objects.filter(pk=instance.review_id).update(like_count=F('like_count') - 1)
+    _bump_review_movie_version(instance.review_id)
+
+
+def _bump_review_movie_version(review_id):
+    movie_id = Review.objects.filter(pk=review_id).values_list('movie_id', flat=True).first()
+    if movie_id is not None:
+        _bump_content_version(Movie, [movie_id])
+
+
+# ========================================
+# プロフィール（映画通/ライトの切り替え）
+# ========================================
+
+def _rebuild_user_movies(user_id):
+    movie_ids = list(Review.objects.filter(user_id=user_id).values_list('movie_id', flat=True))
+    MovieScoreStats.rebuild(movie_ids)
+    _bump_content_version(Movie, movie_ids)
+
+
+@receiver(pre_save, sender=UserProfile)
+def remember_previous_segment(sender, instance, raw, **kwargs):
+    instance._previous_is_movie_buff = instance._previous_avatar = None
+    if not raw and instance.pk is not None:
+        previous = UserProfile.objects.filter(pk=instance.pk).values_list('is_movie_buff', 'avatar').first()
+        if previous:
+            instance._previous_is_movie_buff, instance._previous_avatar = previous
+
+
+@receiver(post_save, sender=UserProfile)
+def rebuild_score_stats_on_profile_save(sender, instance, created, raw, **kwargs):
+    """セグメントが変わったユーザーのレビュー対象映画を再集計"""
+    if raw:
+        return
+    if created or instance._previous_is_movie_buff != instance.is_movie_buff:
+        _rebuild_user_movies(instance.user_id)
+
+
+@receiver(post_save, sender=UserProfile)
+def bump_user_pages_on_avatar_change(sender, instance, created, raw, **kwargs):
+    if not raw and not created and (instance.avatar.name or None) != (instance._previous_avatar or None):
+        _bump_user_pages(instance.user_id)
+
+
+# ========================================
+# ユーザー名・アバター（投稿者として表示されるページのETagを更新）
+# ========================================
+
+def _bump_user_pages(user_id):
+    """ユーザーがレビュー・投稿・コメントしたページのETag用バージョンを進める"""
+    movie_ids = set(Review.objects.filter(user_id=user_id).values_list('movie_id', flat=True))
+    column_ids = set(Column.objects.filter(author_id=user_id).values_list('pk', flat=True))
+    column_ids |= set(Comment.objects.filter(user_id=user_id, column__isnull=False).values_list('column_id', flat=True))
+    discussion_ids = set(Discussion.objects.filter(user_id=user_id).values_list('pk', flat=True))
+    discussion_ids |= set(DiscussionComment.objects.filter(user_id=user_id).values_list('discussion_id', flat=True))
+
+    _bump_content_version(Movie, movie_ids)
+    _bump_content_version(Column, column_ids)
+    _bump_content_version(Discussion, discussion_ids)
+
+
+@receiver(pre_save, sender=User)
+def remember_previous_username(sender, instance, raw, **kwargs):
+    instance._previous_username = None
+    if not raw and instance.pk is not None:
+        instance._previous_username = User.objects.filter(pk=instance.pk).values_list('username', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+def bump_user_pages_on_username_change(sender, instance, created, raw, **kwargs):
+    previous = getattr(instance, '_previous_username', None)
+    if not raw and not created and previous is not None and previous != instance.username:
+        _bump_user_pages(instance.pk)
+
+
+@receiver(post_delete, sender=UserProfile)
+def rebuild_score_stats_on_profile_delete(sender, instance, **kwargs):
+    # ユーザーごと削除される場合はレビューの削除が終わってから再集計する
+    user_id = instance.user_id
+    transaction.on_commit(lambda: _rebuild_user_movies(user_id))
+
+
+# ========================================
+# コラム・みんなの声（コメントやいいねで詳細ページのETagを更新）
+# ========================================
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def bump_column_version_on_comment(sender, instance, raw=False, **kwargs):
+    if not raw and instance.column_id:
+        _bump_content_version(Column, [instance.column_id])
+
+
+@receiver(post_save, sender=Like)
+@receiver(post_delete, sender=Like)
+def bump_column_version_on_like(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _bump_content_version(Column, [instance.column_id])
+
+
+@receiver(post_save, sender=DiscussionComment)
+@receiver(post_delete, sender=DiscussionComment)
+def bump_discussion_version_on_comment(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _bump_content_version(Discussion, [instance.discussion_id])
+
+
+# ========================================
+# 検索インデックス（映画・人物の保存に合わせて更新）
+# ========================================
+
+def _person_movie_ids(person_id):
+    directed = Movie.objects.filter(director_id=person_id).values_list('pk', flat=True)
+    acted = Movie.cast.through.objects.filter(person_id=person_id).values_list('movie_id', flat=True)
+    return set(directed) | set(acted)
+
+
+@receiver(post_save, sender=Movie)
+def index_movie_on_save(sender, instance, raw, **kwargs):
+    if not raw:
+        update_search_index([instance.pk])
+
+
+@receiver(pre_delete, sender=Movie)
+def remove_movie_from_index(sender, instance, **kwargs):
+    # 検索ドキュメントが連鎖削除される前に索引から除く
+    remove_from_search_index([instance.pk])
+
+
+@receiver(m2m_changed, sender=Movie.cast.through)
+def index_movie_on_cast_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """キャストの変更を検索インデックスと映画詳細ページのETagに反映"""
+    movie_ids = ()
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            movie_ids = [instance.pk]
+    elif action == 'pre_clear':
+        # person.acted_movies.clear() は対象の映画をクリア前に控える
+        instance._cleared_movie_ids = _person_movie_ids(instance.pk)
+    elif action == 'post_clear':
+        movie_ids = getattr(instance, '_cleared_movie_ids', ())
+    elif action in ('post_add', 'post_remove'):
+        movie_ids = pk_set
+    update_search_index(movie_ids)
+    _bump_content_version(Movie, movie_ids)
+
+
+@receiver(post_save, sender=Person)
+def index_person_movies_on_save(sender, instance, created, raw, **kwargs):
+    # 名前は映画詳細ページにも表示されるのでETagも更新する
+    if not raw and not created:
+        movie_ids = _person_movie_ids(instance.pk)
+        update_search_index(movie_ids)
+        _bump_content_version(Movie, movie_ids)
+
+
+@receiver(pre_delete, sender=Person)
+def remember_person_movies(sender, instance, **kwargs):
+    instance._movie_ids = _person_movie_ids(instance.pk)
+
+
+@receiver(post_delete, sender=Person)
+def index_person_movies_on_delete(sender, instance, **kwargs):
+    movie_ids = getattr(instance, '_movie_ids', ())
+    update_search_index(movie_ids)
+    _bump_content_version(Movie, movie_ids)
@@ -1,3 +1,672 @@
-from django.test import TestCase
+import base64
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from unittest import mock
+from urllib.parse import urlparse, parse_qs
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import (
+    Movie, MovieSearchDocument, Person, Review, ReviewLike, UserProfile, MovieScoreStats, SyncCheckpoint,
+    SearchNgram, Column, Comment, Discussion, DiscussionComment,
+)
+from .normalization import normalize_search_text
+from .pagination import paginate_reviews, encode_cursor, decode_cursor
+from .search import (
+    filter_movie_ids, get_search_engine, autocomplete, autocomplete_cache, facet_index_cache, search_stats_buffer,
+)
+from .tmdb import ImportJournal, MovieWriter, ResponseCache, TMDbClient
+from .tmdb.sync import CHANGES_CHECKPOINT
+
+
+# ========================================
+# スコア集計（signals.py による差分更新）
+# ========================================
+
+class MovieScoreStatsTests(TestCase):
+    def setUp(self):
+        self.movie = Movie.objects.create(title='集計')
+        self.buff = User.objects.create(username='buff')
+        self.casual = User.objects.create(username='casual')
+        self.no_profile = User.objects.create(username='no_profile')
+        UserProfile.objects.create(user=self.buff, is_movie_buff=True)
+        self.casual_profile = UserProfile.objects.create(user=self.casual, is_movie_buff=False)
+
+    def snapshot(self):
+        """保存済みの集計（浮動小数の合計は足す順で誤差が出るので丸める）"""
+        values = MovieScoreStats.objects.filter(movie=self.movie).values().get()
+        values.pop('updated_at')
+        values.update(Movie.objects.filter(pk=self.movie.pk).values('reflected_score_avg', 'gap_score_avg').get())
+        return {name: round(value, 6) if isinstance(value, float) else value for name, value in values.items()}
+
+    def assertMatchesRebuild(self):
+        incremental = self.snapshot()
+        MovieScoreStats.rebuild([self.movie.pk])
+        self.assertEqual(incremental, self.snapshot())
+
+    def review(self, user, expectation, satisfaction):
+        return Review.objects.create(
+            movie=self.movie, user=user, expectation=expectation, satisfaction=satisfaction, review_text='本文'
+        )
+
+    def test_create_edit_delete(self):
+        buff_review = self.review(self.buff, 30, 85)
+        self.review(self.casual, 70, 40)
+        self.review(self.no_profile, 50, None)
+        self.assertMatchesRebuild()
+
+        buff_review.expectation, buff_review.satisfaction = 90, 33
+        buff_review.save()
+        self.assertMatchesRebuild()
+
+        buff_review.delete()
+        self.assertMatchesRebuild()
+
+    def test_segment_flip(self):
+        self.review(self.buff, 30, 85)
+        self.review(self.casual, 70, 41)
+        self.casual_profile.is_movie_buff = True
+        self.casual_profile.save()
+        self.assertMatchesRebuild()
+        self.assertEqual(MovieScoreStats.objects.get(movie=self.movie).buff_review_count, 2)
+
+        # 戻したあと・移ったユーザーのレビューを消したあとも全件の再集計と一致する
+        self.casual_profile.is_movie_buff = False
+        self.casual_profile.save()
+        self.assertMatchesRebuild()
+        self.assertEqual(MovieScoreStats.objects.get(movie=self.movie).buff_review_count, 1)
+
+        self.casual_profile.is_movie_buff = True
+        self.casual_profile.save()
+        Review.objects.get(user=self.casual).delete()
+        self.assertMatchesRebuild()
+        self.assertEqual(MovieScoreStats.objects.get(movie=self.movie).buff_review_count, 1)
+
+    def test_like_count_follows_likes(self):
+        review = self.review(self.buff, 30, 85)
+        likes = [ReviewLike.objects.create(user=user, review=review) for user in (self.casual, self.no_profile)]
+        review.refresh_from_db()
+        self.assertEqual(review.like_count, 2)
+
+        likes[0].delete()
+        review.refresh_from_db()
+        self.assertEqual(review.like_count, 1)
+
+        # レビューごと削除してもエラーにならない
+        review.delete()
+        self.assertFalse(ReviewLike.objects.exists())
+
+
+# ========================================
+# レビュー一覧のカーソルページネーション
+# ========================================
+
+def base64_cursor(text):
+    return base64.urlsafe_b64encode(text.encode()).decode()
+
+
+class PaginateReviewsTests(TestCase):
+    def setUp(self):
+        self.movie = Movie.objects.create(title='ページ')
+        for i in range(11):
+            user = User.objects.create(username=f'user{i}')
+            # いいね数・ギャップ・投稿日時が同じレビューを混ぜる
+            Review.objects.create(
+                movie=self.movie, user=user, expectation=50, satisfaction=50 + i % 2 * 30,
+                like_count=i % 3, review_text='本文',
+            )
+        Review.objects.filter(pk__in=Review.objects.order_by('pk').values('pk')[:6]).update(
+            created_at=timezone.now()
+        )
+
+    def test_pages_have_no_gaps_or_duplicates_on_ties(self):
+        for sort in ('newest', 'likes', 'gap'):
+            with self.subTest(sort=sort):
+                expected = list(paginate_reviews(Review.objects.all(), sort, page_size=100)[0])
+                seen, cursor = [], None
+                while True:
+                    reviews, cursor = paginate_reviews(Review.objects.all(), sort, cursor, page_size=3)
+                    seen += reviews
+                    if cursor is None:
+                        break
+                self.assertEqual([review.pk for review in seen], [review.pk for review in expected])
+                self.assertEqual(len(set(seen)), 11)
+
+    def test_invalid_cursor_starts_from_first_page(self):
+        first_page, _ = paginate_reviews(Review.objects.all(), 'likes', page_size=3)
+        bad_value = base64_cursor('abc|1')
+        for cursor in ('!!!', 'bm90LWEtY3Vyc29y', bad_value, encode_cursor('2020-01-01', 1)):
+            with self.subTest(cursor=cursor):
+                reviews, _ = paginate_reviews(Review.objects.all(), 'likes', cursor, page_size=3)
+                self.assertEqual(reviews, first_page)
+
+    def test_no_cursor_when_last_page_is_exactly_full(self):
+        reviews, cursor = paginate_reviews(Review.objects.all(), 'newest', page_size=11)
+        self.assertEqual(len(reviews), 11)
+        self.assertIsNone(cursor)
+
+        reviews, cursor = paginate_reviews(Review.objects.all(), 'newest', page_size=10)
+        self.assertIsNotNone(cursor)
+        reviews, cursor = paginate_reviews(Review.objects.all(), 'newest', cursor, page_size=10)
+        self.assertEqual(len(reviews), 1)
+        self.assertIsNone(cursor)
+
+    def test_created_at_cursor_round_trip(self):
+        review = Review.objects.order_by('pk').last()
+        self.assertEqual(decode_cursor(encode_cursor(review.created_at, review.pk), 'created_at'),
+                         (review.created_at, review.pk))
+
+        # 末尾のレビューのカーソルの次はない
+        last = Review.objects.order_by('created_at', 'id').first()
+        reviews, cursor = paginate_reviews(Review.objects.all(), 'newest', encode_cursor(last.created_at, last.pk))
+        self.assertEqual((reviews, cursor), ([], None))
+
+
+# ========================================
+# TMDbの映画詳細の書き込み（MovieWriter）
+# ========================================
+
+def movie_detail(credits=True, videos=True):
+    detail = {'id': 10, 'title': '映画', 'original_title': 'Movie', 'release_date': '2020-01-01', 'genres': []}
+    if videos:
+        detail['videos'] = {'results': [{'type': 'Trailer', 'site': 'YouTube', 'key': 'abc'}]}
+    if credits:
+        detail['credits'] = {
+            'crew': [{'job': 'Director', 'id': 1, 'name': '監督'}],
+            'cast': [{'id': 2, 'name': '俳優A'}, {'id': 3, 'name': '俳優B'}],
+        }
+    return detail
+
+
+class MovieWriterTests(TestCase):
+    def write(self, detail):
+        writer = MovieWriter()
+        writer.add(detail['id'], detail)
+        return writer.flush()
+
+    def saved(self):
+        movie = Movie.objects.select_related('director').get(tmdb_id=10)
+        return (
+            movie.title, movie.trailer_url, movie.director.name,
+            list(movie.cast.order_by('name').values_list('name', flat=True)),
+        )
+
+    def test_second_flush_is_idempotent(self):
+        [(_, created)] = self.write(movie_detail())
+        self.assertTrue(created)
+        first = self.saved()
+
+        [(_, created)] = self.write(movie_detail())
+        self.assertFalse(created)
+        self.assertEqual(self.saved(), first)
+        self.assertEqual(Movie.objects.count(), 1)
+        self.assertEqual(Movie.cast.through.objects.count(), 2)
+
+    def test_keeps_trailer_and_credits_when_absent(self):
+        self.write(movie_detail())
+        first = self.saved()
+
+        self.write(movie_detail(credits=False, videos=False))
+        self.assertEqual(self.saved(), first)
+
+
+# ========================================
+# TMDbの変更フィードによる差分同期（sync_tmdb_changes）
+# ========================================
+
+class FixtureTMDbHandler(BaseHTTPRequestHandler):
+    """/movie/changes・/movie/popular・/movie/<id> だけを返すTMDb APIのフィクスチャ
+
+    changes: 変更フィードに載せるTMDb ID、popular: {ページ: TMDb IDのリスト}、
+    details: {TMDb ID: 映画詳細}（ないIDは404）。ETagを付け、If-None-Match が一致すれば304を返す
+    """
+    changes = []
+    popular = {}
+    details = {}
+    requested = []
+    not_modified = []
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        page = int(parse_qs(urlparse(self.path).query).get('page', ['1'])[0])
+        self.requested.append(path)
+        if path == '/3/movie/changes':
+            body = {'results': [{'id': tmdb_id} for tmdb_id in self.changes], 'page': page, 'total_pages': 1}
+        elif path == '/3/movie/popular':
+            body = {'results': [{'id': tmdb_id} for tmdb_id in self.popular.get(page, [])], 'page': page}
+        else:
+            body = self.details.get(int(path.rsplit('/', 1)[1]))
+            if body is None:
+                self.send_response(404)
+                self.end_headers()
+                return
+
+        data = json.dumps(body).encode()
+        etag = '"{}"'.format(hashlib.sha256(data).hexdigest())
+        if self.headers.get('If-None-Match') == etag:
+            self.not_modified.append(path)
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class FixtureTMDbMixin:
+    """テストの間だけフィクスチャサーバーを立て、TMDB_API_URL をそこに向ける"""
+
+    def setUp(self):
+        super().setUp()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), FixtureTMDbHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.settings_override = override_settings(
+            TMDB_API_URL=f'http://127.0.0.1:{self.server.server_port}/3', TMDB_CACHE_DIR='', TMDB_MAX_RETRIES=0,
+        )
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        FixtureTMDbHandler.requested = []
+        FixtureTMDbHandler.not_modified = []
+
+
+@mock.patch.dict('os.environ', {'TMDB_API_KEY': 'test'})
+class SyncTMDbChangesTests(FixtureTMDbMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.renamed = Movie.objects.create(tmdb_id=1, title='旧題', overview='概要', popularity=1)
+        self.unchanged = Movie.objects.create(tmdb_id=2, title='同じ', overview='概要', popularity=2)
+        self.not_in_feed = Movie.objects.create(tmdb_id=3, title='対象外', popularity=3)
+        # 4 は手元にない映画
+        FixtureTMDbHandler.changes = [1, 2, 4]
+        FixtureTMDbHandler.details = {
+            1: {'id': 1, 'title': '新題', 'overview': '概要', 'popularity': 1},
+            2: {'id': 2, 'title': '同じ', 'overview': '概要', 'popularity': 2},
+            4: {'id': 4, 'title': '手元にない'},
+        }
+        self.start = timezone.localdate() - timedelta(days=3)
+        SyncCheckpoint.advance(CHANGES_CHECKPOINT, self.start)
+
+    def sync(self):
+        out = io.StringIO()
+        with CaptureQueriesContext(connection) as queries:
+            call_command('sync_tmdb_changes', stdout=out)
+        return out.getvalue(), [query['sql'] for query in queries if query['sql'].startswith('UPDATE "reviews_movie"')]
+
+    def test_refetches_only_held_movies(self):
+        self.sync()
+        details = sorted(path for path in FixtureTMDbHandler.requested if path != '/3/movie/changes')
+        self.assertEqual(details, ['/3/movie/1', '/3/movie/2'])
+
+    def test_updates_only_changed_columns(self):
+        updated_at = Movie.objects.get(pk=self.unchanged.pk).updated_at
+        _, updates = self.sync()
+
+        self.renamed.refresh_from_db()
+        self.assertEqual(self.renamed.title, '新題')
+        self.assertEqual(Movie.objects.get(pk=self.unchanged.pk).updated_at, updated_at)
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"title"', updates[0])
+        self.assertNotIn('"overview"', updates[0])
+        self.assertNotIn('"popularity"', updates[0])
+        self.assertEqual(SyncCheckpoint.get(CHANGES_CHECKPOINT), timezone.localdate())
+
+    def test_japan_release_date_is_kept(self):
+        japan = Movie.objects.create(
+            tmdb_id=5, title='日本公開', release_date=date(2020, 2, 1), jp_release_date=date(2020, 2, 1),
+        )
+        updated_at = Movie.objects.get(pk=japan.pk).updated_at
+        FixtureTMDbHandler.changes = [5]
+        FixtureTMDbHandler.details = {5: {
+            'id': 5, 'title': '日本公開', 'release_date': '2019-12-01',
+            'release_dates': {'results': [
+                {'iso_3166_1': 'JP', 'release_dates': [{'type': 3, 'release_date': '2020-02-01T00:00:00.000Z'}]},
+            ]},
+        }}
+        _, updates = self.sync()
+
+        japan.refresh_from_db()
+        self.assertEqual(japan.release_date, date(2020, 2, 1))
+        self.assertEqual(japan.updated_at, updated_at)
+        self.assertEqual(updates, [])
+
+    def test_keeps_checkpoint_when_details_fail(self):
+        del FixtureTMDbHandler.details[2]
+        output, _ = self.sync()
+
+        self.assertIn('取得失敗', output)
+        self.assertEqual(SyncCheckpoint.get(CHANGES_CHECKPOINT), self.start)
+
+        # 次の実行では同じ期間から取り直す
+        FixtureTMDbHandler.details[2] = {'id': 2, 'title': '同じ', 'overview': '概要', 'popularity': 2}
+        FixtureTMDbHandler.requested = []
+        self.sync()
+        self.assertIn('/3/movie/2', FixtureTMDbHandler.requested)
+        self.assertEqual(SyncCheckpoint.get(CHANGES_CHECKPOINT), timezone.localdate())
+
+
+# ========================================
+# 映画の一括インポート（import_movies のジャーナルと再開）
+# ========================================
+
+@mock.patch.dict('os.environ', {'TMDB_API_KEY': 'test'})
+class ImportMoviesResumeTests(FixtureTMDbMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        FixtureTMDbHandler.popular = {1: [11, 12], 2: [21, 22]}
+        FixtureTMDbHandler.details = {
+            tmdb_id: {'id': tmdb_id, 'title': f'映画{tmdb_id}', 'overview': f'zyxwv marker{tmdb_id}'}
+            for tmdb_id in (11, 12, 21, 22)
+        }
+        self.journal = os.path.join(tempfile.mkdtemp(), 'journal.sqlite3')
+        self.addCleanup(shutil.rmtree, os.path.dirname(self.journal))
+
+    def import_movies(self, *args):
+        call_command('import_movies', '--pages', '2', '--journal', self.journal, *args, stdout=io.StringIO())
+
+    def searchable(self):
+        return set(Movie.objects.filter(pk__in=get_search_engine().search('zyxwv')).values_list('tmdb_id', flat=True))
+
+    def test_interrupted_run_is_searchable_after_resume(self):
+        complete_page = ImportJournal.complete_page
+        searchable_at_crash = []
+
+        def crash_on_second_page(journal, page, tmdb_ids):
+            if page == 2:
+                # 強制終了されたときと同じく、ここまでに完了したページの映画が索引済みであること
+                searchable_at_crash.append(self.searchable())
+                raise KeyboardInterrupt
+            complete_page(journal, page, tmdb_ids)
+
+        with mock.patch.object(ImportJournal, 'complete_page', crash_on_second_page):
+            with self.assertRaises(KeyboardInterrupt):
+                self.import_movies()
+        self.assertEqual(searchable_at_crash, [{11, 12, 21, 22}])
+
+        FixtureTMDbHandler.requested = []
+        self.import_movies('--resume')
+        self.assertEqual(self.searchable(), {11, 12, 21, 22})
+        self.assertEqual(FixtureTMDbHandler.requested, ['/3/movie/popular'])
+
+
+# ========================================
+# TMDbのレスポンスキャッシュ（ResponseCache）
+# ========================================
+
+class ResponseCacheTests(FixtureTMDbMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        FixtureTMDbHandler.details = {1: {'id': 1, 'title': '映画'}}
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def tmdb_client(self, cache_ttl):
+        return TMDbClient(api_key='test', max_retries=0, cache_dir=self.directory, cache_ttl=cache_ttl)
+
+    def test_fresh_response_is_not_requested(self):
+        self.tmdb_client(cache_ttl=60).movie_detail(1)
+        client = self.tmdb_client(cache_ttl=60)
+        self.assertEqual(client.movie_detail(1), {'id': 1, 'title': '映画'})
+        self.assertEqual(FixtureTMDbHandler.requested, ['/3/movie/1'])
+        self.assertEqual(client.stats()['cache_hits'], 1)
+
+    def test_stale_response_is_revalidated_with_etag(self):
+        self.tmdb_client(cache_ttl=0).movie_detail(1)
+        client = self.tmdb_client(cache_ttl=0)
+        self.assertEqual(client.movie_detail(1), {'id': 1, 'title': '映画'})
+        self.assertEqual(FixtureTMDbHandler.not_modified, ['/3/movie/1'])
+        self.assertEqual(client.stats()['cache_hits'], 1)
+
+        # 変わっていれば新しい本文を保存し直す
+        FixtureTMDbHandler.details[1]['title'] = '新題'
+        self.assertEqual(client.movie_detail(1)['title'], '新題')
+        self.assertEqual(self.tmdb_client(cache_ttl=60).movie_detail(1)['title'], '新題')
+        self.assertEqual(FixtureTMDbHandler.not_modified, ['/3/movie/1'])
+
+    def test_key_includes_base_url_but_not_api_key(self):
+        params = {'language': 'ja-JP', 'api_key': 'old'}
+        production = ResponseCache(self.directory, 60, 10 ** 6, base_url='https://api.themoviedb.org/3')
+        production.set('/movie/1', params, b'{}', {'ETag': '"a"'})
+
+        self.assertEqual(production.get('/movie/1', {**params, 'api_key': 'new'}).etag, '"a"')
+        self.assertIsNone(production.get('/movie/1', {**params, 'language': 'en-US'}))
+        self.assertIsNone(
+            ResponseCache(self.directory, 60, 10 ** 6, base_url='http://127.0.0.1:8000/3').get('/movie/1', params)
+        )
+
+
+# ========================================
+# インポートのジャーナル（ImportJournal）
+# ========================================
+
+class ImportJournalTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'journal.sqlite3')
+
+    def journal(self, worker, claim_timeout=60):
+        journal = ImportJournal(self.path, 'popular', claim_timeout=claim_timeout)
+        journal.worker = worker
+        self.addCleanup(journal.close)
+        return journal
+
+    def test_claims_are_exclusive_until_they_expire(self):
+        first, second = self.journal('first'), self.journal('second')
+        self.assertEqual(first.claim_pages([1, 2, 3], 2), [1, 2])
+        self.assertEqual(second.claim_pages([1, 2, 3], 2), [3])
+        self.assertEqual(second.claim_pages([1, 2, 3], 2), [])
+
+        # 付け直されないまま期限を過ぎたページは引き継ぐ
+        first.connection.execute("UPDATE pages SET claimed_at = claimed_at - 120 WHERE worker = 'first'")
+        self.assertEqual(second.claim_pages([1, 2, 3], 2), [1, 2])
+
+    def test_heartbeat_keeps_claims_alive(self):
+        first, second = self.journal('first', claim_timeout=0.3), self.journal('second', claim_timeout=0.3)
+        first.claim_pages([1], 1)
+        with first.heartbeat([1]):
+            time.sleep(0.6)
+            self.assertEqual(second.claim_pages([1], 1), [])
+
+        time.sleep(0.4)
+        self.assertEqual(second.claim_pages([1], 1), [1])
+
+    def test_reset_is_refused_while_another_worker_holds_pages(self):
+        first, second = self.journal('first'), self.journal('second')
+        first.claim_pages([1, 2], 2)
+        first.complete_page(1, [11])
+
+        self.assertFalse(second.reset())
+        self.assertEqual(first.done_pages(), {1})
+
+        first.complete_page(2, [21])
+        self.assertTrue(second.reset())
+        self.assertEqual((first.done_pages(), first.done_ids()), (set(), set()))
+
+    def test_release_page_only_releases_own_claims(self):
+        first, second = self.journal('first'), self.journal('second')
+        first.claim_pages([1], 1)
+        second.release_page(1)
+        self.assertEqual(second.claim_pages([1], 1), [])
+
+        first.release_page(1)
+        self.assertEqual(second.claim_pages([1], 1), [1])
+
+
+# ========================================
+# 高度な検索（公開年の絞り込み・並び替え）
+# ========================================
+
+class FilterMovieIdsTests(TestCase):
+    def setUp(self):
+        # 人気度の高い（関連度順で先頭に来る）映画ほど新しい
+        self.movies = [
+            Movie.objects.create(title=f'検索映画{i}', popularity=i, release_date=date(2000 + i, 1, 1))
+            for i in range(6)
+        ]
+
+    def test_sort_covers_matches_beyond_limit(self):
+        ids = filter_movie_ids('検索映画', sort='year_asc', limit=3)
+        self.assertEqual(ids, [movie.pk for movie in self.movies[:4]])
+
+    def test_year_filter_covers_matches_beyond_limit(self):
+        ids = filter_movie_ids('検索映画', year_from=2000, year_to=2001, limit=3)
+        self.assertEqual(ids, [self.movies[1].pk, self.movies[0].pk])
+
+
+# ========================================
+# 検索用の正規化と検索ドキュメント
+# ========================================
+
+class SearchDocumentTests(TestCase):
+    def test_long_vowel_marks_are_removed(self):
+        self.assertEqual(normalize_search_text('ラ～メン ﾗｰﾒﾝ ラ〜メン'), 'らめん らめん らめん')
+
+    def test_one_title_or_name_per_line(self):
+        director = Person.objects.create(name='Christopher Nolan')
+        movie = Movie.objects.create(title='ダーク・ナイト', original_title='The Dark Knight', director=director)
+        movie.cast.add(Person.objects.create(name='Christian Bale'))
+
+        document = MovieSearchDocument.objects.get(movie=movie)
+        self.assertEqual(document.title.splitlines(), ['だく ないと', 'the dark knight'])
+        self.assertEqual(document.people.splitlines(), ['christopher nolan', 'christian bale'])
+
+
+class NgramIndexTests(TestCase):
+    def search(self, query):
+        return get_search_engine().search(normalize_search_text(query))
+
+    def test_index_follows_saves_without_rebuild(self):
+        movie = Movie.objects.create(title='ダーク・ナイト', original_title='The Dark Knight')
+        self.assertTrue(SearchNgram.objects.filter(field='title', gram='だくな').exists())
+        # 記号・長音の有無が違っても、FTS5の語には一致しない綴りでも引ける
+        self.assertEqual(self.search('ダークナイト'), [movie.pk])
+
+        movie.title = 'インセプション'
+        movie.save()
+        self.assertEqual(self.search('ダークナイト'), [])
+        self.assertEqual(self.search('せぷ'), [movie.pk])
+        self.assertFalse(SearchNgram.objects.filter(field='title', gram='だくな').exists())
+
+        movie.cast.add(Person.objects.create(name='渡辺謙'))
+        self.assertEqual(self.search('渡辺'), [movie.pk])
+
+        movie.delete()
+        self.assertFalse(SearchNgram.objects.exists())
+
+    def test_title_matches_come_first(self):
+        actor = Movie.objects.create(title='ある男', popularity=90)
+        actor.cast.add(Person.objects.create(name='北野武'))
+        titled = Movie.objects.create(title='北野の夏', popularity=10)
+        self.assertEqual(self.search('北野'), [titled.pk, actor.pk])
+
+
+# ========================================
+# ワーカーごとの検索用インデックス（カタログのバージョンで作り直し）
+# ========================================
+
+@mock.patch('reviews.search.autocomplete.VERSION_CHECK_INTERVAL', 0)
+class CatalogIndexCacheTests(TestCase):
+    def setUp(self):
+        autocomplete_cache.clear()
+        facet_index_cache.clear()
+
+    def test_prefix_index_is_rebuilt_when_catalog_changes(self):
+        Movie.objects.create(title='インセプション', popularity=5)
+        index = autocomplete_cache.get_index()
+        self.assertEqual([s.label for s in autocomplete('いんせ')], ['インセプション'])
+        self.assertIs(autocomplete_cache.get_index(), index)
+
+        Movie.objects.create(title='インターステラー', popularity=9)
+        self.assertIsNot(autocomplete_cache.get_index(), index)
+        self.assertEqual([s.label for s in autocomplete('イン')], ['インターステラー', 'インセプション'])
+
+    def test_facet_index_is_rebuilt_when_catalog_changes(self):
+        Movie.objects.create(title='ファセット1', release_date=date(1999, 1, 1))
+        index = facet_index_cache.get_index()
+        self.assertEqual(len(index), 1)
+        self.assertIs(facet_index_cache.get_index(), index)
+
+        Movie.objects.create(title='ファセット2', release_date=date(2001, 1, 1))
+        index = facet_index_cache.get_index()
+        self.assertEqual(len(index), 2)
+        self.assertEqual(index.option_counts('decade', index.mask({})), [(1990, 1), (2000, 1)])
+
+    def test_version_is_checked_only_every_interval(self):
+        Movie.objects.create(title='間隔1')
+        with mock.patch('reviews.search.autocomplete.VERSION_CHECK_INTERVAL', 60):
+            index = autocomplete_cache.get_index()
+            Movie.objects.create(title='間隔2')
+            self.assertIs(autocomplete_cache.get_index(), index)
+
+
+# ========================================
+# 詳細ページの条件付きGET（views._content_etag）
+# ========================================
+
+class ContentETagTests(TestCase):
+    def setUp(self):
+        autocomplete_cache.clear()
+        facet_index_cache.clear()
+        search_stats_buffer.counts.clear()
+        self.author = User.objects.create(username='author')
+        self.movie = Movie.objects.create(title='ETag')
+        self.column = Column.objects.create(author=self.author, title='コラム', content='本文')
+        self.discussion = Discussion.objects.create(user=self.author, title='話題', content='本文')
+
+    def get(self, url, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(url, secure=True, **headers)
+
+    def assertETagChanges(self, url, change):
+        response = self.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertEqual(self.get(url, etag).status_code, 304)
+
+        change()
+        response = self.get(url, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_movie_detail(self):
+        reviewer = User.objects.create(username='reviewer')
+        self.assertETagChanges(reverse('movie_detail', args=[self.movie.pk]), lambda: Review.objects.create(
+            movie=self.movie, user=reviewer, expectation=50, satisfaction=80, review_text='本文',
+        ))
+
+    def test_column_detail(self):
+        self.assertETagChanges(reverse('column_detail', args=[self.column.pk]), lambda: Comment.objects.create(
+            user=self.author, column=self.column, content='コメント',
+        ))
+
+    def test_discussion_detail(self):
+        self.assertETagChanges(reverse('discussion_detail', args=[self.discussion.pk]), lambda: DiscussionComment.objects.create(
+            user=self.author, discussion=self.discussion, content='コメント',
+        ))
+
+    def test_logged_in_users_get_no_etag(self):
+        self.client.force_login(self.author)
+        response = self.get(reverse('movie_detail', args=[self.movie.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('ETag'))
@@ -0,0 +1,9 @@
+# reviews/tmdb - TMDb APIクライアント（取得・パース・書き込み・差分同期・ジャーナル）
+from .ratelimit import TokenBucket
+from .cache import ResponseCache
+from .client import TMDbClient, TMDbError, get_client
+from .parser import (
+    parse_date, japan_release_date, trailer_url, director, cast, movie_fields,
+)
+from .writer import PersonCache, MovieWriter
+from .journal import ImportJournal
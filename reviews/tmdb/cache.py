@@ -0,0 +1,139 @@
+# reviews/tmdb/cache.py - TMDbのレスポンスをディスクに置くキャッシュ（gzip・TTL・条件付き再検証・LRU）
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import NamedTuple
+from urllib.parse import urlencode
+
+# 容量を超えたら、上限のこの割合まで古いものから消す
+EVICT_TO_RATIO = 0.9
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+    last_modified: str
+    stored_at: float
+
+    def is_fresh(self, ttl):
+        return time.time() - self.stored_at < ttl
+
+    def conditional_headers(self):
+        """再検証用のヘッダー（304 が返れば本文はそのまま使える）"""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    """リクエスト（APIのURL＋パス＋パラメーター）のハッシュをファイル名にしたレスポンスキャッシュ
+
+    キーに api_key は含めないので、キーを替えても同じキャッシュを使える。
+    APIのURL（base_url）は含めるので、向き先の違うサーバーのレスポンスは混ざらない。
+    ファイルは「メタデータのJSON 1行＋本文」をgzipで圧縮したもの。
+    TTL内ならそのまま使い、過ぎたら ETag / Last-Modified で再検証する。
+    読むたびに更新日時を付け直し、max_bytes を超えたら最も長く使われていないものから消す（LRU）。
+    """
+
+    def __init__(self, directory, ttl, max_bytes, base_url=''):
+        self.directory = Path(directory)
+        self.base_url = base_url
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._size = None
+        self._lock = threading.Lock()
+
+    def key(self, path, params):
+        query = urlencode(sorted((name, str(value)) for name, value in params.items() if name != 'api_key'))
+        return hashlib.sha256(f'{self.base_url}{path}?{query}'.encode()).hexdigest()
+
+    def _file(self, key):
+        return self.directory / key[:2] / f'{key}.gz'
+
+    def get(self, path, params):
+        """保存済みのレスポンス（なければ None）"""
+        file = self._file(self.key(path, params))
+        try:
+            meta, body = gzip.decompress(file.read_bytes()).split(b'\n', 1)
+            meta = json.loads(meta)
+            os.utime(file)
+        except (OSError, EOFError, ValueError, zlib.error):
+            return None
+        return CachedResponse(body, meta.get('etag', ''), meta.get('last_modified', ''), meta['stored_at'])
+
+    def set(self, path, params, body, headers=None):
+        """レスポンスを保存する（同じキーのファイルは置き換え）"""
+        headers = headers or {}
+        meta = {
+            'etag': headers.get('ETag', ''),
+            'last_modified': headers.get('Last-Modified', ''),
+            'stored_at': time.time(),
+        }
+        self._write(self._file(self.key(path, params)), gzip.compress(json.dumps(meta).encode() + b'\n' + body))
+
+    def revalidated(self, path, params, cached):
+        """304 が返ったレスポンスを、保存日時だけ新しくして保存し直す"""
+        self.set(path, params, cached.body, {'ETag': cached.etag, 'Last-Modified': cached.last_modified})
+
+    def _write(self, file, data):
+        file.parent.mkdir(parents=True, exist_ok=True)
+        # 一時ファイルに書いてから置き換えるので、並行に読んでも書きかけは見えない
+        fd, temp = tempfile.mkstemp(dir=file.parent, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        try:
+            replaced = file.stat().st_size
+        except OSError:
+            replaced = 0
+        os.replace(temp, file)
+
+        with self._lock:
+            if self._size is None:
+                self._size = self.disk_usage()
+            else:
+                self._size += len(data) - replaced
+            if self._size > self.max_bytes:
+                self._size = self._evict(int(self.max_bytes * EVICT_TO_RATIO))
+
+    def _files(self):
+        return self.directory.glob('*/*.gz')
+
+    def disk_usage(self):
+        return sum(file.stat().st_size for file in self._files())
+
+    def _evict(self, target):
+        """最も長く使われていないファイルから消して、合計を target 以下にする"""
+        entries = []
+        for file in self._files():
+            try:
+                stat = file.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, file))
+        entries.sort()
+
+        size = sum(entry[1] for entry in entries)
+        for _, file_size, file in entries:
+            if size <= target:
+                break
+            try:
+                file.unlink()
+            except OSError:
+                continue
+            size -= file_size
+        return size
+
+    def clear(self):
+        with self._lock:
+            for file in self._files():
+                file.unlink(missing_ok=True)
+            self._size = 0
@@ -0,0 +1,211 @@
+# reviews/tmdb/client.py - TMDb APIクライアント（レート制限・リトライ・並行取得）
+import json
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from decouple import config
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from .cache import ResponseCache
+from .ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+# 429（レート制限）と一時的なサーバーエラーはリトライする
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# バックオフの基準と上限（秒）
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30
+# 映画詳細と一緒に取得するデータ
+DETAIL_APPEND = 'credits,videos,release_dates'
+
+
+class TMDbError(Exception):
+    """TMDb APIの呼び出しに失敗した（リトライしても成功しなかった）"""
+
+
+def backoff_delay(attempt):
+    """attempt 回目のリトライまでの待ち時間（指数バックオフ＋ジッター）"""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+def retry_after(response):
+    """Retry-After ヘッダーの秒数（なければ None）"""
+    try:
+        return max(0.0, float(response.headers['Retry-After']))
+    except (KeyError, ValueError):
+        return None
+
+
+class TMDbClient:
+    """TMDb APIクライアント
+
+    リクエストはすべてトークンバケット（settings.TMDB_RATE_LIMIT 件／秒）を通すので、
+    map() で並行に取得してもTMDbの制限を超えない。429・5xx・接続エラーは
+    ジッター付きの指数バックオフで settings.TMDB_MAX_RETRIES 回までリトライする。
+    接続はSessionでプールして使い回し、リクエスト数・リトライ数・失敗数・所要時間を数える。
+
+    settings.TMDB_CACHE_DIR を設定するとレスポンスをディスクにキャッシュし、TTL
+    （cache_ttl、既定は settings.TMDB_CACHE_TTL）内ならリクエストせずに返す。
+    cache_ttl=0 なら毎回 ETag / Last-Modified で再検証する。
+    """
+
+    def __init__(self, api_key=None, language='ja-JP', rate=None, max_workers=None, max_retries=None, timeout=None,
+                 base_url=None, cache_dir=None, cache_ttl=None):
+        self.api_key = api_key if api_key is not None else config('TMDB_API_KEY', default='')
+        self.base_url = (base_url or settings.TMDB_API_URL).rstrip('/')
+        self.language = language
+        self.max_workers = max_workers or settings.TMDB_MAX_WORKERS
+        self.max_retries = settings.TMDB_MAX_RETRIES if max_retries is None else max_retries
+        self.timeout = timeout or (settings.TMDB_CONNECT_TIMEOUT, settings.TMDB_READ_TIMEOUT)
+        self.bucket = TokenBucket(rate or settings.TMDB_RATE_LIMIT)
+
+        cache_dir = settings.TMDB_CACHE_DIR if cache_dir is None else cache_dir
+        self.cache = ResponseCache(
+            cache_dir,
+            settings.TMDB_CACHE_TTL if cache_ttl is None else cache_ttl,
+            settings.TMDB_CACHE_MAX_BYTES,
+            base_url=self.base_url,
+        ) if cache_dir else None
+
+        # 接続はワーカー数ぶんプールして使い回す
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self.request_count = 0
+        self.retry_count = 0
+        self.error_count = 0
+        self.cache_hit_count = 0
+        self.request_seconds = 0.0
+        self._count_lock = threading.Lock()
+
+    def _count(self, seconds, retried=False):
+        with self._count_lock:
+            self.request_count += 1
+            self.request_seconds += seconds
+            if retried:
+                self.retry_count += 1
+
+    def _cache_hit(self):
+        with self._count_lock:
+            self.cache_hit_count += 1
+
+    def _fail(self, message):
+        with self._count_lock:
+            self.error_count += 1
+        logger.error('TMDb APIエラー: %s', message)
+        return TMDbError(message)
+
+    def stats(self):
+        """これまでのリクエストの集計"""
+        return {
+            'requests': self.request_count,
+            'retries': self.retry_count,
+            'errors': self.error_count,
+            'cache_hits': self.cache_hit_count,
+            'seconds': round(self.request_seconds, 1),
+        }
+
+    def get(self, path, use_cache=True, **params):
+        """GET して JSON を返す（失敗したら TMDbError）
+
+        use_cache=False ならディスクキャッシュを使わない（変更フィードなど時刻で変わるもの）。
+        """
+        params = {'language': self.language, **params}
+        cache = self.cache if use_cache else None
+        cached = cache.get(path, params) if cache else None
+        if cached and cached.is_fresh(cache.ttl):
+            self._cache_hit()
+            return json.loads(cached.body)
+
+        url = f'{self.base_url}{path}'
+        query = {'api_key': self.api_key, **params}
+        headers = cached.conditional_headers() if cached else {}
+
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            last_attempt = attempt == self.max_retries
+            started_at = time.monotonic()
+            try:
+                response = self.session.get(url, params=query, headers=headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self._count(time.monotonic() - started_at, retried=attempt > 0)
+                if last_attempt:
+                    raise self._fail(f'{path}: {e}') from e
+                time.sleep(backoff_delay(attempt))
+                continue
+            self._count(time.monotonic() - started_at, retried=attempt > 0)
+
+            if response.status_code in RETRY_STATUSES and not last_attempt:
+                delay = retry_after(response)
+                if response.status_code == 429:
+                    # 制限を超えたのは全ワーカー共通なので、バケットごと止める
+                    self.bucket.pause(delay if delay is not None else backoff_delay(attempt))
+                else:
+                    time.sleep(delay if delay is not None else backoff_delay(attempt))
+                logger.warning('TMDb API %s: %s（%d回目のリトライ）', path, response.status_code, attempt + 1)
+                continue
+
+            if response.status_code == 304 and cached:
+                # 変わっていないので保存済みの本文を使う
+                self._cache_hit()
+                cache.revalidated(path, params, cached)
+                return json.loads(cached.body)
+
+            try:
+                response.raise_for_status()
+                data = response.json()
+            except (requests.HTTPError, ValueError) as e:
+                raise self._fail(f'{path}: {e}') from e
+            if cache:
+                cache.set(path, params, response.content, response.headers)
+            return data
+
+        raise self._fail(f'{path}: リトライの上限に達しました')
+
+    def movie_list(self, category, page=1, **params):
+        """映画一覧（popular / top_rated / now_playing / upcoming）の1ページ"""
+        return self.get(f'/movie/{category}', page=page, **params)
+
+    def movie_detail(self, tmdb_id, append=DETAIL_APPEND):
+        """映画の詳細（クレジット・動画・国別公開日つき）"""
+        return self.get(f'/movie/{tmdb_id}', append_to_response=append)
+
+    def movie_changes(self, start_date, end_date, page=1):
+        """start_date〜end_date（14日以内）に変更があった映画IDの1ページ"""
+        return self.get(
+            '/movie/changes', use_cache=False,
+            start_date=start_date.isoformat(), end_date=end_date.isoformat(), page=page,
+        )
+
+    def map(self, func, items):
+        """func(item) を並行に呼び、終わった順に (item, 結果, 例外) を返す
+
+        ワーカーは max_workers 本まで。失敗した item は結果が None で例外が入る。
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(func, item): item for item in items}
+            for future in as_completed(futures):
+                error = future.exception()
+                yield futures[future], None if error else future.result(), error
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_client():
+    """プロセスで共有するクライアント（Webリクエストなどから使う）"""
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = TMDbClient()
+        return _default_client
@@ -0,0 +1,174 @@
+# reviews/tmdb/journal.py - インポートの進み具合を記録するジャーナル（中断からの再開・複数プロセスでの分担）
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+# 取ったまま完了しないページを、止まったワーカーのものとみなして引き継ぐまでの秒数
+CLAIM_TIMEOUT = 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    job TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    worker TEXT NOT NULL,
+    claimed_at REAL NOT NULL,
+    PRIMARY KEY (job, page)
+);
+CREATE TABLE IF NOT EXISTS movies (
+    job TEXT NOT NULL,
+    tmdb_id INTEGER NOT NULL,
+    PRIMARY KEY (job, tmdb_id)
+);
+"""
+
+
+class ImportJournal:
+    """完了したページとTMDb IDをSQLiteファイルに記録する
+
+    ページは claim_pages() で取ってから処理し、complete_page() で完了にする。
+    取る処理は BEGIN IMMEDIATE で直列化するので、同じジャーナルを使う複数のプロセスが
+    同じページを重ねて処理することはない。処理中は heartbeat() で取った時刻を付け直し、
+    付け直されないまま claim_timeout 秒たったページは止まったワーカーのものとみなして
+    ほかのワーカー（または再開したプロセス）が引き継ぐ。
+    """
+
+    def __init__(self, path, job, claim_timeout=CLAIM_TIMEOUT):
+        self.path = path
+        self.job = job
+        self.claim_timeout = claim_timeout
+        self.worker = f'{socket.gethostname()}:{os.getpid()}'
+        self.connection = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def reset(self):
+        """このジョブの記録を消して最初からにする
+
+        ほかのワーカーが期限内に取っているページがあれば、分担中とみなして消さずに False を返す。
+        """
+        with self._transaction():
+            active = self.connection.execute(
+                "SELECT 1 FROM pages WHERE job = ? AND status = 'claimed' AND worker != ? AND claimed_at > ? LIMIT 1",
+                (self.job, self.worker, time.time() - self.claim_timeout),
+            ).fetchone()
+            if active:
+                return False
+            self.connection.execute('DELETE FROM pages WHERE job = ?', (self.job,))
+            self.connection.execute('DELETE FROM movies WHERE job = ?', (self.job,))
+        return True
+
+    def _transaction(self):
+        return _Immediate(self.connection)
+
+    def done_pages(self):
+        rows = self.connection.execute("SELECT page FROM pages WHERE job = ? AND status = 'done'", (self.job,))
+        return {page for page, in rows}
+
+    def done_ids(self):
+        rows = self.connection.execute('SELECT tmdb_id FROM movies WHERE job = ?', (self.job,))
+        return {tmdb_id for tmdb_id, in rows}
+
+    def remaining(self, pages):
+        """pages のうちまだ完了していないページ"""
+        done = self.done_pages()
+        return [page for page in pages if page not in done]
+
+    def claim_pages(self, pages, count, exclude=()):
+        """pages のうち誰も処理していないページを小さい順に最大 count ページ取る"""
+        now = time.time()
+        with self._transaction():
+            taken = {
+                page: (status, claimed_at)
+                for page, status, claimed_at in self.connection.execute(
+                    'SELECT page, status, claimed_at FROM pages WHERE job = ?', (self.job,)
+                )
+            }
+            claimed = []
+            for page in pages:
+                if len(claimed) >= count:
+                    break
+                if page in exclude:
+                    continue
+                status, claimed_at = taken.get(page, (None, 0))
+                if status is None or (status == 'claimed' and now - claimed_at >= self.claim_timeout):
+                    claimed.append(page)
+
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO pages (job, page, status, worker, claimed_at) VALUES (?, ?, 'claimed', ?, ?)",
+                [(self.job, page, self.worker, now) for page in claimed],
+            )
+        return claimed
+
+    def refresh_claims(self, pages, connection=None):
+        """このワーカーが取っている pages の取った時刻を今にする（完了・手放したページはそのまま）"""
+        connection = connection or self.connection
+        with _Immediate(connection):
+            connection.executemany(
+                "UPDATE pages SET claimed_at = ? WHERE job = ? AND page = ? AND status = 'claimed' AND worker = ?",
+                [(time.time(), self.job, page, self.worker) for page in pages],
+            )
+
+    @contextmanager
+    def heartbeat(self, pages):
+        """with の間、claim_timeout の1/3ごとに pages の取った時刻を付け直す
+
+        詳細の取得がリトライで長引いても、処理中のページをほかのワーカーに引き継がれないようにする。
+        SQLiteの接続はスレッドをまたげないので、付け直すスレッドは自分の接続を開く。
+        """
+        stop = threading.Event()
+
+        def beat():
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            try:
+                while not stop.wait(self.claim_timeout / 3):
+                    self.refresh_claims(pages, connection)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=beat, daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def release_page(self, page):
+        """処理できなかったページを手放す（次の再開時にやり直す。完了済み・他のワーカーのページはそのまま）"""
+        with self._transaction():
+            self.connection.execute(
+                "DELETE FROM pages WHERE job = ? AND page = ? AND status = 'claimed' AND worker = ?",
+                (self.job, page, self.worker),
+            )
+
+    def complete_page(self, page, tmdb_ids):
+        """ページとそのページのTMDb IDを完了として記録する"""
+        with self._transaction():
+            self.connection.executemany(
+                'INSERT OR IGNORE INTO movies (job, tmdb_id) VALUES (?, ?)',
+                [(self.job, tmdb_id) for tmdb_id in tmdb_ids],
+            )
+            self.connection.execute(
+                "INSERT OR REPLACE INTO pages (job, page, status, worker, claimed_at) VALUES (?, ?, 'done', ?, ?)",
+                (self.job, page, self.worker, time.time()),
+            )
+
+
+class _Immediate:
+    """BEGIN IMMEDIATE 〜 COMMIT（例外なら ROLLBACK）"""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute('BEGIN IMMEDIATE')
+
+    def __exit__(self, exc_type, exc, tb):
+        self.connection.execute('ROLLBACK' if exc_type else 'COMMIT')
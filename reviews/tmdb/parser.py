@@ -0,0 +1,79 @@
+# reviews/tmdb/parser.py - TMDbのレスポンスからMovieのフィールドを取り出す
+from datetime import date
+
+# 国別公開日の種類（3 = 劇場公開）
+THEATRICAL_RELEASE = 3
+# 取り込むキャストの人数（ビリング順の上位）
+CAST_LIMIT = 5
+
+
+def parse_date(value):
+    """'2024-01-31' や '2024-01-31T00:00:00.000Z' を date に（不正なら None）"""
+    try:
+        return date.fromisoformat((value or '')[:10])
+    except ValueError:
+        return None
+
+
+def japan_release_date(detail):
+    """日本の公開日（劇場公開を優先し、なければ最初の公開日）"""
+    for country_data in detail.get('release_dates', {}).get('results', []):
+        if country_data.get('iso_3166_1') != 'JP':
+            continue
+        releases = country_data.get('release_dates', [])
+        theatrical = [release for release in releases if release.get('type') == THEATRICAL_RELEASE]
+        for release in theatrical + releases:
+            release_date = parse_date(release.get('release_date'))
+            if release_date:
+                return release_date
+        return None
+    return None
+
+
+def trailer_url(detail):
+    """YouTubeの予告編の埋め込みURL（なければ空文字）"""
+    for video in detail.get('videos', {}).get('results', []):
+        if video.get('type') == 'Trailer' and video.get('site') == 'YouTube' and video.get('key'):
+            return f'https://www.youtube.com/embed/{video["key"]}'
+    return ''
+
+
+def director(detail):
+    """監督の (TMDb人物ID, 名前)（クレジットの最初の Director。なければ None）"""
+    for person in detail.get('credits', {}).get('crew', []):
+        if person.get('job') == 'Director' and person.get('id') and person.get('name'):
+            return person['id'], person['name']
+    return None
+
+
+def cast(detail, limit=CAST_LIMIT):
+    """キャストの (TMDb人物ID, 名前)（ビリング順に上位 limit 人）"""
+    return [
+        (person['id'], person['name'])
+        for person in detail.get('credits', {}).get('cast', [])[:limit]
+        if person.get('id') and person.get('name')
+    ]
+
+
+def movie_fields(detail):
+    """映画詳細のレスポンスから Movie に保存するフィールド（tmdb_id 以外）
+
+    予告編が見つからないときは trailer_url を含めない（管理画面で設定した予告編を消さない）。
+    """
+    fields = {
+        'title': detail.get('title') or '',
+        'original_title': detail.get('original_title') or '',
+        'overview': detail.get('overview') or '',
+        'release_date': parse_date(detail.get('release_date')),
+        'jp_release_date': japan_release_date(detail),
+        'runtime': detail.get('runtime'),
+        'poster_path': detail.get('poster_path') or '',
+        'backdrop_path': detail.get('backdrop_path') or '',
+        'popularity': detail.get('popularity') or 0,
+        'vote_average': detail.get('vote_average') or 0,
+        'vote_count': detail.get('vote_count') or 0,
+    }
+    url = trailer_url(detail)
+    if url:
+        fields['trailer_url'] = url
+    return fields
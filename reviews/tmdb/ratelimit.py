@@ -0,0 +1,38 @@
+# reviews/tmdb/ratelimit.py - トークンバケットによるリクエスト数の制限（スレッド間で共有）
+import threading
+import time
+
+
+class TokenBucket:
+    """毎秒 rate 個のトークンを補充し、最大 capacity 個まで貯めるバケット
+
+    リクエストのたびに acquire() で1個取り出す。空なら補充されるまで待つので、
+    ワーカーが何本あっても全体で毎秒 rate 件（瞬間的には capacity 件）を超えない。
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or rate)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def acquire(self, tokens=1):
+        while True:
+            with self.lock:
+                self._refill(time.monotonic())
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """429 の Retry-After などで、バケット全体をしばらく空にする"""
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, 0) - seconds * self.rate
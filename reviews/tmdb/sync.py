@@ -0,0 +1,116 @@
+# reviews/tmdb/sync.py - TMDbの変更フィード（/movie/changes）による差分同期
+from collections import defaultdict
+from datetime import timedelta
+from typing import NamedTuple
+
+from django.db import transaction
+from django.utils import timezone
+
+from reviews.models import Movie, CatalogVersion
+from reviews.search import update_search_index
+from .parser import movie_fields
+
+# /movie/changes で一度に指定できる期間（日）
+CHANGES_WINDOW_DAYS = 14
+# SyncCheckpoint の名前
+CHANGES_CHECKPOINT = 'tmdb_movie_changes'
+# 変更フィードで同期する列（クレジット・ジャンルは扱わない）
+SYNC_FIELDS = (
+    'title', 'original_title', 'overview', 'release_date', 'jp_release_date', 'runtime',
+    'poster_path', 'backdrop_path', 'popularity', 'vote_average', 'vote_count', 'trailer_url',
+)
+# 変わったら検索キー・検索インデックスも更新する列
+SEARCH_FIELDS = {'title', 'original_title'}
+# 1回に比較・更新する映画の本数
+SYNC_BATCH_SIZE = 500
+
+
+class SyncResult(NamedTuple):
+    changed: int   # 変更フィードに載っていた映画
+    held: int      # そのうち手元にある映画
+    updated: int   # 列が変わっていて更新した映画
+    failed: int    # 詳細を取得できなかった映画
+
+
+def change_windows(start_date, end_date):
+    """start_date〜end_date を CHANGES_WINDOW_DAYS 日以内の期間に分ける"""
+    while start_date <= end_date:
+        window_end = min(start_date + timedelta(days=CHANGES_WINDOW_DAYS - 1), end_date)
+        yield start_date, window_end
+        start_date = window_end + timedelta(days=1)
+
+
+def changed_movie_ids(client, start_date, end_date):
+    """期間内に変更があった映画のTMDb ID（2ページ目以降は並行に取得）
+
+    1ページでも取れなければ TMDbError（チェックポイントを進めないように）。
+    """
+    first = client.movie_changes(start_date, end_date)
+    tmdb_ids = {result['id'] for result in first.get('results', [])}
+    pages = range(2, (first.get('total_pages') or 1) + 1)
+    for page, data, error in client.map(lambda page: client.movie_changes(start_date, end_date, page), pages):
+        if error:
+            raise error
+        tmdb_ids.update(result['id'] for result in data.get('results', []))
+    return tmdb_ids
+
+
+def sync_fields(movie, detail):
+    """映画詳細と比べて値が変わった列（movie にはその値を入れる）
+
+    release_date は import_movies と同じく、日本の公開日があればそちらと比べる。
+    """
+    fields = movie_fields(detail)
+    fields['release_date'] = fields['jp_release_date'] or fields['release_date']
+    changed = [name for name in SYNC_FIELDS if name in fields and getattr(movie, name) != fields[name]]
+    for name in changed:
+        setattr(movie, name, fields[name])
+    if SEARCH_FIELDS.intersection(changed):
+        movie.set_search_keys()
+        changed += ['title_key', 'original_title_key']
+    return changed
+
+
+def sync_movies(client, tmdb_ids, batch_size=SYNC_BATCH_SIZE):
+    """手元にある映画のうち tmdb_ids のものだけ詳細を取り直し、変わった列だけを一括更新する
+
+    bulk_update はシグナルを通らないので、タイトルが変わった映画は検索インデックスを、
+    人気度などだけが変わったときはカタログのバージョンを明示的に更新する。
+    """
+    tmdb_ids = sorted(tmdb_ids)
+    held = updated = failed = 0
+    search_pks = []
+
+    for i in range(0, len(tmdb_ids), batch_size):
+        movies = {
+            movie.tmdb_id: movie
+            for movie in Movie.objects.filter(tmdb_id__in=tmdb_ids[i:i + batch_size]).only('tmdb_id', *SYNC_FIELDS)
+        }
+        held += len(movies)
+
+        # 変わった列の組み合わせごとに bulk_update する
+        groups = defaultdict(list)
+        now = timezone.now()
+        for tmdb_id, detail, error in client.map(client.movie_detail, list(movies)):
+            if error:
+                failed += 1
+                continue
+            movie = movies[tmdb_id]
+            changed = sync_fields(movie, detail)
+            if not changed:
+                continue
+            if 'title_key' in changed:
+                search_pks.append(movie.pk)
+            movie.updated_at = now
+            groups[tuple(changed) + ('updated_at',)].append(movie)
+
+        with transaction.atomic():
+            for fields, group in groups.items():
+                Movie.objects.bulk_update(group, fields, batch_size=batch_size)
+        updated += sum(len(group) for group in groups.values())
+
+    if search_pks:
+        update_search_index(search_pks)
+    elif updated:
+        CatalogVersion.bump()
+    return SyncResult(len(tmdb_ids), held, updated, failed)
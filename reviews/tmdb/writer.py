@@ -0,0 +1,167 @@
+# reviews/tmdb/writer.py - 取得した映画をまとめてDBに書き込む
+from collections import defaultdict
+
+from django.db import transaction
+
+from reviews.models import Movie, Person
+from reviews.search import update_search_index
+from reviews.utils import genres_from_payload, assign_genres
+from . import parser
+
+# 1回の INSERT にまとめる行数
+WRITE_BATCH_SIZE = 500
+
+
+class PersonCache:
+    """TMDb人物ID → 人物ID（インポート1回分）
+
+    最初の resolve() で登録済みの対応を1クエリで読み込み、以降は辞書を引くだけ。
+    キャッシュにない人物だけをまとめて登録する。
+    """
+
+    def __init__(self):
+        self.pks = None
+
+    def clear(self):
+        # 書き込みがロールバックされたら、作ったはずの人物IDは使えないので読み込み直す
+        self.pks = None
+
+    def resolve(self, credits, batch_size=WRITE_BATCH_SIZE):
+        """{TMDb人物ID: 名前} の人物IDを引けるようにして {TMDb人物ID: 人物ID} を返す"""
+        if self.pks is None:
+            self.pks = dict(
+                Person.objects.filter(tmdb_person_id__isnull=False).values_list('tmdb_person_id', 'pk')
+            )
+
+        missing = {person_id: name for person_id, name in credits.items() if person_id not in self.pks}
+        if not missing:
+            return self.pks
+
+        # 名前だけで登録されていた人物（TMDb人物IDなし）は、同名の最初の1人にIDを付けて使う
+        legacy = {}
+        for person in Person.objects.filter(tmdb_person_id=None, name__in=set(missing.values())).order_by('-pk'):
+            legacy[person.name] = person
+        claimed = []
+        for person_id, name in missing.items():
+            person = legacy.pop(name, None)
+            if person:
+                person.tmdb_person_id = person_id
+                claimed.append(person)
+        Person.objects.bulk_update(claimed, ['tmdb_person_id'], batch_size=batch_size)
+
+        claimed_ids = {person.tmdb_person_id for person in claimed}
+        created = [
+            Person(tmdb_person_id=person_id, name=name)
+            for person_id, name in missing.items()
+            if person_id not in claimed_ids
+        ]
+        for person in created:
+            person.set_search_key()
+        Person.objects.bulk_create(created, batch_size=batch_size)
+
+        self.pks.update((person.tmdb_person_id, person.pk) for person in claimed + created)
+        if any(person.pk is None for person in created):
+            # 作成した行のIDを返せないDBでは引き直す
+            self.pks.update(
+                Person.objects.filter(tmdb_person_id__in=[person.tmdb_person_id for person in created])
+                .values_list('tmdb_person_id', 'pk')
+            )
+        return self.pks
+
+
+class MovieWriter:
+    """映画詳細のレスポンスを溜めておき、flush() でまとめて upsert する
+
+    映画は bulk_create(update_conflicts=True) で tmdb_id ごとに作成・更新し、
+    人物はTMDb人物IDで PersonCache から引いて（なければ一括作成）、キャストの
+    中間テーブルとジャンルも一括で書く。クエリ数は映画の本数によらず一定。
+    インポート1回の間は同じ writer を使い回すと、人物の対応も使い回せる。
+
+    bulk_create は save() もシグナルも通らないので、検索キーは set_search_keys() で付け、
+    検索インデックスは update_search_index() で明示的に更新する。
+    """
+
+    def __init__(self, batch_size=WRITE_BATCH_SIZE, people=None):
+        self.batch_size = batch_size
+        self.people = people or PersonCache()
+        self.pending = {}
+
+    def __len__(self):
+        return len(self.pending)
+
+    def add(self, tmdb_id, detail, fields=None):
+        """書き込む映画を追加する（fields を省略すると detail から取り出す）"""
+        self.pending[tmdb_id] = (parser.movie_fields(detail) if fields is None else fields, detail)
+
+    @transaction.atomic
+    def _write(self, pending):
+        existing = set(Movie.objects.filter(tmdb_id__in=pending).values_list('tmdb_id', flat=True))
+        credits = {
+            tmdb_id: (parser.director(detail), parser.cast(detail))
+            for tmdb_id, (_, detail) in pending.items()
+            if 'credits' in detail
+        }
+        people = self.people.resolve(
+            {
+                person_id: name
+                for director, cast in credits.values()
+                for person_id, name in ([director] if director else []) + cast
+            },
+            self.batch_size,
+        )
+
+        # 更新する列が同じ映画ごとに upsert する（予告編やクレジットがない映画はその列を上書きしない）
+        movies, groups = [], defaultdict(list)
+        for tmdb_id, (fields, detail) in pending.items():
+            movie = Movie(tmdb_id=tmdb_id, **fields)
+            update_fields = sorted(fields)
+            if tmdb_id in credits:
+                director = credits[tmdb_id][0]
+                movie.director_id = people[director[0]] if director else None
+                update_fields.append('director')
+            movie.set_search_keys()
+            movies.append(movie)
+            groups[tuple(update_fields)].append(movie)
+
+        for update_fields, group in groups.items():
+            Movie.objects.bulk_create(
+                group,
+                batch_size=self.batch_size,
+                update_conflicts=True,
+                unique_fields=['tmdb_id'],
+                update_fields=[*update_fields, 'title_key', 'original_title_key', 'updated_at'],
+            )
+
+        movie_pks = dict(Movie.objects.filter(tmdb_id__in=pending).values_list('tmdb_id', 'pk'))
+        for movie in movies:
+            movie.pk = movie_pks[movie.tmdb_id]
+            movie._state.adding = False
+
+        # キャストはクレジットのある映画だけ置き換える
+        Cast = Movie.cast.through
+        Cast.objects.filter(movie_id__in=[movie_pks[tmdb_id] for tmdb_id in credits]).delete()
+        Cast.objects.bulk_create(
+            [
+                Cast(movie_id=movie_pks[tmdb_id], person_id=person_pk)
+                for tmdb_id, (_, cast) in credits.items()
+                for person_pk in dict.fromkeys(people[person_id] for person_id, _ in cast)
+            ],
+            batch_size=self.batch_size,
+            ignore_conflicts=True,
+        )
+
+        assign_genres({movie.pk: genres_from_payload(pending[movie.tmdb_id][1]) for movie in movies})
+        return [(movie, movie.tmdb_id not in existing) for movie in movies]
+
+    def flush(self):
+        """溜めた映画を書き込み、[(Movie, 作成したか)] を返す"""
+        if not self.pending:
+            return []
+        pending, self.pending = self.pending, {}
+        try:
+            written = self._write(pending)
+        except Exception:
+            self.people.clear()
+            raise
+        update_search_index([movie.pk for movie, _ in written])
+        return written
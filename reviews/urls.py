@@ -5,6 +5,8 @@ urlpatterns = [
     path('', views.home, name='home'),
     path('movies/', views.movie_list, name='movie_list'),
     path('reviews/movie/<int:pk>/', views.movie_detail, name='movie_detail'),
+    path('reviews/movie/<int:pk>/reviews/', views.movie_review_page, name='movie_review_page'),
+    path('reviews/movie/<int:pk>/distribution/', views.movie_score_distribution, name='movie_score_distribution'),
     path('reviews/person/<int:pk>/', views.person_movie_list, name='person_movie_list'),
     path('now-playing/', views.now_playing_view, name='now_playing'),
     path('reviews/create-movie/<int:tmdb_id>/', views.create_movie_from_tmdb, name='create_movie_from_tmdb'),
@@ -22,6 +24,7 @@ urlpatterns = [
     
     # 検索機能
     path('search/', views.search, name='search'),
+    path('search/autocomplete/', views.search_autocomplete, name='search_autocomplete'),
     path('advanced-search/', views.advanced_search, name='advanced_search'),
     
     # コラム機能
@@ -1,52 +1,29 @@
-import requests
-from decouple import config
 import logging
 
 logger = logging.getLogger(__name__)
 
 def fetch_now_playing_movies():
     """TMDbから現在公開中の映画一覧を取得"""
-    api_key = config('TMDB_API_KEY', default='')
+    from .tmdb import TMDbError, get_client
+
+    client = get_client()
     
-    if not api_key:
-        print('❌ TMDB_API_KEY が設定されていません')  # ← 追加
+    if not client.api_key:
         logger.error('TMDB_API_KEY が設定されていません')
         return []
-    
-    url = "https://api.themoviedb.org/3/movie/now_playing"
-    params = {
-        "api_key": api_key,
-        "region": "JP",
-        "language": "ja-JP",
-        "page": 1
-    }
 
     try:
-        response = requests.get(url, params=params, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        
-        if 'results' not in data:
-            print('❌ TMDb APIからresultsが返されませんでした')  # ← 追加
-            logger.warning('TMDb APIからresultsが返されませんでした')
-            return []
-        
-        print(f'✅ TMDbから{len(data["results"])}件の映画を取得しました')  # ← 追加
-        logger.info(f'TMDbから{len(data["results"])}件の映画を取得しました')
-        return data.get('results', [])
-        
-    except requests.Timeout:
-        print('❌ タイムアウト')  # ← 追加
-        logger.error('TMDb APIのリクエストがタイムアウトしました')
-        return []
-    except requests.RequestException as e:
-        print(f'❌ APIエラー: {e}')  # ← 追加
+        data = client.movie_list('now_playing', 1, region='JP')
+    except TMDbError as e:
         logger.error(f'TMDb APIエラー: {e}')
         return []
-    except ValueError as e:
-        print(f'❌ JSONエラー: {e}')  # ← 追加
-        logger.error(f'JSONデコードエラー: {e}')
+        
+    if 'results' not in data:
+        logger.warning('TMDb APIからresultsが返されませんでした')
         return []
+    
+    logger.info(f'TMDbから{len(data["results"])}件の映画を取得しました')
+    return data.get('results', [])
 
 # ↓↓↓ ここから外に出す（関数の外） ↓↓↓
 GENRE_MAP = {
@@ -73,4 +50,43 @@ GENRE_MAP = {
 
 def get_genre_names(genre_ids):
     """ジャンルIDのリストをジャンル名のリストに変換"""
-    return [GENRE_MAP.get(gid, "その他") for gid in genre_ids]
\ No newline at end of file
+    return [GENRE_MAP.get(gid, "その他") for gid in genre_ids]
+
+
+def genres_from_payload(data):
+    """TMDbのレスポンスからジャンルの (ID, 名前) のリストを取り出す
+
+    詳細APIは genres（[{'id', 'name'}]）、一覧APIは genre_ids（[ID]）で返すので両方に対応。
+    """
+    if data.get('genres'):
+        return [(genre['id'], genre.get('name') or GENRE_MAP.get(genre['id'], "その他")) for genre in data['genres']]
+    return [(gid, GENRE_MAP.get(gid, "その他")) for gid in data.get('genre_ids', [])]
+
+
+def assign_genres(genres_by_movie):
+    """映画のジャンルをまとめて登録する（既存のジャンル付けは置き換え）
+
+    genres_by_movie: {映画ID: [(TMDbジャンルID, 名前), ...]}
+    クエリ数は映画の本数によらず一定（ジャンル作成・ID取得・削除・一括作成）。
+    """
+    from .models import Genre, MovieGenre
+
+    if not genres_by_movie:
+        return
+
+    names = {gid: name for genres in genres_by_movie.values() for gid, name in genres}
+    Genre.objects.bulk_create(
+        [Genre(tmdb_id=gid, name=name) for gid, name in names.items()],
+        ignore_conflicts=True,
+    )
+    genre_pks = dict(Genre.objects.filter(tmdb_id__in=names).values_list('tmdb_id', 'pk'))
+
+    MovieGenre.objects.filter(movie_id__in=genres_by_movie).delete()
+    MovieGenre.objects.bulk_create(
+        [
+            MovieGenre(movie_id=movie_id, genre_id=genre_pks[gid])
+            for movie_id, genres in genres_by_movie.items()
+            for gid in {gid for gid, _ in genres}
+        ],
+        ignore_conflicts=True,
+    )
@@ -3,11 +3,11 @@ from django.core.paginator import Paginator
 from django.core.mail import send_mail
 from django.conf import settings
 from django.db import models
-from django.db.models import Q
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.forms import AuthenticationForm
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
+from django.views.decorators.http import condition
 from datetime import date
 from django_summernote.widgets import SummernoteWidget
 # Summernote用カスタムアップロードビュー
@@ -24,35 +24,66 @@ from .forms import (
     ReviewForm, DiscussionForm, DiscussionCommentForm, SignUpForm,
     ColumnForm, UserProfileForm, UserEditForm, CommentForm, FanArtForm
 )
+from .pagination import REVIEW_SORTS, paginate_reviews
+from .search import (
+    autocomplete, AUTOCOMPLETE_LIMIT,
+    SearchParams, cached_search_ids, cached_year_facets, record_search_query, movie_page,
+    BROWSE_SORTS, facet_index_cache,
+)
+
+
+def _content_etag(model):
+    """詳細ページ用のETag関数（未ログインユーザーのみ）
+
+    更新日時とコンテンツバージョン（signals.pyで子要素の書き込み時に加算）を
+    主キーで1行だけ引いて組み立てる。ログインユーザーのページは
+    お気に入りや通知などで個人ごとに変わるため条件付きGETの対象外。
+    """
+    def etag_func(request, pk):
+        if request.user.is_authenticated:
+            return None
+        row = model.objects.filter(pk=pk).values_list('updated_at', 'content_version').first()
+        if row is None:
+            return None
+        updated_at, content_version = row
+        return f'{model._meta.model_name}-{pk}-{updated_at.timestamp()}-{content_version}'
+    return etag_func
+
 
 def movie_list(request):
-    """映画一覧を表示 - ページネーション付き + 検索機能"""
+    """映画一覧を表示 - ページネーション付き + 検索機能 + ファセット絞り込み"""
     query = request.GET.get('q', '')
+    sort_by = request.GET.get('sort', 'popularity')
+    if sort_by not in BROWSE_SORTS:
+        sort_by = 'popularity'
     
-    movies = Movie.objects.all().order_by('-popularity')  # 人気度順
+    # 絞り込み・件数はワーカーごとのファセットインデックスで（映画は表示するページ分だけ取得）
+    index = facet_index_cache.get_index()
+    selected = index.parse(request.GET)
     
     # 検索機能
+    movie_ids = None
     if query:
-        movies = movies.filter(
-            Q(title__icontains=query) | Q(original_title__icontains=query)
-        )
+        movie_ids = cached_search_ids(SearchParams.normalize(query))
     
     # ページネーション（30件ずつ）
-    paginator = Paginator(movies, 30)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    matched_ids = index.movie_ids_for(selected, movie_ids, sort_by)
+    page_obj = movie_page(matched_ids, request.GET.get('page'), per_page=30, max_count=len(matched_ids))
     
     context = {
         'movies': page_obj,
         'page_obj': page_obj,
         'query': query,
+        'sort_by': sort_by,
+        'facets': index.facets(selected, movie_ids, request.GET),
     }
     
     return render(request, 'reviews/movie_list.html', context)
 
+@condition(etag_func=_content_etag(Movie))
 def movie_detail(request, pk):
     """映画詳細とレビュー投稿処理"""
-    movie = get_object_or_404(Movie, pk=pk)
+    movie = get_object_or_404(Movie.objects.select_related('score_stats', 'director'), pk=pk)
     today = date.today() 
     
     # お気に入り状態を確認
@@ -89,8 +120,12 @@ def movie_detail(request, pk):
     else:
         form = None
 
-    # レビュー取得
-    reviews = Review.objects.filter(movie=movie).order_by('-created_at')
+    # レビュー取得（最初の1ページのみ。続きは movie_review_page で取得）
+    review_sort = request.GET.get('review_sort', 'newest')
+    if review_sort not in REVIEW_SORTS:
+        review_sort = 'newest'
+    reviews, next_cursor = paginate_reviews(_movie_reviews(movie.pk), sort=review_sort)
+    total_review_count = Review.objects.filter(movie=movie).count()
     
     # 視聴ステータスを確認
     from .models import WatchStatus
@@ -101,6 +136,11 @@ def movie_detail(request, pk):
     context = {
         'movie': movie,
         'reviews': reviews,
+        'liked_review_ids': _liked_review_ids(request.user, reviews),
+        'review_sort': review_sort,
+        'review_sorts': REVIEW_SORTS,
+        'next_cursor': next_cursor,
+        'total_review_count': total_review_count,
         'form': form,
         'is_favorite': is_favorite,
         'has_reviewed': has_reviewed,
@@ -113,6 +153,49 @@ def movie_detail(request, pk):
     return render(request, 'reviews/movie_detail.html', context)
 
 
+def _movie_reviews(movie_id):
+    """映画のレビュー（投稿者・プロフィールを結合）"""
+    return Review.objects.filter(movie_id=movie_id).select_related('user', 'user__userprofile')
+
+
+def _liked_review_ids(user, reviews):
+    """表示中のレビューのうち、ログインユーザーがいいね済みのID"""
+    if not user.is_authenticated or not reviews:
+        return set()
+    return set(ReviewLike.objects.filter(
+        user=user, review_id__in=[review.id for review in reviews]
+    ).values_list('review_id', flat=True))
+
+
+def movie_review_page(request, pk):
+    """映画のレビュー一覧の続き（HTMLフラグメント）"""
+    review_sort = request.GET.get('sort', 'newest')
+    if review_sort not in REVIEW_SORTS:
+        review_sort = 'newest'
+    reviews, next_cursor = paginate_reviews(
+        _movie_reviews(pk), sort=review_sort, cursor=request.GET.get('cursor')
+    )
+    
+    return render(request, 'reviews/review_items.html', {
+        'movie_id': pk,
+        'reviews': reviews,
+        'liked_review_ids': _liked_review_ids(request.user, reviews),
+        'review_sort': review_sort,
+        'next_cursor': next_cursor,
+    })
+
+
+def movie_score_distribution(request, pk):
+    """スコア分布（ギャップバッジ・期待値・満足度）をJSONで返す"""
+    from django.http import JsonResponse
+    movie = get_object_or_404(Movie.objects.select_related('score_stats'), pk=pk)
+    
+    data = movie.get_score_stats().distribution()
+    data['movie_id'] = movie.pk
+    
+    return JsonResponse(data)
+
+
 def person_movie_list(request, pk):
     """特定の人物（監督など）に関連する映画一覧"""
     person = get_object_or_404(Person, pk=pk)
@@ -133,29 +216,39 @@ def now_playing_view(request):
     
     today = date.today()
     status = request.GET.get('status', 'now_playing')  # デフォルトは「現在公開中」
+    sort_by = request.GET.get('sort', '')
+    
+    # ギャップスコアは集計済みの列、レビュー数はスコア集計と一緒に1クエリで取得
+    base = Movie.objects.select_related('score_stats')
     
     if status == 'coming_soon':
         # 公開予定: jp_release_dateが今日より未来の映画
-        movies = Movie.objects.filter(
+        movies = base.filter(
             jp_release_date__gt=today
         ).order_by('jp_release_date')  # 公開日が近い順
+        if sort_by == 'gap_score':
+            movies = movies.order_by_gap_score()
     else:
         # 現在公開中
         two_months_ago = today - timedelta(days=60)
         
         # 方法1: 管理画面で手動選択した映画（最優先）
-        manually_selected = Movie.objects.filter(
+        manually_selected = base.filter(
             is_now_playing_jp=True
         ).order_by('-popularity')
         
         # 方法2: jp_release_dateが過去2ヶ月以内の映画（自動）
-        auto_selected = Movie.objects.filter(
+        auto_selected = base.filter(
             jp_release_date__gte=two_months_ago,
             jp_release_date__lte=today
         ).exclude(
             is_now_playing_jp=True  # 手動選択と重複しないように
         ).order_by('-popularity')
         
+        if sort_by == 'gap_score':
+            manually_selected = manually_selected.order_by_gap_score()
+            auto_selected = auto_selected.order_by_gap_score()
+        
         # 結合
         from itertools import chain
         movies = list(chain(manually_selected, auto_selected))
@@ -164,6 +257,7 @@ def now_playing_view(request):
     context = {
         'movies': movies,
         'status': status,
+        'sort_by': sort_by,
         'last_updated': today,
     }
     
@@ -299,28 +393,56 @@ def my_page(request):
 
 
 def search(request):
-    """映画検索機能"""
-    query = request.GET.get('q', '')
-    results = Movie.objects.all()
-    
-    # テキスト検索
-    if query:
-        results = results.filter(
-            Q(title__icontains=query) | 
-            Q(director__name__icontains=query) |
-            Q(cast__name__icontains=query)
-        ).distinct()
+    """映画検索機能（関連度順・ページネーション付き）"""
+    query = request.GET.get('q', '').strip()
+    params = SearchParams.normalize(query)
+    if request.GET.get('page', '1') == '1':
+        record_search_query(params)
+    
+    movie_ids = cached_search_ids(params) if params.query else []
+    page_obj = movie_page(
+        movie_ids, request.GET.get('page'), queryset=Movie.objects.select_related('score_stats')
+    )
+    result_count = page_obj.paginator.count
     
     context = {
         'query': query,
-        'results': results,
-        'result_count': results.count(),
+        'page_obj': page_obj,
+        'results': page_obj.object_list,
+        'result_count': result_count,
+        'movies': page_obj.object_list,
+        'movies_count': result_count,
+        'total_count': result_count,
+        'filter_type': request.GET.get('type', 'all'),
     }
     
     return render(request, 'reviews/search_results.html', context)
 
 
 
+def search_autocomplete(request):
+    """検索の入力補完（JSON）"""
+    from django.http import JsonResponse
+    from django.urls import reverse
+
+    query = request.GET.get('q', '')
+    try:
+        limit = max(1, min(int(request.GET.get('limit', AUTOCOMPLETE_LIMIT)), AUTOCOMPLETE_LIMIT))
+    except ValueError:
+        limit = AUTOCOMPLETE_LIMIT
+
+    url_names = {'movie': 'movie_detail', 'person': 'person_movie_list'}
+    results = [
+        {
+            'type': suggestion.kind,
+            'id': suggestion.id,
+            'label': suggestion.label,
+            'url': reverse(url_names[suggestion.kind], args=[suggestion.id]),
+        }
+        for suggestion in autocomplete(query, limit)
+    ]
+    return JsonResponse({'query': query, 'results': results})
+
 def column_list(request):
     """コラム一覧ページ - ページネーション付き"""
     from .models import Like
@@ -344,6 +466,7 @@ def column_list(request):
     return render(request, 'reviews/column_list.html', context)
 
 
+@condition(etag_func=_content_etag(Column))
 def column_detail(request, pk):
     """コラム詳細ページ"""
     from .models import Like
@@ -910,41 +1033,23 @@ def advanced_search(request):
     year_to = request.GET.get('year_to', '')
     sort_by = request.GET.get('sort', 'title')
     
-    results = Movie.objects.all()
+    params = SearchParams.normalize(query, year_from, year_to, sort_by)
+    if request.GET.get('page', '1') == '1':
+        record_search_query(params)
     
-    if query:
-        results = results.filter(
-            Q(title__icontains=query) | 
-            Q(director__name__icontains=query) |
-            Q(cast__name__icontains=query)
-        ).distinct()
-    
-    if year_from:
-        try:
-            results = results.filter(release_date__year__gte=int(year_from))
-        except (ValueError, TypeError):
-            pass
-    
-    if year_to:
-        try:
-            results = results.filter(release_date__year__lte=int(year_to))
-        except (ValueError, TypeError):
-            pass
-    
-    if sort_by == 'year_desc':
-        results = results.order_by('-release_date')
-    elif sort_by == 'year_asc':
-        results = results.order_by('release_date')
-    elif sort_by == 'title':
-        results = results.order_by('title')
+    # 並び順どおりの映画IDはキャッシュから。件数は上限（1000件）までで、映画は1ページ分だけ取得する
+    page_obj = movie_page(cached_search_ids(params), request.GET.get('page'))
     
     context = {
         'query': query,
         'year_from': year_from,
         'year_to': year_to,
         'sort_by': sort_by,
-        'results': results,
-        'result_count': results.count(),
+        'page_obj': page_obj,
+        'results': page_obj,
+        'result_count': page_obj.paginator.count_display,
+        'year_facets': cached_year_facets(params),
+        'selected_decade': params.decade(),
     }
     
     return render(request, 'reviews/advanced_search.html', context)
@@ -965,6 +1070,7 @@ def discussion_list(request):
     })
 
 
+@condition(etag_func=_content_etag(Discussion))
 def discussion_detail(request, pk):
     """みんなの声詳細"""
     discussion = get_object_or_404(Discussion, pk=pk)